@@ -0,0 +1,116 @@
+"""
+Admission control for LLM generations.
+
+A single local Ollama model slows down for everyone when too many
+generations run at once, so calls go through an AdmissionController:
+
+- at most `max_in_flight` generations run concurrently;
+- the rest wait in a bounded priority queue (lower priority value first,
+  FIFO within a priority);
+- a waiter that isn't admitted within `queue_timeout` seconds, or that
+  arrives when the queue is full, is rejected with AdmissionRejected so
+  the caller can degrade (e.g. answer with a templated response) instead
+  of timing out.
+"""
+
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+from typing import List, Optional, Tuple
+
+
+class AdmissionRejected(Exception):
+    """The request was not admitted; `reason` is "queue_full" or "queue_timeout"."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_in_flight: int = 4,
+        max_queue: int = 32,
+        queue_timeout: Optional[float] = 15.0,
+    ):
+        """
+        Args:
+            max_in_flight: concurrent generations allowed
+            max_queue: waiters allowed beyond that; more are rejected at once
+            queue_timeout: longest a waiter may queue (seconds, None = no limit)
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        # (priority, arrival order, future resolved when admitted)
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        self._counts = {"admitted": 0, "queue_full": 0, "queue_timeout": 0}
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, priority: int = 0):
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self._counts["admitted"] += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._counts["queue_full"] += 1
+            raise AdmissionRejected("queue_full")
+
+        entry = (
+            priority,
+            next(self._order),
+            asyncio.get_running_loop().create_future(),
+        )
+        heapq.heappush(self._waiters, entry)
+        try:
+            # wait_for returns the result if admission races the deadline
+            await asyncio.wait_for(entry[2], self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._remove(entry)
+            self._counts["queue_timeout"] += 1
+            raise AdmissionRejected("queue_timeout") from None
+        except BaseException:
+            # cancelled (e.g. client went away): give back a slot we were handed
+            self._remove(entry)
+            if entry[2].done() and not entry[2].cancelled():
+                self.release()
+            raise
+        self._counts["admitted"] += 1
+
+    def _remove(self, entry):
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+
+    def release(self):
+        """Free a slot, handing it straight to the best waiter if any."""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int = 0):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            **self._counts,
+        }
@@ -1,7 +1,25 @@
 from abc import ABC, abstractmethod
+from typing import AsyncIterator, Optional
 
 
 class AIPlatform(ABC):
     @abstractmethod
-    def chat(self, prompt: str) -> str:
+    def chat(self, prompt: str, system: Optional[str] = None) -> str:
         pass
+
+    async def stream_chat(
+        self, prompt: str, system: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Yield the response text in chunks as it is generated.
+        Platforms without native streaming yield the full reply once.
+        """
+        yield await self.chat(prompt, system=system)
+
+    async def warmup(self):
+        """Load the model ahead of the first request, if the platform can."""
+        return None
+
+    async def aclose(self):
+        """Release any network resources held by the platform."""
+        return None
@@ -0,0 +1,82 @@
+"""
+Micro-batching for query encoding.
+
+Concurrent requests that arrive within `max_wait_ms` of each other are
+coalesced into one `encode` call, which is much cheaper per query on CPU
+than encoding each one separately. The batch runs in the threadpool so the
+event loop keeps serving other requests while the encoder works.
+"""
+
+import asyncio
+from typing import Callable, List, Optional, Set, Tuple
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+
+class MicroBatchEncoder:
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 3.0,
+    ):
+        """
+        Args:
+            encode_fn: encodes a list of texts into a (n, d) array
+            max_batch_size: flush as soon as this many queries are waiting
+            max_wait_ms: how long the first query in a batch waits for others
+        """
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # the loop only keeps weak references to tasks; these keep the
+        # in-flight batches alive until they have resolved their futures
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.batches = 0
+        self.queries = 0
+
+    async def encode(self, text: str) -> np.ndarray:
+        """Encode one text, sharing the encoder call with concurrent callers."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        # Identical texts in one batch are encoded once.
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+        self.batches += 1
+        self.queries += len(batch)
+        try:
+            vectors = await run_in_threadpool(self.encode_fn, unique_texts)
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        by_text = dict(zip(unique_texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
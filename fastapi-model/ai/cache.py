@@ -0,0 +1,216 @@
+"""
+Response cache for LLM counseling text.
+
+Entries are keyed on a normalized (interests, top-3 colleges, rank bucket,
+board-marks bucket) tuple, so students with the same interests and
+overlapping recommendations reuse one generation instead of paying for a
+new one.
+
+Optional semantic tier: when an `encoder` is given, an exact miss falls back
+to comparing the interests embedding against cached entries that share the
+same colleges and rank and marks buckets, and reuses the closest one if its cosine
+similarity is at least `similarity_threshold`. The encoder may return None
+for interests it has no embedding for; those requests and entries are
+matched exactly only.
+
+Eviction is LRU (max_entries) plus a per-entry TTL.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional, Tuple
+
+import numpy as np
+
+CacheKey = Tuple[Tuple[str, ...], Tuple[Tuple[str, str, str], ...], int, Optional[int]]
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        ttl_seconds: float = 6 * 3600,
+        rank_bucket_size: int = 1000,
+        marks_bucket_size: float = 5.0,
+        encoder: Optional[Callable] = None,
+        similarity_threshold: float = 0.9,
+    ):
+        """
+        Args:
+            max_entries: LRU capacity
+            ttl_seconds: how long an entry may be served after it was stored
+            rank_bucket_size: ranks within the same bucket share entries
+            marks_bucket_size: board marks (percent) within the same bucket
+                share entries; students without marks share only with each other
+            encoder: callable taking the interests text and returning its
+                embedding, or None; enables the semantic tier when set
+            similarity_threshold: minimum cosine similarity for a semantic hit
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.rank_bucket_size = max(1, rank_bucket_size)
+        self.marks_bucket_size = marks_bucket_size
+        self.encoder = encoder
+        self.similarity_threshold = similarity_threshold
+
+        # key -> (text, stored_at, normalized interests vector or None)
+        self._entries: "OrderedDict[CacheKey, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.encoder is not None
+
+    # ---------- Keys ----------
+
+    def make_key(
+        self,
+        interests: Iterable[str],
+        colleges: Iterable[dict],
+        rank: int,
+        board_marks: Optional[float] = None,
+    ) -> CacheKey:
+        """
+        Build the cache key for a request.
+
+        `colleges` are the recommended rows (dicts or DataFrame records);
+        each is identified by (institute_short, program_name, category).
+        """
+        norm_interests = tuple(
+            sorted({i.strip().lower() for i in interests if i and i.strip()})
+        )
+        college_ids = tuple(
+            (
+                str(c.get("institute_short", "")),
+                str(c.get("program_name", "")),
+                str(c.get("category", "")),
+            )
+            for c in colleges
+        )
+        marks_bucket = (
+            None
+            if board_marks is None
+            else int(float(board_marks) // self.marks_bucket_size)
+        )
+        return (
+            norm_interests,
+            college_ids,
+            int(rank) // self.rank_bucket_size,
+            marks_bucket,
+        )
+
+    # ---------- Lookup ----------
+
+    def get(self, key: CacheKey) -> Optional[str]:
+        """Exact lookup. Counts a miss only when no semantic tier follows."""
+        with self._lock:
+            text = self._get_locked(key)
+            if text is not None:
+                self.hits += 1
+            elif not self.semantic_enabled:
+                self.misses += 1
+            return text
+
+    def get_similar(self, key: CacheKey) -> Optional[str]:
+        """
+        Semantic lookup among entries with the same colleges and buckets.
+        Runs the encoder, so call it from a worker thread if that is slow.
+        """
+        if not self.semantic_enabled:
+            return None
+
+        with self._lock:
+            candidates = [
+                (k, entry[2])
+                for k, entry in self._entries.items()
+                if k[1:] == key[1:] and entry[2] is not None
+            ]
+        if not candidates:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        query_vec = self._encode(key)
+        if query_vec is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        best_key, best_score = None, -1.0
+        for k, vec in candidates:
+            score = float(np.dot(query_vec, vec))
+            if score > best_score:
+                best_key, best_score = k, score
+
+        with self._lock:
+            if best_score >= self.similarity_threshold:
+                text = self._get_locked(best_key)
+                if text is not None:
+                    self.semantic_hits += 1
+                    return text
+            self.misses += 1
+            return None
+
+    def put(self, key: CacheKey, text: str):
+        """
+        Store a generated response. Runs the encoder when the semantic
+        tier is enabled, so call it from a worker thread if that is slow.
+        """
+        if not text:
+            return
+        vec = self._encode(key) if self.semantic_enabled else None
+        with self._lock:
+            self._entries[key] = (text, time.monotonic(), vec)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    (self.hits + self.semantic_hits) / lookups if lookups else 0.0
+                ),
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "semantic_enabled": self.semantic_enabled,
+            }
+
+    # ---------- Internals ----------
+
+    def _get_locked(self, key: CacheKey) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        text, stored_at, _ = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return text
+
+    def _encode(self, key: CacheKey) -> Optional[np.ndarray]:
+        vec = self.encoder(", ".join(key[0]))
+        if vec is None:
+            return None
+        vec = np.asarray(vec, dtype="float32").reshape(-1)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
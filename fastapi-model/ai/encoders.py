@@ -0,0 +1,283 @@
+"""
+Pluggable query/document encoders.
+
+Backends:
+
+- "torch": the sentence-transformers model itself. Needs torch, so it costs
+  a multi-second import and a few hundred MB per worker.
+- "onnx": the same transformer exported to ONNX and run with ONNX Runtime.
+  Tokenization uses the Rust `tokenizers` package and pooling/normalization
+  is done in numpy, so the serving process never imports torch.
+- "onnx-int8": the ONNX model with dynamically int8-quantized weights
+  (smaller and usually faster on CPU, at a small accuracy cost).
+- "auto": the fastest ONNX variant whose parity check passed, else torch
+  (an error pointing at export_encoder.py when torch is not installed).
+
+export_encoder.py builds the ONNX files once (that step needs torch) and
+checks each variant against the torch vectors: the export directory's
+encoder.json records the minimum and mean cosine similarity per variant,
+and "auto" only picks variants that reached `min_cosine`.
+
+All backends have SentenceTransformer's encode(texts, batch_size=...)
+signature and return float32 (n, d) arrays.
+"""
+
+import importlib.util
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Protocol, Sequence, Union
+
+import numpy as np
+
+ENCODER_BACKENDS = ("auto", "torch", "onnx", "onnx-int8")
+ENCODER_META = "encoder.json"
+ONNX_FILES = {"onnx": "model.onnx", "onnx-int8": "model.int8.onnx"}
+
+
+class Encoder(Protocol):
+    def encode(self, sentences, batch_size: int = 32, **kwargs) -> np.ndarray: ...
+
+
+def load_sentence_transformer(model_name: str, device: Optional[str] = None):
+    """SentenceTransformer, imported only when the torch backend is used."""
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name, device=device)
+
+
+def load_meta(onnx_dir: str) -> Optional[dict]:
+    path = os.path.join(onnx_dir, ENCODER_META)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+class OnnxEncoder:
+    def __init__(
+        self,
+        onnx_dir: str,
+        quantized: bool = True,
+        intra_op_threads: Optional[int] = None,
+    ):
+        """
+        Args:
+            onnx_dir: directory written by export_encoder.py
+            quantized: use the int8 model instead of the fp32 one
+            intra_op_threads: ONNX Runtime threads per encode call
+                (default: ONNX Runtime's choice, one per core)
+        """
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "The ONNX encoder needs onnxruntime and tokenizers: "
+                "pip install onnxruntime tokenizers"
+            ) from e
+
+        meta = load_meta(onnx_dir)
+        if meta is None:
+            raise FileNotFoundError(
+                f"No {ENCODER_META} in {onnx_dir}. Run export_encoder.py first."
+            )
+        self.meta = meta
+        self.backend = "onnx-int8" if quantized else "onnx"
+        self.model_name = meta["model_name"]
+        self.max_length = meta["max_length"]
+        self.pooling = meta["pooling"]
+        self.normalize = meta["normalize"]
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(onnx_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(self.max_length)
+        self.tokenizer.enable_padding(
+            pad_id=meta.get("pad_id", 0), pad_token=meta.get("pad_token", "[PAD]")
+        )
+
+        options = ort.SessionOptions()
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(onnx_dir, ONNX_FILES[self.backend]),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.meta["dim"]
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        feeds = {k: v for k, v in feeds.items() if k in self._input_names}
+        hidden = self.session.run(None, feeds)[0]
+
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        else:
+            weights = mask[:, :, None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.maximum(
+                weights.sum(axis=1), 1e-9
+            )
+        if self.normalize:
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype(np.float32, copy=False)
+
+    def encode(
+        self,
+        sentences: Union[str, Sequence[str]],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        **kwargs,
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.meta["dim"]), dtype=np.float32)
+
+        # batches of similar length waste less compute on padding
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        out = np.empty((len(texts), self.meta["dim"]), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            idx = order[start : start + batch_size]
+            out[idx] = self._encode_batch([texts[i] for i in idx])
+            if show_progress_bar:
+                logging.info(
+                    "Encoded %d/%d", min(start + batch_size, len(texts)), len(texts)
+                )
+        return out[0] if single else out
+
+
+def passing_variants(meta: Optional[dict]) -> List[str]:
+    """ONNX variants whose parity check passed, fastest first."""
+    if not meta:
+        return []
+    parity = meta.get("parity", {})
+    return [
+        backend
+        for backend in ("onnx-int8", "onnx")
+        if parity.get(backend, {}).get("passed")
+    ]
+
+
+def load_encoder(
+    backend: str = "auto",
+    model_name: str = "all-MiniLM-L6-v2",
+    onnx_dir: str = "data/encoder_onnx",
+) -> Encoder:
+    """Encoder for `backend` (see ENCODER_BACKENDS)."""
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown encoder backend {backend!r}; use {ENCODER_BACKENDS}")
+
+    if backend == "auto":
+        meta = load_meta(onnx_dir)
+        variants = passing_variants(meta)
+        if variants and meta["model_name"] == model_name:
+            backend = variants[0]
+        elif importlib.util.find_spec("sentence_transformers") is not None:
+            backend = "torch"
+        else:
+            # e.g. a requirements-serving.txt install before the export
+            if meta is None:
+                reason = f"there is no {ENCODER_META} in {onnx_dir}"
+            elif meta["model_name"] != model_name:
+                reason = f"{onnx_dir} holds an export of {meta['model_name']}"
+            else:
+                reason = f"no ONNX variant in {onnx_dir} passed its parity check"
+            raise FileNotFoundError(
+                f"No usable ONNX encoder for {model_name}: {reason}, and "
+                "sentence-transformers is not installed to fall back on. "
+                "Run export_encoder.py first (it needs requirements.txt)."
+            )
+    elif backend != "torch" and backend not in passing_variants(load_meta(onnx_dir)):
+        logging.warning(
+            "Encoder backend %s has not passed its parity check in %s.",
+            backend,
+            onnx_dir,
+        )
+
+    logging.info("Loading %s encoder for %s.", backend, model_name)
+    if backend == "torch":
+        return load_sentence_transformer(model_name)
+    return OnnxEncoder(onnx_dir, quantized=backend == "onnx-int8")
+
+
+def cosine_parity(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """Row-wise cosine similarity between two (n, d) embedding matrices."""
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosine = (reference * candidate).sum(axis=1)
+    return {
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+        "p01_cosine": float(np.quantile(cosine, 0.01)),
+    }
+
+
+def export_onnx(model_name: str, onnx_dir: str, opset: int = 17) -> dict:
+    """
+    Export `model_name`'s transformer to onnx_dir/model.onnx along with its
+    tokenizer and pooling settings. Needs torch and sentence-transformers.
+    """
+    import torch
+
+    model = load_sentence_transformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    transformer.config.return_dict = False
+    tokenizer = model.tokenizer
+
+    os.makedirs(onnx_dir, exist_ok=True)
+    tokenizer.save_pretrained(onnx_dir)
+
+    sample = tokenizer(["an example query"], return_tensors="pt")
+    input_names = [
+        n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample
+    ]
+    dynamic_axes = {n: {0: "batch", 1: "sequence"} for n in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[n] for n in input_names),
+            os.path.join(onnx_dir, ONNX_FILES["onnx"]),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+
+    module_names = [type(m).__name__ for m in model]
+    pooling = model[1].get_pooling_mode_str() if len(model) > 1 else "mean"
+    return {
+        "model_name": model_name,
+        "dim": model.get_sentence_embedding_dimension(),
+        "max_length": model.max_seq_length,
+        "pooling": "cls" if pooling == "cls" else "mean",
+        "normalize": "Normalize" in module_names,
+        "pad_id": tokenizer.pad_token_id or 0,
+        "pad_token": tokenizer.pad_token or "[PAD]",
+    }
+
+
+def quantize_onnx(onnx_dir: str):
+    """Write the dynamically int8-quantized copy of model.onnx."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(
+        os.path.join(onnx_dir, ONNX_FILES["onnx"]),
+        os.path.join(onnx_dir, ONNX_FILES["onnx-int8"]),
+        weight_type=QuantType.QInt8,
+    )
+
+
+def save_meta(onnx_dir: str, meta: dict):
+    with open(os.path.join(onnx_dir, ENCODER_META), "w") as f:
+        json.dump(meta, f, indent=2)
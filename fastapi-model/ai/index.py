@@ -0,0 +1,283 @@
+"""
+FAISS index construction, tuning and persistence for the Retriever.
+
+Supported index types:
+- "flat":     exact L2 search (IndexFlatL2), no training
+- "ivf_flat": inverted file with full vectors; tune with `nprobe`
+- "hnsw":     HNSW graph; tune with `ef_search`
+- "ivf_pq":   inverted file with product-quantized codes; tune with `nprobe`
+
+Trained indexes are written next to the embeddings as
+`faiss_<index_type>.index` and reloaded on the next start, as long as they
+are newer than the embeddings file, hold the same number of vectors and were
+built with the same parameters (recorded in `faiss_<index_type>.index.json`).
+
+With mmap=True every index type (including flat) is persisted and read back
+memory-mapped, so several worker processes on one box share a single
+page-cached copy of the vectors instead of each holding a private one.
+"""
+
+import inspect
+import json
+import math
+import os
+from typing import Optional
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# build_index arguments that change what each index type holds; a persisted
+# index is only reused when these match the ones it was built with
+BUILD_PARAMS = {
+    "flat": (),
+    "ivf_flat": ("nlist", "train_sample", "seed"),
+    "hnsw": ("hnsw_m", "ef_construction"),
+    "ivf_pq": ("nlist", "pq_m", "pq_nbits", "train_sample", "seed"),
+}
+
+
+def index_path(data_dir: str, index_type: str) -> str:
+    return os.path.join(data_dir, f"faiss_{index_type}.index")
+
+
+def params_path(path: str) -> str:
+    return f"{path}.json"
+
+
+def default_nlist(n_vectors: int) -> int:
+    """Rule-of-thumb number of IVF cells: ~4*sqrt(n), with >= 39 points per cell."""
+    nlist = int(4 * math.sqrt(max(1, n_vectors)))
+    return max(1, min(nlist, n_vectors // 39 or 1))
+
+
+def _pq_subquantizers(d: int, requested: int) -> int:
+    # PQ needs d divisible by the number of sub-quantizers.
+    m = min(requested, d)
+    while d % m:
+        m -= 1
+    return m
+
+
+def build_index(
+    embeddings: np.ndarray,
+    index_type: str = "flat",
+    nlist: Optional[int] = None,
+    hnsw_m: int = 32,
+    ef_construction: int = 200,
+    pq_m: int = 16,
+    pq_nbits: int = 8,
+    train_sample: int = 100_000,
+    seed: int = 0,
+) -> "faiss.Index":
+    """Create, train (if needed) and fill a CPU index of `index_type`."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(
+            f"Unknown index_type '{index_type}'. Expected one of {INDEX_TYPES}."
+        )
+    n, d = embeddings.shape
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(d)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(d, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        nlist = nlist or default_nlist(n)
+        quantizer = faiss.IndexFlatL2(d)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, d, nlist)
+        else:
+            m = _pq_subquantizers(d, pq_m)
+            # PQ training needs at least 2**nbits points per sub-quantizer.
+            nbits = pq_nbits if n >= (1 << pq_nbits) else max(1, int(math.log2(n)))
+            index = faiss.IndexIVFPQ(quantizer, d, nlist, m, nbits)
+
+    if not index.is_trained:
+        rng = np.random.default_rng(seed)
+        if n > train_sample:
+            sample = embeddings[np.sort(rng.choice(n, train_sample, replace=False))]
+        else:
+            sample = embeddings
+        index.train(np.ascontiguousarray(sample, dtype=np.float32))
+
+    index.add(embeddings)
+    return index
+
+
+def configure_search(
+    index: "faiss.Index",
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+):
+    """Apply query-time knobs to whichever index type this is."""
+    ivf = None
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        pass
+    if ivf is not None and nprobe:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    if hasattr(index, "hnsw") and ef_search:
+        index.hnsw.efSearch = ef_search
+
+
+def filtered_search_params(index: "faiss.Index", allowed: np.ndarray):
+    """
+    SearchParameters restricting `index.search` to rows where the boolean
+    mask `allowed` is True, keeping the index's current nprobe / efSearch.
+
+    Returns (params, bitmap); keep `bitmap` alive until the search is done,
+    FAISS only holds a raw pointer to it.
+    """
+    bitmap = np.packbits(allowed, bitorder="little")
+    selector = faiss.IDSelectorBitmap(len(allowed), faiss.swig_ptr(bitmap))
+
+    ivf = None
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        pass
+    if ivf is not None:
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+    elif hasattr(index, "hnsw"):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    return params, bitmap
+
+
+def _mmap_read_flags(index_type: str) -> int:
+    # Flat codes (flat and HNSW storage) can be mapped zero-copy with
+    # IO_FLAG_MMAP_IFC; IVF indexes map their inverted lists with IO_FLAG_MMAP.
+    if index_type in ("flat", "hnsw") and hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        return faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+    return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+
+
+def _remove_if_exists(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def build_params(index_type: str, **build_kwargs) -> dict:
+    """The BUILD_PARAMS of `index_type`, with build_index defaults filled in."""
+    defaults = inspect.signature(build_index).parameters
+    return {
+        name: build_kwargs.get(name, defaults[name].default)
+        for name in BUILD_PARAMS[index_type]
+    }
+
+
+def read_index_params(path: str) -> Optional[dict]:
+    """Build parameters recorded next to the index at `path`, if any."""
+    try:
+        with open(params_path(path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_index(index: "faiss.Index", path: str, params: Optional[dict] = None):
+    # Write to a temp file and rename, so workers starting concurrently
+    # never read a half-written index.
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    faiss.write_index(index, tmp_path)
+    if params is not None:
+        # Drop the old parameters first: a reader seeing the new index
+        # without them rebuilds rather than trusting a stale record.
+        _remove_if_exists(params_path(path))
+    os.replace(tmp_path, path)
+    if params is not None:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(params, f)
+        os.replace(tmp_path, params_path(path))
+
+
+def load_or_build_index(
+    embeddings: np.ndarray,
+    data_dir: str,
+    index_type: str = "flat",
+    embeddings_path: Optional[str] = None,
+    persist: bool = True,
+    mmap: bool = False,
+    **build_kwargs,
+) -> "faiss.Index":
+    """
+    Load a persisted index of `index_type` if it is up to date, otherwise
+    build it and (for trained index types, or any type with mmap) save it
+    for the next start.
+    """
+    path = index_path(data_dir, index_type)
+    n, d = embeddings.shape
+    persist = persist or mmap
+    read_flags = _mmap_read_flags(index_type) if mmap else 0
+    params = build_params(index_type, **build_kwargs)
+
+    if persist and os.path.exists(path):
+        fresh = embeddings_path is None or (
+            os.path.getmtime(path) >= os.path.getmtime(embeddings_path)
+        )
+        # flat indexes have no parameters, so they need no record
+        if fresh and (read_index_params(path) or {}) != params:
+            print(f"Retriever: {path} was built with other parameters than {params}")
+            fresh = False
+        if fresh:
+            index = faiss.read_index(path, read_flags)
+            if index.ntotal == n and index.d == d:
+                print(f"Retriever: Loaded persisted FAISS index from {path}")
+                return index
+        print(f"Retriever: Persisted FAISS index {path} is stale; rebuilding...")
+
+    index = build_index(embeddings, index_type=index_type, **build_kwargs)
+
+    # A flat index is just the vectors, so rebuilding it is as cheap as loading
+    # unless it is being shared across processes.
+    if persist and (index_type != "flat" or mmap):
+        print(f"Retriever: Saving FAISS index to {path} ...")
+        save_index(index, path, params)
+        if mmap:
+            # Swap the private copy for the shared mapping.
+            index = faiss.read_index(path, read_flags)
+    return index
+
+
+def update_persisted_indexes(
+    data_dir: str,
+    old_hashes: Optional[np.ndarray],
+    new_hashes: np.ndarray,
+    embeddings: np.ndarray,
+):
+    """
+    Bring persisted indexes in line with a rebuilt embed.npy.
+
+    When the previous vectors (by content hash) are an unchanged prefix of
+    the new ones, the new vectors are appended to each persisted index (IVF
+    centroids and HNSW graphs are reused as-is, and so is the record of their
+    build parameters). Otherwise the index is deleted so the Retriever
+    rebuilds it on the next start.
+    """
+    n_old = 0 if old_hashes is None else len(old_hashes)
+    is_append = (
+        old_hashes is not None
+        and len(new_hashes) >= n_old
+        and np.array_equal(new_hashes[:n_old], old_hashes)
+    )
+    for index_type in INDEX_TYPES:
+        path = index_path(data_dir, index_type)
+        if not os.path.exists(path):
+            continue
+        if is_append:
+            index = faiss.read_index(path)
+            if index.ntotal == n_old:
+                if len(new_hashes) > n_old:
+                    index.add(np.ascontiguousarray(embeddings[n_old:]))
+                print(f"Appended {len(new_hashes) - n_old} vectors to {path}")
+                save_index(index, path)
+                continue
+        print(f"Removing stale FAISS index {path}; it will be rebuilt on startup.")
+        os.remove(path)
+        _remove_if_exists(params_path(path))
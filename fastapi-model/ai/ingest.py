@@ -0,0 +1,346 @@
+"""
+Chunked, multi-process ingestion of the college CSVs.
+
+Every source CSV is streamed with pd.read_csv(chunksize=...) and mapped onto
+one record schema (COMMON_COLUMNS) by a per-source mapper. The same
+(institute, program) appears in many rows (one per category, quota and
+round; sources without programs group by institute and stream), so what gets
+embedded is the row's group text (describe_group), not
+the row itself. Per chunk, the group texts are hashed and looked up in the
+VectorCache; only new texts go to the encoder, normally a SentenceTransformer
+multi-process pool with one worker per core. Each chunk is then written as a
+shard:
+
+    shards/
+        manifest.json       # model, dim and the shard list
+        00000.npy           # (rows, d) float32 vectors
+        00000.hashes.npy    # (rows,) content hashes of the group texts
+        00000/              # CollegeStore with the shard's rows
+
+merge_shards() stitches the shards into the embed.npy + college_store pair
+the Retriever memory-maps. embed.npy holds one vector per distinct group
+(in order of first appearance), streamed one shard at a time into an
+np.lib.format.open_memmap file; the store keeps every row, with a
+`group_id` column giving the row's vector; its columns are streamed the same
+way. Peak memory is about one chunk of rows and vectors plus a few bytes of
+hashes and group IDs per row, whatever the number or size of the sources.
+"""
+
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ai.store import CollegeStore
+from ai.vector_cache import VectorCache, content_hashes
+
+SHARD_MANIFEST = "manifest.json"
+
+# Columns every source is mapped onto, and which of them are numeric.
+COMMON_COLUMNS = [
+    "institute_short",
+    "institute_type",
+    "program_name",
+    "stream",
+    "category",
+    "quota",
+    "closing_rank",
+    "round_no",
+    "state",
+    "rating",
+    "source",
+]
+NUMERIC_COLUMNS = {"closing_rank", "round_no", "rating"}
+# Category spellings of the different sources, mapped onto the JoSAA ones.
+CATEGORY_ALIASES = {"UR": "GEN", "OPEN": "GEN", "GENERAL": "GEN"}
+
+
+def _lowercase_columns(chunk: pd.DataFrame) -> pd.DataFrame:
+    return chunk.rename(columns={c: c.strip().lower() for c in chunk.columns})
+
+
+def map_counselling(chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    JoSAA-style closing-rank tables (Engineering.csv, combined_college_data.csv):
+    already snake_case. combined_college_data.csv has no program_name column;
+    its rows keep the program missing rather than guessing it from the
+    stream (see describe_group and the scorer's MISSING_PROGRAM).
+    """
+    chunk = _lowercase_columns(chunk)
+    for col in ("institute_short", "category", "closing_rank"):
+        if col not in chunk.columns:
+            raise ValueError(f"Missing required column: {col}")
+    return chunk
+
+
+def map_medical_scores(chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    medical_clg_score.csv. Only the state-quota ranks are taken: the
+    All India quota rows are already part of combined_college_data.csv.
+    The file names no program.
+    """
+    return pd.DataFrame(
+        {
+            "institute_short": chunk["College_Name"],
+            "institute_type": "Medical College",
+            "stream": "Medical",
+            "category": chunk["Category"],
+            "quota": "State",
+            "closing_rank": chunk["StateQuota_ClosingRank"],
+            "round_no": chunk["Round"],
+            "state": chunk["State"],
+        }
+    )
+
+
+def map_college_ratings(chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agriculture.csv / Arts.csv: college ratings without closing ranks. They
+    get category "ALL" and no closing_rank, so rank-based endpoints skip them.
+    """
+    return pd.DataFrame(
+        {
+            "institute_short": chunk["College_Name"],
+            "stream": chunk["Stream"],
+            "category": "ALL",
+            "state": chunk["State"],
+            "rating": chunk["Rating"],
+        }
+    )
+
+
+@dataclass
+class Source:
+    path: str
+    mapper: Callable[[pd.DataFrame], pd.DataFrame]
+
+
+def to_common_schema(chunk: pd.DataFrame, source: str) -> pd.DataFrame:
+    """
+    Project a mapped chunk onto COMMON_COLUMNS with fixed dtypes; categories
+    are normalized with CATEGORY_ALIASES so every source shares them.
+    """
+    out = pd.DataFrame(index=pd.RangeIndex(len(chunk)))
+    chunk = chunk.reset_index(drop=True)
+    for col in COMMON_COLUMNS:
+        values = chunk[col] if col in chunk.columns else None
+        if col in NUMERIC_COLUMNS:
+            out[col] = (
+                np.nan
+                if values is None
+                else pd.to_numeric(values, errors="coerce").astype(np.float64)
+            )
+        elif values is None:
+            out[col] = pd.Series([None] * len(chunk), dtype=object)
+        else:
+            out[col] = values.astype(object).where(values.notna(), None)
+    out["category"] = out["category"].replace(CATEGORY_ALIASES)
+    out["source"] = source
+    return out
+
+
+def _program_or_stream(df: pd.DataFrame) -> pd.Series:
+    """The program name, or "<stream> programs" for rows without one."""
+    return (
+        df["program_name"]
+        .where(df["program_name"].notna(), df["stream"].astype(str) + " programs")
+        .astype(str)
+    )
+
+
+def describe(df: pd.DataFrame) -> pd.Series:
+    """
+    Readable description of each row, stored as `full_description`. (The
+    embedded text is the row's group text, see describe_group.)
+    """
+    described = (
+        df["institute_short"].astype(str)
+        + " offers "
+        + _program_or_stream(df)
+        + " ("
+        + df["category"].astype(str)
+        + ") "
+    )
+    has_rank = df["closing_rank"].notna()
+    ranks = df["closing_rank"].astype("Int64").astype(str)
+    unranked = " in " + df["state"].astype(str) + " rated " + df["rating"].astype(str)
+    return described + np.where(has_rank, " with closing rank " + ranks, unranked)
+
+
+def describe_group(df: pd.DataFrame) -> pd.Series:
+    """
+    Text embedded for a row's (institute, program) group, or (institute,
+    stream) for rows without a program, e.g. "IIT-Bombay (IIT) offers
+    Engineering programs". Category, quota, round and closing rank are left
+    out: they are filtered and scored on, not searched for. So is the state,
+    which only some sources give for the same institute: the text is also
+    the group key, and the institute would split into two groups.
+    """
+    kind = df["institute_type"]
+    kind = np.where(kind.notna(), " (" + kind.astype(str) + ")", "")
+    return (
+        df["institute_short"].astype(str) + kind + " offers " + _program_or_stream(df)
+    )
+
+
+def iter_chunks(sources: List[Source], chunksize: int) -> Iterator[pd.DataFrame]:
+    """Yield common-schema chunks from every source that exists."""
+    for source in sources:
+        if not os.path.exists(source.path):
+            print(f"Skipping missing source {source.path}")
+            continue
+        name = os.path.splitext(os.path.basename(source.path))[0]
+        for chunk in pd.read_csv(source.path, chunksize=chunksize):
+            df = to_common_schema(source.mapper(chunk), name)
+            df["full_description"] = describe(df)
+            yield df
+
+
+def write_shards(
+    sources: List[Source],
+    shard_dir: str,
+    cache: VectorCache,
+    model_name: str,
+    encode_fn: Callable[[List[str]], np.ndarray],
+    chunksize: int = 8192,
+) -> dict:
+    """
+    Stream `sources` into shards under `shard_dir`, encoding only texts the
+    cache doesn't have. Returns the shard manifest.
+    """
+    if os.path.isdir(shard_dir):
+        shutil.rmtree(shard_dir)
+    os.makedirs(shard_dir)
+
+    shards, dim, n_encoded = [], None, 0
+    for i, df in enumerate(iter_chunks(sources, chunksize)):
+        texts = describe_group(df).tolist()
+        hashes = content_hashes(texts, model_name)
+        n_encoded += cache.encode_missing(texts, hashes, encode_fn)
+        vectors = cache.get(hashes)
+        dim = vectors.shape[1]
+
+        name = f"{i:05d}"
+        np.save(os.path.join(shard_dir, f"{name}.npy"), vectors)
+        np.save(os.path.join(shard_dir, f"{name}.hashes.npy"), hashes)
+        CollegeStore.from_dataframe(df).save(os.path.join(shard_dir, name))
+        shards.append({"name": name, "source": df["source"].iat[0], "rows": len(df)})
+        print(
+            f"Shard {name}: {len(df)} rows from {shards[-1]['source']} "
+            f"({n_encoded} encoded so far)"
+        )
+
+    manifest = {"model": model_name, "dim": dim, "shards": shards}
+    with open(os.path.join(shard_dir, SHARD_MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_manifest(shard_dir: str) -> dict:
+    with open(os.path.join(shard_dir, SHARD_MANIFEST), "r") as f:
+        return json.load(f)
+
+
+def shard_row_hashes(shard_dir: str, manifest: Optional[dict] = None) -> np.ndarray:
+    manifest = manifest or load_manifest(shard_dir)
+    return np.concatenate(
+        [
+            np.load(os.path.join(shard_dir, f"{s['name']}.hashes.npy"))
+            for s in manifest["shards"]
+        ]
+    )
+
+
+def group_rows(row_hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (group_id per row, hash per group): rows with the same hash share a
+    group, numbered in order of first appearance, so appending rows never
+    renumbers existing groups.
+    """
+    unique, first, inverse = np.unique(
+        row_hashes, return_index=True, return_inverse=True
+    )
+    order = np.argsort(first, kind="stable")
+    group_of_unique = np.empty(len(order), dtype=np.int32)
+    group_of_unique[order] = np.arange(len(order), dtype=np.int32)
+    return group_of_unique[inverse.reshape(-1)], unique[order]
+
+
+def merge_shards(
+    shard_dir: str,
+    embeddings_path: str,
+    store_path: str,
+    manifest: Optional[dict] = None,
+    write_embeddings: bool = True,
+    group_ids: Optional[np.ndarray] = None,
+) -> CollegeStore:
+    """
+    Stitch the shards into embed.npy, one vector per group, and a single
+    CollegeStore at `store_path` whose `group_id` column maps each row to
+    its vector. Both are written through memory-mapped output files, one
+    shard at a time; only the per-row group IDs are held in full.
+    """
+    manifest = manifest or load_manifest(shard_dir)
+    shards = manifest["shards"]
+    if group_ids is None:
+        group_ids, _ = group_rows(shard_row_hashes(shard_dir, manifest))
+    n_groups = int(group_ids.max()) + 1 if len(group_ids) else 0
+
+    if write_embeddings:
+        tmp_path = embeddings_path + ".tmp.npy"
+        out = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=np.float32, shape=(n_groups, manifest["dim"])
+        )
+        seen = np.zeros(n_groups, dtype=bool)
+        offset = 0
+        for s in shards:
+            vectors = np.load(
+                os.path.join(shard_dir, f"{s['name']}.npy"), mmap_mode="r"
+            )
+            groups = group_ids[offset : offset + len(vectors)]
+            # the first row of each group not written yet
+            _, first = np.unique(groups, return_index=True)
+            first = first[~seen[groups[first]]]
+            out[groups[first]] = vectors[first]
+            seen[groups[first]] = True
+            offset += len(vectors)
+        out.flush()
+        del out
+        os.replace(tmp_path, embeddings_path)
+
+    # shards are memory-mapped, and written out one column of one shard at
+    # a time
+    return CollegeStore.save_concat(
+        [
+            CollegeStore.load(os.path.join(shard_dir, s["name"]), mmap=True)
+            for s in shards
+        ],
+        store_path,
+        extra_columns={"group_id": group_ids},
+    )
+
+
+def multi_process_encoder(model, workers: Optional[int] = None, batch_size: int = 64):
+    """
+    (encode_fn, close_fn) for a SentenceTransformer. With more than one worker
+    it uses start_multi_process_pool; otherwise it encodes in-process.
+    """
+    workers = os.cpu_count() if workers is None else workers
+    if workers <= 1:
+        return (
+            lambda texts: model.encode(
+                texts, batch_size=batch_size, show_progress_bar=True
+            ),
+            lambda: None,
+        )
+
+    pool = model.start_multi_process_pool(target_devices=["cpu"] * workers)
+
+    def encode(texts: List[str]) -> np.ndarray:
+        return model.encode_multi_process(texts, pool, batch_size=batch_size)
+
+    return encode, lambda: model.stop_multi_process_pool(pool)
@@ -0,0 +1,177 @@
+"""
+Background jobs for LLM counseling.
+
+The ML stage answers in milliseconds and the LLM stage in seconds, so the
+job endpoints return the ML result at once and leave the justification to
+a fixed pool of worker tasks. Each job accumulates its text as it streams;
+clients poll the job or follow() it. The pool size bounds LLM concurrency
+for job traffic independently of request QPS, and a failed job can be
+re-queued without redoing retrieval or scoring.
+
+Jobs live in this process's memory: finished jobs expire after `ttl`
+seconds, and with several uvicorn workers a client must reach the worker
+that created its job (e.g. sticky sessions).
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+@dataclass
+class Job:
+    payload: Any = None
+    # who submitted it; only they may see, follow or retry it
+    user_id: Optional[str] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = QUEUED
+    chunks: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    # notified whenever text arrives or the status changes
+    _changed: asyncio.Condition = field(default_factory=asyncio.Condition, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def append(self, chunk: str):
+        self.chunks.append(chunk)
+        await self._notify()
+
+    async def set_status(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.error = error
+        if self.finished:
+            self.finished_at = time.time()
+        await self._notify()
+
+    async def follow(self) -> AsyncIterator[str]:
+        """Yield the text so far, then new chunks until the job finishes."""
+        sent = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(
+                    lambda: len(self.chunks) > sent or self.finished
+                )
+            new, sent = self.chunks[sent:], len(self.chunks)
+            for chunk in new:
+                yield chunk
+            if self.finished and sent == len(self.chunks):
+                return
+
+
+class JobQueueFull(Exception):
+    """Raised by submit() when `max_pending` jobs are already waiting."""
+
+
+class JobManager:
+    def __init__(
+        self,
+        handler: Callable[[Job], Awaitable[None]],
+        workers: int = 4,
+        max_pending: int = 256,
+        ttl: float = 15 * 60,
+    ):
+        """
+        Args:
+            handler: coroutine that does a job's work (appending its text);
+                an exception marks the job failed
+            workers: jobs processed concurrently
+            max_pending: queued jobs allowed before submit() rejects
+            ttl: seconds a finished job stays retrievable
+        """
+        self.handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _evict(self):
+        """Forget finished jobs older than ttl (jobs are kept in creation order)."""
+        now = time.time()
+        for job_id in list(self._jobs):
+            job = self._jobs[job_id]
+            if now - job.created_at < self.ttl:
+                break
+            if job.finished and now - job.finished_at >= self.ttl:
+                del self._jobs[job_id]
+
+    def create(self, payload: Any = None, user_id: Optional[str] = None) -> Job:
+        """Register a job without queueing it (e.g. when it can finish inline)."""
+        self._evict()
+        job = Job(payload=payload, user_id=user_id)
+        self._jobs[job.id] = job
+        return job
+
+    def submit(self, job: Job):
+        if self._queue is None:
+            raise RuntimeError("JobManager.start() has not been called.")
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFull() from None
+
+    async def retry(self, job: Job):
+        """Re-queue a failed job from scratch, keeping its payload."""
+        # QUEUED goes first: once submitted, a worker may mark it RUNNING
+        failed = job.status, job.error
+        await job.set_status(QUEUED)
+        try:
+            self.submit(job)
+        except JobQueueFull:
+            await job.set_status(*failed)
+            raise
+        job.chunks.clear()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await job.set_status(RUNNING)
+                await self.handler(job)
+                await job.set_status(DONE)
+            except asyncio.CancelledError:
+                await job.set_status(FAILED, "Server shutting down.")
+                raise
+            except Exception as e:
+                logging.error("Counseling job %s failed: %s", job.id, e)
+                await job.set_status(FAILED, str(e))
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, int]:
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {**counts, "workers": self.workers, "max_pending": self.max_pending}
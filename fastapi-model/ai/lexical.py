@@ -0,0 +1,239 @@
+"""
+Inverted index over the short name columns of the store, for interests that
+are literal program, stream or institute names.
+
+Most interest lists name what the student wants outright ("Computer
+Science", "Mechanical", "Aerospace"). Matching those words against the
+`program_name`, `institute_short` and `stream` tokens answers the query
+without the encoder or the ANN index. A query term matches a token exactly,
+or as a prefix of at least MIN_PREFIX characters ("mech" -> "mechanical").
+
+Each comma-separated interest is one part. The query is *covered* when every
+part has a document that contains all of the part's terms as exact tokens of
+an ANSWER_FIELDS column (its program or stream); the Retriever then serves
+those documents directly. Institute names and prefix matches only rank
+partial matches: "engineering" must not be answered by "College Of
+Engineering" in the Agriculture stream, nor "art" by "artificial ..."
+documents, without a vector search. Otherwise the partial matches can be
+fused with the vector results (see reciprocal_rank_fusion).
+
+Documents are the Retriever's vectors: one per (institute, program) group
+(institute and stream for rows without a program), or one per row for
+stores without a `group_id` column. Documents without a program match on
+their stream and institute tokens only. The columns are categorical, so
+each distinct value is tokenized only once.
+"""
+
+import math
+import re
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ai.store import CollegeStore
+
+# field -> weight of a match in that field
+DEFAULT_FIELDS = {"program_name": 3.0, "stream": 2.0, "institute_short": 1.0}
+# fields that say what a document offers, so exact matches in them can answer
+# a query; a match elsewhere (the institute's name) only ranks partial matches
+ANSWER_FIELDS = frozenset({"program_name", "stream"})
+STOPWORDS = frozenset(
+    {"a", "an", "and", "at", "for", "in", "of", "on", "or", "the", "to", "with"}
+)
+MIN_PREFIX = 3
+# a prefix match counts this much of an exact one
+PREFIX_WEIGHT = 0.5
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(str(text).lower()) if t not in STOPWORDS]
+
+
+def query_parts(query: str) -> List[List[str]]:
+    """Distinct, non-empty token lists of the comma-separated interests."""
+    parts = {}
+    for part in query.split(","):
+        tokens = list(dict.fromkeys(tokenize(part)))
+        if tokens:
+            parts.setdefault(tuple(tokens), tokens)
+    return list(parts.values())
+
+
+def reciprocal_rank_fusion(rankings: Sequence[np.ndarray], k: int = 60) -> np.ndarray:
+    """
+    Merge ranked ID lists by summing 1 / (k + rank) per ID, best first.
+    Ties keep the order in which IDs first appear.
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(np.asarray(ranking).tolist()):
+            scores[doc] = scores.get(doc, 0.0) + 1.0 / (k + rank + 1)
+    return np.fromiter(
+        sorted(scores, key=lambda doc: -scores[doc]), dtype=np.int64, count=len(scores)
+    )
+
+
+@dataclass
+class LexicalMatch:
+    # documents that contain every term of some part exactly, best first
+    complete: np.ndarray
+    # documents that contain at least one term, best first
+    partial: np.ndarray
+    # every part is fully matched by at least one document
+    covered: bool
+
+
+class LexicalIndex:
+    def __init__(
+        self,
+        store: CollegeStore,
+        doc_rows: Optional[np.ndarray] = None,
+        fields: Optional[Dict[str, float]] = None,
+        answer_fields: Optional[frozenset] = None,
+    ):
+        """
+        Args:
+            store: metadata store with categorical name columns
+            doc_rows: store row holding each document's names (-1 for a
+                document without rows); default one document per row
+            fields: column -> match weight (default DEFAULT_FIELDS); columns
+                missing from the store or not categorical are skipped
+            answer_fields: columns whose exact matches can cover a query
+                (default ANSWER_FIELDS)
+        """
+        self.n_docs = len(store) if doc_rows is None else len(doc_rows)
+        answer_fields = ANSWER_FIELDS if answer_fields is None else answer_fields
+        # token -> [(field weight, whether the field answers, sorted document IDs)]
+        self._postings: Dict[str, List[Tuple[float, bool, np.ndarray]]] = {}
+        # tokens per document, to rank exact names above longer ones
+        self.doc_lengths = np.zeros(self.n_docs, dtype=np.int32)
+
+        for name, weight in (fields or DEFAULT_FIELDS).items():
+            if name not in store.categories:
+                continue
+            codes = np.asarray(store.columns[name])
+            if doc_rows is not None:
+                codes = np.where(doc_rows >= 0, codes[np.maximum(doc_rows, 0)], -1)
+            values = store.categories[name]
+
+            # documents of category code c: order[starts[c] : starts[c + 1]]
+            order = np.argsort(codes, kind="stable")
+            starts = np.searchsorted(codes[order], np.arange(len(values) + 1))
+            token_codes: Dict[str, List[int]] = {}
+            lengths = np.zeros(len(values) + 1, dtype=np.int32)
+            for code, value in enumerate(values):
+                tokens = tokenize(value)
+                lengths[code] = len(tokens)
+                for token in dict.fromkeys(tokens):
+                    token_codes.setdefault(token, []).append(code)
+            # code -1 (missing) picks the trailing zero
+            self.doc_lengths += lengths[codes]
+
+            for token, token_code_list in token_codes.items():
+                docs = np.concatenate(
+                    [order[starts[c] : starts[c + 1]] for c in token_code_list]
+                )
+                self._postings.setdefault(token, []).append(
+                    (weight, name in answer_fields, np.sort(docs))
+                )
+
+        self._vocab = sorted(self._postings)
+        self._answer_tokens = {
+            token
+            for token, postings in self._postings.items()
+            if any(answers for _, answers, _ in postings)
+        }
+        self._idf = {}
+        for token, postings in self._postings.items():
+            df = len(np.unique(np.concatenate([docs for _, _, docs in postings])))
+            self._idf[token] = math.log(1.0 + self.n_docs / max(df, 1))
+
+    def __len__(self) -> int:
+        return len(self._vocab)
+
+    def _matching_tokens(self, term: str) -> List[Tuple[str, float]]:
+        """(token, factor) for the exact token and, if long enough, prefixes."""
+        matches = [(term, 1.0)] if term in self._postings else []
+        if len(term) >= MIN_PREFIX:
+            i = bisect_left(self._vocab, term)
+            while i < len(self._vocab) and self._vocab[i].startswith(term):
+                if self._vocab[i] != term:
+                    matches.append((self._vocab[i], PREFIX_WEIGHT))
+                i += 1
+        return matches
+
+    def knows(self, query: str) -> bool:
+        """
+        Whether every term of `query` is an exact token of an answering
+        field, i.e. whether the query can be covered at all (a cheap
+        pre-check).
+        """
+        parts = query_parts(query)
+        return bool(parts) and all(
+            term in self._answer_tokens for terms in parts for term in terms
+        )
+
+    def _term_scores(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Per-document score of one term (its best field and token match), and
+        which documents contain it as an exact token of an answering field.
+        """
+        scores = np.zeros(self.n_docs)
+        exact = np.zeros(self.n_docs, dtype=bool)
+        for token, factor in self._matching_tokens(term):
+            idf = self._idf[token]
+            for weight, answers, docs in self._postings[token]:
+                scores[docs] = np.maximum(scores[docs], weight * factor * idf)
+                if answers and token == term:
+                    exact[docs] = True
+        return scores, exact
+
+    def _rank(self, docs: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        """`docs` by score, then shorter names, then document ID."""
+        order = np.lexsort((docs, self.doc_lengths[docs], -scores[docs]))
+        return docs[order]
+
+    def match(
+        self, query: str, mask: Optional[np.ndarray] = None, limit: int = 100
+    ) -> LexicalMatch:
+        """
+        Documents matching `query`, restricted to `mask` (a boolean array
+        over documents) when given. Each ranking holds at most `limit` IDs.
+        """
+        empty = np.empty(0, dtype=np.int64)
+        parts = query_parts(query)
+        if not parts:
+            return LexicalMatch(empty, empty, False)
+
+        term_scores: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        total = np.zeros(self.n_docs)
+        complete_rankings = []
+        for terms in parts:
+            part_score = np.zeros(self.n_docs)
+            full = np.ones(self.n_docs, dtype=bool) if mask is None else mask.copy()
+            for term in terms:
+                if term not in term_scores:
+                    term_scores[term] = self._term_scores(term)
+                scores, exact = term_scores[term]
+                part_score += scores
+                full &= exact
+            total += part_score
+            complete_rankings.append(
+                self._rank(np.flatnonzero(full), part_score)[:limit]
+            )
+
+        matched = total > 0
+        if mask is not None:
+            matched &= mask
+        partial = self._rank(np.flatnonzero(matched), total)[:limit]
+        covered = all(len(r) for r in complete_rankings)
+        if len(complete_rankings) == 1:
+            complete = complete_rankings[0]
+        else:
+            # interleave the parts so one interest can't crowd out the others
+            complete = reciprocal_rank_fusion(complete_rankings)[:limit]
+        return LexicalMatch(complete, partial, covered)
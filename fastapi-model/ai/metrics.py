@@ -0,0 +1,274 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters and histograms are kept per label set under one lock, so they can
+be updated from the event loop and from threadpool workers alike. Gauges are
+read from a callback when /metrics is scraped, which suits values another
+component already tracks (queue depths, the serving version).
+
+With several uvicorn workers every process has its own metrics; scrape each
+worker (or run one worker per container) and aggregate in Prometheus.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets (seconds) from sub-millisecond FAISS searches to LLM calls
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """Exposition lines for every label set, without HELP/TYPE."""
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.kind}",
+            *self._samples(),
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, k)} {_format_number(v)}"
+            for k, v in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the `with` block (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1])) for k, v in self._values.items())
+        names = self.labelnames + ("le",)
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                labels = _format_labels(names, key + (_format_number(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float]):
+        super().__init__(name, help)
+        self.fn = fn
+
+    def _samples(self) -> List[str]:
+        try:
+            value = self.fn()
+        except Exception as e:
+            logging.warning("Gauge %s failed: %s", self.name, e)
+            return []
+        return [f"{self.name} {_format_number(value)}"]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered.")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable[[], float]) -> Gauge:
+        return self._register(Gauge(name, help, fn))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Seconds per pipeline stage: lexical, encode, search, score, serialize,
+# prompt, llm_queue (admission wait) and llm_generate.
+STAGE_SECONDS = REGISTRY.histogram(
+    "counseling_stage_seconds", "Time spent in each counseling stage.", ["stage"]
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_seconds",
+    "Time to the response headers, by route.",
+    ["method", "route", "status"],
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "cache_requests_total", "Cache lookups by cache and result.", ["cache", "result"]
+)
+RATE_LIMIT_REJECTIONS = REGISTRY.counter(
+    "rate_limit_rejections_total", "Requests rejected by the rate limiter."
+)
+LLM_ADMISSION_REJECTIONS = REGISTRY.counter(
+    "llm_admission_rejections_total",
+    "LLM generations not admitted (templated fallback sent).",
+    ["reason"],
+)
+OLLAMA_RETRIES = REGISTRY.counter(
+    "ollama_retries_total", "Retried Ollama calls, by reason.", ["reason"]
+)
+RETRIEVAL_PATHS = REGISTRY.counter(
+    "retrieval_queries_total",
+    "Candidate searches by path: lexical (no encoder), hybrid or vector.",
+    ["path"],
+)
+
+
+# --- Request IDs in logs ---
+request_id_var: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "request_id", default="-"
+)
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds the current request's ID to every record as `request_id`."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+def configure_logging(level: int = logging.INFO, fmt: Optional[str] = None):
+    """basicConfig with the request ID in each line."""
+    logging.basicConfig(
+        level=level,
+        format=fmt
+        or "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s",
+    )
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(RequestIdFilter())
@@ -1,15 +1,34 @@
 # ai/ollamas.py
+import asyncio
 import logging
 import time
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Union
 
+import httpx
 import ollama
 
 # Replace with your project's AIPlatform base import if different
 from ai.base import AIPlatform
-from fastapi.concurrency import run_in_threadpool
+from ai.metrics import OLLAMA_RETRIES
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
 
-__all__ = ["Ollama", "OllamaPlatform"]
+__all__ = ["AsyncOllama", "Ollama", "OllamaPlatform"]
+
+
+async def _aclose_client(client: ollama.AsyncClient):
+    """
+    Close the httpx pool behind `client`. ollama.AsyncClient (0.5.x) builds
+    that pool itself and has no public close, so this reaches into its
+    private `_client`; should a later release rename it, the pool is left
+    to the garbage collector instead of failing the caller.
+    """
+    pool = getattr(client, "_client", None)
+    if isinstance(pool, httpx.AsyncClient):
+        await pool.aclose()
+    else:
+        logging.warning(
+            "ollama.AsyncClient has no httpx pool at `_client`; not closing it."
+        )
 
 
 class Ollama(AIPlatform):
@@ -19,6 +38,13 @@ class Ollama(AIPlatform):
     - Default: lazy connection (no network calls during import).
     - If you want the app to fail fast on startup when Ollama is unreachable,
       initialize with connect_on_init=True.
+    - Available models are cached for model_list_ttl seconds, so per-request
+      model selection is a dictionary lookup; stale entries are refreshed in
+      the background and the cache is dropped when generate reports a
+      missing model.
+    - keep_alive is sent with every generation so the model (and the KV
+      cache of the shared system-prompt prefix) stays loaded between
+      requests; pass the constant prompt as `system` to benefit.
     """
 
     def __init__(
@@ -28,16 +54,25 @@ class Ollama(AIPlatform):
         connect_on_init: bool = False,
         max_retries: int = 3,
         backoff_base: float = 0.5,
+        model_list_ttl: float = 60.0,
+        keep_alive: Optional[Union[float, str]] = "30m",
     ):
         self.requested_model = model
         self.host = host
         self.max_retries = max_retries
         self.backoff_base = backoff_base
+        self.model_list_ttl = model_list_ttl
+        self.keep_alive = keep_alive
 
         # set later by _connect_and_validate
         self.client: Optional[ollama.Client] = None
         self.active_model: Optional[str] = None
 
+        # lower-cased name -> served name, refreshed every model_list_ttl seconds
+        self._model_registry: Dict[str, str] = {}
+        self._registry_fetched_at: float = 0.0
+        self._registry_refresh_task: Optional[asyncio.Task] = None
+
         if connect_on_init:
             # This will raise ConnectionError if it fails repeatedly.
             self._connect_and_validate()
@@ -52,7 +87,13 @@ class Ollama(AIPlatform):
         Call client.list() and return a list of model names.
         Supports new ollama versions where .list() returns objects.
         """
-        raw = client.list()
+        return self._parse_model_list(client.list())
+
+    @staticmethod
+    def _parse_model_list(raw) -> List[str]:
+        """
+        Normalize the result of client.list() into a list of model names.
+        """
         if raw is None:
             return []
 
@@ -104,6 +145,30 @@ class Ollama(AIPlatform):
         )
         return available[0]
 
+    def _set_active_model(self, client, available: List[str]):
+        """
+        Store the connected client and pick the active model from `available`.
+        """
+        chosen = self._choose_model_from_available(available)
+        self.client = client
+        self._store_model_registry(available)
+        if chosen is None:
+            logging.warning(
+                "Connected to Ollama at %s but couldn't enumerate models. "
+                "Will keep requested model '%s' and try at runtime.",
+                self.host,
+                self.requested_model,
+            )
+            self.active_model = self.requested_model
+        else:
+            self.active_model = chosen
+            logging.info(
+                "Connected to Ollama at %s; using model '%s' (requested '%s').",
+                self.host,
+                self.active_model,
+                self.requested_model,
+            )
+
     def _connect_and_validate(self):
         """
         Try to create an ollama.Client and pick an active model.
@@ -114,28 +179,11 @@ class Ollama(AIPlatform):
             try:
                 client = self._create_client()
                 available = self._list_models_sync(client)
-                chosen = self._choose_model_from_available(available)
-                if chosen is None:
-                    logging.warning(
-                        "Connected to Ollama at %s but couldn't enumerate models. "
-                        "Will keep requested model '%s' and try at runtime.",
-                        self.host,
-                        self.requested_model,
-                    )
-                    self.client = client
-                    self.active_model = self.requested_model
-                else:
-                    self.client = client
-                    self.active_model = chosen
-                    logging.info(
-                        "Connected to Ollama at %s; using model '%s' (requested '%s').",
-                        self.host,
-                        self.active_model,
-                        self.requested_model,
-                    )
+                self._set_active_model(client, available)
                 return
             except Exception as exc:
                 last_exc = exc
+                OLLAMA_RETRIES.inc(reason="connect")
                 wait = self.backoff_base * (2 ** (attempt - 1))
                 logging.warning(
                     "Attempt %d/%d to connect to Ollama failed: %s; retrying in %.2fs",
@@ -158,27 +206,59 @@ class Ollama(AIPlatform):
             return
         await run_in_threadpool(self._connect_and_validate)
 
-    async def chat(self, prompt: str, model: Optional[str] = None) -> str:
+    async def _list_models_async(self) -> List[str]:
+        return await run_in_threadpool(self._list_models_sync, self.client)
+
+    # ---------- Model registry ----------
+
+    def _store_model_registry(self, available: List[str]):
+        self._model_registry = {m.lower(): m for m in available}
+        self._registry_fetched_at = time.monotonic()
+
+    def invalidate_models(self):
+        """Drop the cached model list; the next lookup refetches it."""
+        self._model_registry = {}
+        self._registry_fetched_at = 0.0
+
+    async def refresh_models(self) -> Dict[str, str]:
+        """Fetch the served models from Ollama and replace the cached registry."""
+        self._store_model_registry(await self._list_models_async())
+        return self._model_registry
+
+    async def _background_refresh(self):
+        try:
+            await self.refresh_models()
+        except Exception as exc:
+            logging.warning("Background refresh of Ollama model list failed: %s", exc)
+
+    async def _lookup_model_async(self, model: str) -> Optional[str]:
         """
-        Send prompt to Ollama and return a text string.
-        Optionally specify a transient `model` to use for this call.
+        Resolve `model` case-insensitively against the cached registry.
+        An empty registry is fetched inline; a stale one is served as-is
+        while a refresh runs in the background.
         """
-        model_to_use = model or self.active_model or self.requested_model
+        if not self._model_registry:
+            await self.refresh_models()
+        elif time.monotonic() - self._registry_fetched_at > self.model_list_ttl:
+            if (
+                self._registry_refresh_task is None
+                or self._registry_refresh_task.done()
+            ):
+                self._registry_refresh_task = asyncio.create_task(
+                    self._background_refresh()
+                )
+        return self._model_registry.get(model.lower())
 
-        # lazy connect if necessary
-        await self._ensure_client_async()
+    async def _resolve_model_async(self, model: Optional[str]) -> str:
+        """
+        Return the model name to use for this call, verifying a transient
+        `model` against the models available on the server.
+        """
+        model_to_use = model or self.active_model or self.requested_model
 
         # If user requested a different model for this call, verify availability
         if model and model != self.active_model:
-
-            def sync_check_model():
-                available = self._list_models_sync(self.client)
-                for m in available:
-                    if m.lower() == model.lower():
-                        return m
-                return None
-
-            chosen = await run_in_threadpool(sync_check_model)
+            chosen = await self._lookup_model_async(model)
             if chosen:
                 model_to_use = chosen
             else:
@@ -188,20 +268,78 @@ class Ollama(AIPlatform):
                     self.active_model,
                 )
                 model_to_use = self.active_model
+        return model_to_use
 
-        def sync_generate():
-            # call generate in a tolerant way across client versions
-            try:
-                return self.client.generate(
-                    model=model_to_use, prompt=prompt, stream=False
-                )
-            except TypeError:
-                return self.client.generate(
-                    prompt=prompt, model=model_to_use, stream=False
-                )
+    def _generate_kwargs(self, system: Optional[str]) -> dict:
+        kwargs = {}
+        if system:
+            kwargs["system"] = system
+        if self.keep_alive is not None:
+            kwargs["keep_alive"] = self.keep_alive
+        return kwargs
+
+    def _generate_sync(
+        self,
+        model: str,
+        prompt: str,
+        stream: bool = False,
+        system: Optional[str] = None,
+    ):
+        kwargs = self._generate_kwargs(system)
+        # call generate in a tolerant way across client versions
+        try:
+            return self.client.generate(
+                model=model, prompt=prompt, stream=stream, **kwargs
+            )
+        except TypeError:
+            return self.client.generate(
+                prompt=prompt, model=model, stream=stream, **kwargs
+            )
 
-        raw = await run_in_threadpool(sync_generate)
+    async def _generate_async(
+        self, model: str, prompt: str, system: Optional[str] = None
+    ):
+        return await run_in_threadpool(
+            self._generate_sync, model, prompt, False, system
+        )
+
+    async def _stream_async(
+        self, model: str, prompt: str, system: Optional[str] = None
+    ):
+        # Each chunk is pulled from the blocking client in its own threadpool
+        # hop, so no worker thread is held for the whole generation.
+        chunks = await run_in_threadpool(
+            self._generate_sync, model, prompt, True, system
+        )
+        async for chunk in iterate_in_threadpool(chunks):
+            yield chunk
+
+    def _fallback_for_missing_model(
+        self, exc: Exception, model_used: str
+    ) -> Optional[str]:
+        """
+        If `exc` says `model_used` is not on the server, invalidate the
+        registry and return the active model to retry with (None otherwise).
+        """
+        status_code = getattr(exc, "status_code", None)
+        if status_code != 404 and "not found" not in str(exc).lower():
+            return None
+        self.invalidate_models()
+        if not self.active_model or model_used == self.active_model:
+            return None
+        logging.warning(
+            "Model '%s' disappeared from Ollama; retrying with '%s'.",
+            model_used,
+            self.active_model,
+        )
+        OLLAMA_RETRIES.inc(reason="missing_model")
+        return self.active_model
 
+    @staticmethod
+    def _extract_text(raw) -> str:
+        """
+        Pull the generated text out of a generate() result or stream chunk.
+        """
         if raw is None:
             return ""
         if isinstance(raw, str):
@@ -225,5 +363,188 @@ class Ollama(AIPlatform):
             return str(raw.text)
         return str(raw)
 
+    async def chat(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        system: Optional[str] = None,
+    ) -> str:
+        """
+        Send prompt to Ollama and return a text string.
+        Optionally specify a transient `model` to use for this call, and a
+        `system` prompt (overrides the model's own).
+        """
+        # lazy connect if necessary
+        await self._ensure_client_async()
+        model_to_use = await self._resolve_model_async(model)
+
+        try:
+            raw = await self._generate_async(model_to_use, prompt, system)
+        except ollama.ResponseError as exc:
+            fallback = self._fallback_for_missing_model(exc, model_to_use)
+            if fallback is None:
+                raise
+            raw = await self._generate_async(fallback, prompt, system)
+        return self._extract_text(raw)
+
+    async def warmup(self, model: Optional[str] = None):
+        """
+        Connect and have Ollama load the model into memory: a generate call
+        with an empty prompt loads the model without producing any tokens.
+        """
+        await self._ensure_client_async()
+        await self._generate_async(await self._resolve_model_async(model), "")
+
+    async def stream_chat(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        system: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Send prompt to Ollama and yield text chunks as they are generated.
+        """
+        await self._ensure_client_async()
+        model_to_use = await self._resolve_model_async(model)
+
+        started = False
+        try:
+            async for chunk in self._stream_async(model_to_use, prompt, system):
+                text = self._extract_text(chunk)
+                if text:
+                    started = True
+                    yield text
+        except ollama.ResponseError as exc:
+            fallback = None
+            if not started:
+                fallback = self._fallback_for_missing_model(exc, model_to_use)
+            if fallback is None:
+                raise
+            async for chunk in self._stream_async(fallback, prompt, system):
+                text = self._extract_text(chunk)
+                if text:
+                    yield text
+
+
+class AsyncOllama(Ollama):
+    """
+    Ollama wrapper backed by ollama.AsyncClient.
+
+    Requests are awaited on the event loop over a pooled httpx connection
+    pool, so in-flight generations don't occupy AnyIO worker threads.
+
+    - max_connections / max_keepalive_connections / keepalive_expiry
+      configure the httpx pool shared by all requests.
+    - request_timeout bounds each HTTP request to Ollama (seconds);
+      connect_timeout bounds establishing a new connection.
+    """
+
+    def __init__(
+        self,
+        model: str = "mistral",
+        host: str = "http://127.0.0.1:11434",
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        max_connections: int = 256,
+        max_keepalive_connections: int = 64,
+        keepalive_expiry: float = 30.0,
+        request_timeout: Optional[float] = 120.0,
+        connect_timeout: float = 5.0,
+        model_list_ttl: float = 60.0,
+        keep_alive: Optional[Union[float, str]] = "30m",
+    ):
+        super().__init__(
+            model=model,
+            host=host,
+            connect_on_init=False,
+            max_retries=max_retries,
+            backoff_base=backoff_base,
+            model_list_ttl=model_list_ttl,
+            keep_alive=keep_alive,
+        )
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.request_timeout = request_timeout
+        self.connect_timeout = connect_timeout
+
+        self.client: Optional[ollama.AsyncClient] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+
+    def _create_async_client(self) -> ollama.AsyncClient:
+        return ollama.AsyncClient(
+            host=self.host,
+            timeout=httpx.Timeout(self.request_timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+        )
+
+    async def _connect_and_validate_async(self):
+        """
+        Async counterpart of _connect_and_validate using the pooled client.
+        Raises ConnectionError on persistent failures.
+        """
+        last_exc: Optional[Exception] = None
+        for attempt in range(1, self.max_retries + 1):
+            client = self._create_async_client()
+            try:
+                available = self._parse_model_list(await client.list())
+                self._set_active_model(client, available)
+                return
+            except Exception as exc:
+                last_exc = exc
+                OLLAMA_RETRIES.inc(reason="connect")
+                await _aclose_client(client)
+                wait = self.backoff_base * (2 ** (attempt - 1))
+                logging.warning(
+                    "Attempt %d/%d to connect to Ollama failed: %s; retrying in %.2fs",
+                    attempt,
+                    self.max_retries,
+                    exc,
+                    wait,
+                )
+                await asyncio.sleep(wait)
+        logging.error("Exhausted %d connection attempts to Ollama.", self.max_retries)
+        raise ConnectionError("Could not connect to Ollama") from last_exc
+
+    async def _ensure_client_async(self):
+        if self.client and self.active_model:
+            return
+        # Only one coroutine connects; the rest wait and reuse its client.
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self.client and self.active_model:
+                return
+            await self._connect_and_validate_async()
+
+    async def _list_models_async(self) -> List[str]:
+        return self._parse_model_list(await self.client.list())
+
+    async def _generate_async(
+        self, model: str, prompt: str, system: Optional[str] = None
+    ):
+        return await self.client.generate(
+            model=model, prompt=prompt, stream=False, **self._generate_kwargs(system)
+        )
+
+    async def _stream_async(
+        self, model: str, prompt: str, system: Optional[str] = None
+    ):
+        chunks = await self.client.generate(
+            model=model, prompt=prompt, stream=True, **self._generate_kwargs(system)
+        )
+        async for chunk in chunks:
+            yield chunk
+
+    async def aclose(self):
+        """Close the pooled HTTP connections."""
+        if self.client is not None:
+            await _aclose_client(self.client)
+            self.client = None
+
 
 OllamaPlatform = Ollama
@@ -0,0 +1,149 @@
+"""
+Compact, token-budgeted prompts for LLM counseling.
+
+On a CPU-bound model, prefill time grows with the number of prompt tokens,
+so the prompt carries only what the model needs:
+
+- the colleges are rendered as one header line plus one `|`-separated line
+  per college, with only the PROMPT_FIELDS columns (instead of an indented
+  JSON dump of every DataFrame column);
+- the prompt is counted against `max_tokens`, and the lowest-ranked colleges
+  are dropped until it fits.
+
+The system prompt and the task instructions never depend on the request.
+They are sent as Ollama's `system` field, which the model template places
+first, so every request shares the same token prefix. With `keep_alive`
+holding the model in memory, Ollama reuses that prefix's KV cache and only
+prefills the student-specific part. (The `context` field continues one
+conversation and isn't shared across students, so it isn't used.)
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+import pandas as pd
+
+# Columns sent to the LLM, in order; the system prompt refers to them by name.
+PROMPT_FIELDS = [
+    "institute_short",
+    "program_name",
+    "stream",
+    "category",
+    "quota",
+    "closing_rank",
+    "eligibility_prob",
+]
+
+TASK_INSTRUCTIONS = (
+    "Each request gives a student profile and the colleges our algorithm "
+    "recommended for the student's rank, best first, as a `|`-separated table. "
+    "Act as a career counselor: give a detailed, encouraging and helpful "
+    "justification for why these specific colleges are a good fit, explain the "
+    "strengths of each program, and advise the student on what to focus on next."
+)
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate SentencePiece (Mistral/Llama) token count without loading a
+    tokenizer: one token per word or punctuation mark, plus one per 4 extra
+    characters of long words. Errs slightly high for English text.
+    """
+    return sum(1 + (len(piece) - 1) // 4 for piece in _TOKEN_RE.findall(text))
+
+
+@dataclass(frozen=True)
+class Prompt:
+    system: str
+    user: str
+    tokens: int
+    # colleges left in the prompt after budgeting
+    colleges: int
+
+    def flat(self) -> str:
+        """System and user parts as one string, for platforms without `system`."""
+        return f"{self.system}\n\n{self.user}"
+
+
+def _format_value(column: str, value) -> str:
+    if value is None or (isinstance(value, float) and value != value):
+        return "-"
+    if column == "eligibility_prob":
+        return f"{float(value):.2f}"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).replace("|", "/")
+
+
+class PromptBuilder:
+    def __init__(
+        self,
+        system_prompt: str,
+        max_tokens: int = 1024,
+        fields: Optional[List[str]] = None,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+    ):
+        """
+        Args:
+            system_prompt: fixed instructions (e.g. prompt/system_prompt.md)
+            max_tokens: budget for system + user prompt, as counted by
+                `count_tokens`
+            fields: college columns to include (default PROMPT_FIELDS)
+            count_tokens: token counter; swap in a real tokenizer if available
+        """
+        self.system = "\n\n".join(
+            p for p in (system_prompt.strip(), TASK_INSTRUCTIONS) if p
+        )
+        self.max_tokens = max_tokens
+        self.fields = fields or PROMPT_FIELDS
+        self.count_tokens = count_tokens
+        self.system_tokens = count_tokens(self.system)
+
+    def render_colleges(self, colleges: pd.DataFrame) -> List[str]:
+        """Header line plus one line per college, in DataFrame order."""
+        fields = [f for f in self.fields if f in colleges.columns]
+        columns = [colleges[f].tolist() for f in fields]
+        lines = [" | ".join(fields)]
+        for values in zip(*columns):
+            lines.append(
+                " | ".join(_format_value(f, v) for f, v in zip(fields, values))
+            )
+        return lines
+
+    def build(
+        self,
+        interests: str,
+        entrance_exam_rank: int,
+        colleges: pd.DataFrame,
+        board_marks: Optional[float] = None,
+    ) -> Prompt:
+        profile = [
+            f"Interests: {interests}",
+            f"Entrance exam rank: {entrance_exam_rank}",
+        ]
+        if board_marks is not None:
+            profile.append(f"Board marks: {board_marks}%")
+        head = "Student\n" + "\n".join(profile) + "\n\nRecommended colleges\n"
+
+        header, *rows = self.render_colleges(colleges)
+        budget = self.max_tokens - self.system_tokens
+        used = self.count_tokens(head) + self.count_tokens(header) + 1
+        kept = []
+        for row in rows:
+            cost = self.count_tokens(row) + 1
+            # the best college always goes in, even over budget
+            if kept and used + cost > budget:
+                break
+            kept.append(row)
+            used += cost
+
+        user = head + "\n".join([header, *kept])
+        return Prompt(
+            system=self.system,
+            user=user,
+            tokens=self.system_tokens + self.count_tokens(user),
+            colleges=len(kept),
+        )
@@ -0,0 +1,150 @@
+"""
+Versioned, hot-swappable serving artifacts.
+
+The retriever (embeddings + FAISS index + metadata store) and the eligibility
+scorer are loaded together into one ServingBundle. The registry
+holds the current bundle; a reload builds a complete new bundle in the
+threadpool and then swaps it in with a single assignment. Request handlers
+read `registry.current` once and use that bundle to the end, so in-flight
+requests finish on the version they started with and the old bundle is
+freed when the last of them drops its reference.
+
+Reloads are triggered by `reload()` (e.g. from an admin endpoint) or by
+`watch()`, which polls the artifact files' mtimes and reloads once they
+stop changing. Every uvicorn worker runs its own watcher, so one data
+refresh reaches all workers without restarting them.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+Fingerprint = Dict[str, Optional[Tuple[int, int]]]
+
+
+@dataclass
+class ServingBundle:
+    retriever: Any = None
+    eligibility_scorer: Any = None
+    error: Optional[str] = None
+    version: int = 0
+    fingerprint: Fingerprint = field(default_factory=dict)
+    loaded_at: float = 0.0
+    load_seconds: float = 0.0
+    # component name -> seconds it took to load
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def healthy(self) -> bool:
+        return self.retriever is not None and self.eligibility_scorer is not None
+
+    def describe(self) -> dict:
+        return {
+            "version": self.version,
+            "healthy": self.healthy,
+            "error": self.error,
+            "loaded_at": self.loaded_at,
+            "load_seconds": round(self.load_seconds, 3),
+            "components": {k: round(v, 3) for k, v in self.timings.items()},
+            "rows": len(self.retriever.store) if self.retriever else 0,
+        }
+
+
+def fingerprint(paths: List[str]) -> Fingerprint:
+    """(mtime_ns, size) of each path, None for missing files."""
+    result = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+            result[path] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            result[path] = None
+    return result
+
+
+class ModelRegistry:
+    def __init__(
+        self,
+        loader: Callable[[Optional[ServingBundle]], ServingBundle],
+        watch_paths: List[str],
+    ):
+        """
+        Args:
+            loader: builds a new bundle; gets the current one (or None) so it
+                can reuse parts that don't change, like the encoder model
+            watch_paths: artifact files whose changes trigger a reload
+        """
+        self.loader = loader
+        self.watch_paths = watch_paths
+        self.current = ServingBundle(error="Not loaded yet.")
+        self.last_error: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._version = 0
+
+    def _load(self) -> ServingBundle:
+        prints = fingerprint(self.watch_paths)
+        start = time.perf_counter()
+        bundle = self.loader(self.current if self.current.healthy else None)
+        bundle.fingerprint = prints
+        bundle.loaded_at = time.time()
+        bundle.load_seconds = time.perf_counter() - start
+        return bundle
+
+    def _swap(self, bundle: ServingBundle) -> bool:
+        """Install `bundle` unless it would replace a healthy one with a broken one."""
+        if self.current.healthy and not bundle.healthy:
+            self.last_error = bundle.error
+            logging.error(
+                "Reload failed, keeping version %d: %s",
+                self.current.version,
+                bundle.error,
+            )
+            # remember what was tried, so the watcher doesn't retry the same files
+            self.current.fingerprint = bundle.fingerprint
+            return False
+        self._version += 1
+        bundle.version = self._version
+        self.current = bundle
+        self.last_error = None
+        logging.info(
+            "Serving version %d (loaded in %.2fs)", bundle.version, bundle.load_seconds
+        )
+        return True
+
+    def load(self) -> ServingBundle:
+        """Synchronous initial load."""
+        self._swap(self._load())
+        return self.current
+
+    async def reload(self) -> bool:
+        """Build a new bundle off the event loop and swap it in; True if swapped."""
+        async with self._lock:
+            bundle = await run_in_threadpool(self._load)
+            return self._swap(bundle)
+
+    async def watch(self, interval: float = 10.0):
+        """Reload when the artifacts change and have been stable for one interval."""
+        pending = None
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                prints = fingerprint(self.watch_paths)
+                if prints == self.current.fingerprint:
+                    pending = None
+                elif prints != pending:
+                    # still being written (or first sighting); wait a round
+                    pending = prints
+                else:
+                    logging.info("Serving artifacts changed; reloading.")
+                    pending = None
+                    await self.reload()
+            except Exception as e:
+                logging.error("Artifact watcher error: %s", e)
+
+    def status(self) -> dict:
+        return {**self.current.describe(), "last_reload_error": self.last_error}
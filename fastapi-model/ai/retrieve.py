@@ -17,11 +17,21 @@ Notes:
 
 import json
 import os
+import threading
 import warnings
-from typing import List
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple, Union
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
+import pandas as pd
+from fastapi.concurrency import run_in_threadpool
+
+from ai.batching import MicroBatchEncoder
+from ai.encoders import Encoder, load_encoder
+from ai.lexical import LexicalIndex, reciprocal_rank_fusion
+from ai.metrics import CACHE_REQUESTS, RETRIEVAL_PATHS, STAGE_SECONDS
+from ai.store import CollegeStore
 
 # Try importing faiss and provide a helpful error message if it's missing.
 try:
@@ -35,6 +45,22 @@ except Exception as e:  # ImportError or other import-time errors
         f"Original import error: {e}"
     )
 
+from ai.index import (  # noqa: E402
+    configure_search,
+    filtered_search_params,
+    load_or_build_index,
+)
+
+# Structured search filters: case-insensitive equality on these categorical
+# columns, plus an inclusive closing_rank range.
+CATEGORICAL_FILTERS = ("category", "stream", "quota", "institute_short")
+RANK_FILTERS = {"min_closing_rank": np.greater_equal, "max_closing_rank": np.less_equal}
+
+# "off": always encode + ANN search; "fast": queries the lexical index fully
+# covers skip the encoder (see ai/lexical.py); "hybrid": additionally fuse the
+# partial lexical matches of the remaining queries with the vector results
+LEXICAL_MODES = ("off", "fast", "hybrid")
+
 
 class Retriever:
     def __init__(
@@ -43,8 +69,27 @@ class Retriever:
         data_dir: str = "data",
         embeddings_filename: str = "embed.npy",
         json_filename: str = "college_data.json",
+        store_dirname: str = "college_store",
         use_gpu: bool = False,
         gpu_device: int = 0,
+        query_cache_size: int = 4096,
+        batch_max_size: int = 32,
+        batch_max_wait_ms: float = 3.0,
+        index_type: str = "flat",
+        nlist: Optional[int] = None,
+        nprobe: int = 16,
+        hnsw_m: int = 32,
+        ef_search: int = 64,
+        pq_m: int = 16,
+        persist_index: bool = True,
+        mmap: bool = False,
+        brute_force_max_rows: int = 20000,
+        model: Union[Encoder, "Future[Encoder]", None] = None,
+        encoder_backend: str = "auto",
+        encoder_dirname: str = "encoder_onnx",
+        lexical_mode: str = "fast",
+        lexical_min_hits: int = 1,
+        base_filters: Optional[Dict] = None,
     ):
         """Create a Retriever backed by FAISS.
 
@@ -52,22 +97,77 @@ class Retriever:
             model_name: sentence-transformers model name
             data_dir: directory containing embeddings and json
             embeddings_filename: .npy file with precomputed embeddings
-            json_filename: json file with the documents
+            json_filename: legacy json file with the documents, used only when
+                the columnar store is missing
+            store_dirname: columnar metadata store written by embeddings.py
             use_gpu: attempt to use faiss-gpu (if available). Falls back to CPU if not available.
             gpu_device: which GPU device to use if GPU is requested (0, 1, ...)
+            query_cache_size: number of query embeddings kept in the LRU cache
+            batch_max_size: max queries coalesced into one encode call (async path)
+            batch_max_wait_ms: how long a query waits for others to batch with
+            index_type: "flat" (exact), "ivf_flat", "hnsw" or "ivf_pq" (see ai/index.py)
+            nlist: IVF cells for ivf_* indexes (default ~4*sqrt(n))
+            nprobe: IVF cells visited per query (recall vs. latency)
+            hnsw_m: HNSW graph degree
+            ef_search: HNSW candidate list size per query (recall vs. latency)
+            pq_m: PQ sub-quantizers for ivf_pq
+            persist_index: save trained indexes next to the embeddings and reuse them
+            mmap: memory-map the embeddings and the persisted index instead of
+                loading private copies, so uvicorn workers share one copy
+            brute_force_max_rows: filtered searches that leave at most this many
+                rows scan just those rows exactly instead of using the index
+            model: already-loaded encoder to reuse instead of loading
+                `model_name` again (e.g. when hot-reloading the index), or a
+                Future of one, so it can load in parallel with the index
+            encoder_backend: "auto", "torch", "onnx" or "onnx-int8" (see
+                ai/encoders.py); used when `model` is not given
+            encoder_dirname: ONNX export written by export_encoder.py
+            lexical_mode: "off", "fast" or "hybrid" (see LEXICAL_MODES)
+            lexical_min_hits: fully matching groups a query needs to be
+                answered by the lexical index alone
+            base_filters: filters every search applies, in find_candidates'
+                format (e.g. {"min_closing_rank": 1} to leave out rows that
+                can't be scored); evaluated once here, and searches narrowed
+                by nothing else use the index
         """
         DATA_DIR = data_dir
         EMBEDDINGS_PATH = os.path.join(DATA_DIR, embeddings_filename)
         JSON_DATA_PATH = os.path.join(DATA_DIR, json_filename)
+        STORE_PATH = os.path.join(DATA_DIR, store_dirname)
+
+        self.query_cache_size = query_cache_size
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+        self._batch_max_size = batch_max_size
+        self._batch_max_wait_ms = batch_max_wait_ms
+        self._batcher: Optional[MicroBatchEncoder] = None
+        self.brute_force_max_rows = brute_force_max_rows
+        self.lexical_mode = "off"
+        self.lexical: Optional[LexicalIndex] = None
+        self.lexical_min_hits = lexical_min_hits
 
         try:
-            print("Retriever: Loading embedding model...")
-            self.model = SentenceTransformer(model_name)
+            if model is not None:
+                self._model = model
+            else:
+                print("Retriever: Loading embedding model...")
+                self._model = load_encoder(
+                    encoder_backend,
+                    model_name,
+                    os.path.join(DATA_DIR, encoder_dirname),
+                )
 
             print(
                 f"Retriever: Loading pre-computed embeddings from {EMBEDDINGS_PATH} ..."
             )
-            self.embeddings = np.load(EMBEDDINGS_PATH)
+            self.embeddings = np.load(EMBEDDINGS_PATH, mmap_mode="r" if mmap else None)
+            if mmap and self.embeddings.dtype != np.float32:
+                warnings.warn(
+                    f"{EMBEDDINGS_PATH} is {self.embeddings.dtype}, not float32; "
+                    "loading a private float32 copy. Re-run embeddings.py to "
+                    "share it across workers.",
+                    RuntimeWarning,
+                )
 
             # Ensure embeddings shape and dtype are what faiss expects
             if self.embeddings.ndim == 1:
@@ -83,15 +183,33 @@ class Retriever:
             if not self.embeddings.flags["C_CONTIGUOUS"]:
                 self.embeddings = np.ascontiguousarray(self.embeddings)
 
-            print(f"Retriever: Loading data from {JSON_DATA_PATH} ...")
-            with open(JSON_DATA_PATH, "r") as f:
-                self.college_data = json.load(f)
+            if CollegeStore.exists(STORE_PATH):
+                print(f"Retriever: Loading metadata store from {STORE_PATH} ...")
+                self.store = CollegeStore.load(STORE_PATH, mmap=mmap)
+            else:
+                print(f"Retriever: Loading data from {JSON_DATA_PATH} ...")
+                with open(JSON_DATA_PATH, "r") as f:
+                    self.store = CollegeStore.from_records(json.load(f))
+            self._init_groups()
+            self._init_base_filters(base_filters)
+            self.set_lexical_mode(lexical_mode)
 
             d = self.embeddings.shape[1]
-            print(f"Retriever: Creating FAISS index (dimension={d})...")
+            print(f"Retriever: Creating FAISS {index_type} index (dimension={d})...")
 
-            # Create a CPU index first
-            cpu_index = faiss.IndexFlatL2(d)
+            # Create (or load) a filled CPU index first
+            cpu_index = load_or_build_index(
+                self.embeddings,
+                DATA_DIR,
+                index_type=index_type,
+                embeddings_path=EMBEDDINGS_PATH,
+                persist=persist_index,
+                mmap=mmap,
+                nlist=nlist,
+                hnsw_m=hnsw_m,
+                pq_m=pq_m,
+            )
+            configure_search(cpu_index, nprobe=nprobe, ef_search=ef_search)
 
             # If user wants GPU, attempt to move index to GPU
             self._is_gpu_index = False
@@ -119,10 +237,6 @@ class Retriever:
             else:
                 self.index = cpu_index
 
-            # Add embeddings
-            print("Retriever: Adding embeddings to FAISS index...")
-            self.index.add(self.embeddings)
-
             print("Retriever initialized successfully.")
 
         except FileNotFoundError as e:
@@ -134,15 +248,301 @@ class Retriever:
             print(f"Unexpected error initializing Retriever: {e}")
             raise
 
-    def find_similar_colleges(self, query: str, top_k: int = 5) -> List[dict]:
-        """Return top_k most similar college records for the input query."""
-        query_embedding = self.model.encode([query])
+    def _init_groups(self):
+        """
+        Row <-> vector mapping. A store with a `group_id` column (written by
+        embeddings.py) shares one vector among all rows of an (institute,
+        program); older stores have one vector per row.
+        """
+        n_vectors = self.embeddings.shape[0]
+        if "group_id" not in self.store.columns:
+            if len(self.store) != n_vectors:
+                raise ValueError(
+                    f"Metadata has {len(self.store)} rows but there are "
+                    f"{n_vectors} embeddings. Re-run embeddings.py."
+                )
+            self.row_groups = None
+            return
 
+        groups = np.asarray(self.store.columns["group_id"], dtype=np.int64)
+        if len(groups) and (groups.min() < 0 or groups.max() >= n_vectors):
+            raise ValueError(
+                f"Metadata refers to vectors beyond the {n_vectors} embeddings. "
+                "Re-run embeddings.py."
+            )
+        self.row_groups = groups
+        # rows of vector g: group_rows[group_starts[g] : group_starts[g + 1]]
+        self.group_rows = np.argsort(groups, kind="stable")
+        self.group_starts = np.searchsorted(
+            groups[self.group_rows], np.arange(n_vectors + 1)
+        )
+
+    def _init_base_filters(self, base_filters: Optional[Dict]):
+        """Row and vector masks of `base_filters`, None where they drop nothing."""
+        self._base_rows = self._base_vectors = None
+        rows = self._request_mask(base_filters)
+        if rows is None or rows.all():
+            return
+        vectors = self._vector_mask(rows)
+        self._base_rows = rows
+        self._base_vectors = None if vectors.all() else vectors
+
+    def _doc_rows(self) -> Optional[np.ndarray]:
+        """First row of each vector's group (-1 if it has none), None if ungrouped."""
+        if self.row_groups is None:
+            return None
+        first = np.full(self.embeddings.shape[0], -1, dtype=np.int64)
+        has_rows = np.diff(self.group_starts) > 0
+        first[has_rows] = self.group_rows[self.group_starts[:-1][has_rows]]
+        return first
+
+    def set_lexical_mode(self, mode: str):
+        """Switch to one of LEXICAL_MODES, building the inverted index on first use."""
+        if mode not in LEXICAL_MODES:
+            raise ValueError(f"Unknown lexical mode {mode!r}; use {LEXICAL_MODES}")
+        if mode != "off" and self.lexical is None:
+            self.lexical = LexicalIndex(self.store, self._doc_rows())
+        self.lexical_mode = mode
+
+    # ---------- Query encoding ----------
+
+    @property
+    def model(self) -> Encoder:
+        if isinstance(self._model, Future):
+            self._model = self._model.result()
+        return self._model
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """
+        Canonical form of a comma-separated interest list: lower-cased,
+        de-duplicated and sorted, so the same interests in any order share
+        one cache entry and one embedding.
+        """
+        parts = {p.strip().lower() for p in query.split(",")}
+        return ", ".join(sorted(p for p in parts if p))
+
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        with STAGE_SECONDS.time(stage="encode"):
+            embeddings = self.model.encode(texts)
         # Ensure dtype and contiguity
-        if query_embedding.dtype != np.float32:
-            query_embedding = query_embedding.astype("float32")
-        if not query_embedding.flags["C_CONTIGUOUS"]:
-            query_embedding = np.ascontiguousarray(query_embedding)
+        if embeddings.dtype != np.float32:
+            embeddings = embeddings.astype("float32")
+        if not embeddings.flags["C_CONTIGUOUS"]:
+            embeddings = np.ascontiguousarray(embeddings)
+        return embeddings
+
+    def _cache_get(self, key: str) -> Optional[np.ndarray]:
+        with self._query_cache_lock:
+            vec = self._query_cache.get(key)
+            if vec is not None:
+                self._query_cache.move_to_end(key)
+        CACHE_REQUESTS.inc(
+            cache="query_embedding", result="miss" if vec is None else "hit"
+        )
+        return vec
+
+    def _cache_put(self, key: str, vec: np.ndarray):
+        with self._query_cache_lock:
+            self._query_cache[key] = vec
+            self._query_cache.move_to_end(key)
+            while len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+
+    def cached_query_embedding(self, query: str) -> Optional[np.ndarray]:
+        """
+        The query's embedding if a search already encoded it, else None;
+        never runs the encoder (and isn't counted as a cache lookup).
+        """
+        with self._query_cache_lock:
+            return self._query_cache.get(self.normalize_query(query))
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Return a (len(queries), d) float32 matrix of query embeddings,
+        encoding only the queries missing from the cache in one call.
+        """
+        keys = [self.normalize_query(q) for q in queries]
+        vectors = [self._cache_get(k) for k in keys]
+        missing = list(dict.fromkeys(k for k, v in zip(keys, vectors) if v is None))
+        if missing:
+            encoded = dict(zip(missing, self._encode_texts(missing)))
+            for k, vec in encoded.items():
+                self._cache_put(k, vec)
+            vectors = [
+                v if v is not None else encoded[k] for k, v in zip(keys, vectors)
+            ]
+        return np.ascontiguousarray(np.vstack(vectors), dtype=np.float32)
+
+    async def aencode_query(self, query: str) -> np.ndarray:
+        """
+        Async single-query encode: served from the cache when possible,
+        otherwise micro-batched with other concurrent queries.
+        """
+        key = self.normalize_query(query)
+        vec = self._cache_get(key)
+        if vec is None:
+            if self._batcher is None:
+                self._batcher = MicroBatchEncoder(
+                    self._encode_texts,
+                    max_batch_size=self._batch_max_size,
+                    max_wait_ms=self._batch_max_wait_ms,
+                )
+            vec = await self._batcher.encode(key)
+            self._cache_put(key, vec)
+        return vec.reshape(1, -1)
+
+    # ---------- Search ----------
+
+    def _filter_mask(self, filters: Optional[Dict]) -> Optional[np.ndarray]:
+        """
+        Boolean row mask for `filters` and the base filters, or None when
+        nothing is filtered. With no `filters` this is the base row mask
+        itself, which _vector_mask and the search recognize.
+        """
+        mask = self._request_mask(filters)
+        if mask is None or self._base_rows is None:
+            return self._base_rows if mask is None else mask
+        return mask & self._base_rows
+
+    def _request_mask(self, filters: Optional[Dict]) -> Optional[np.ndarray]:
+        """
+        Boolean row mask for `filters` alone, or None when nothing is
+        filtered. Filters on columns the store doesn't have are ignored.
+        """
+        if not filters:
+            return None
+        mask = None
+
+        def narrow(condition):
+            nonlocal mask
+            mask = condition if mask is None else (mask & condition)
+
+        for name in CATEGORICAL_FILTERS:
+            value = filters.get(name)
+            if value is None or not self.store.is_categorical(name):
+                continue
+            wanted = [
+                code
+                for code, cat in enumerate(self.store.categories[name])
+                if cat.lower() == str(value).strip().lower()
+            ]
+            narrow(np.isin(self.store.codes(name), wanted))
+
+        if "closing_rank" in self.store.columns:
+            for key, compare in RANK_FILTERS.items():
+                if filters.get(key) is not None:
+                    narrow(compare(self.store.columns["closing_rank"], filters[key]))
+        return mask
+
+    def _vector_mask(self, row_mask: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """Vectors with at least one row in `row_mask`."""
+        if row_mask is not None and row_mask is self._base_rows:
+            return self._base_vectors
+        if row_mask is None or self.row_groups is None:
+            return row_mask
+        mask = np.zeros(self.embeddings.shape[0], dtype=bool)
+        mask[self.row_groups[row_mask]] = True
+        return mask
+
+    def _expand(
+        self, vector_ids: np.ndarray, row_mask: Optional[np.ndarray]
+    ) -> np.ndarray:
+        """Rows behind `vector_ids` (best vector first) that pass `row_mask`."""
+        if self.row_groups is None:
+            return vector_ids
+        if len(vector_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        starts, ends = self.group_starts[vector_ids], self.group_starts[vector_ids + 1]
+        rows = np.concatenate([self.group_rows[a:b] for a, b in zip(starts, ends)])
+        return rows if row_mask is None else rows[row_mask[rows]]
+
+    def _lexical_ids(
+        self, query: str, top_k: int, filters: Optional[Dict] = None
+    ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        (row IDs, None) when the lexical index covers `query`, so it needs no
+        encoding or ANN search. Otherwise (None, partial vector matches to
+        fuse with the vector search in hybrid mode, else None).
+        """
+        if self.lexical_mode == "off":
+            return None, None
+        if self.lexical_mode == "fast" and not self.lexical.knows(query):
+            return None, None
+        with STAGE_SECONDS.time(stage="lexical"):
+            mask = self._filter_mask(filters)
+            match = self.lexical.match(query, self._vector_mask(mask), limit=top_k)
+            if match.covered and len(match.complete) >= self.lexical_min_hits:
+                RETRIEVAL_PATHS.inc(path="lexical")
+                return self._expand(match.complete, mask), None
+        if self.lexical_mode == "hybrid" and len(match.partial):
+            return None, match.partial
+        return None, None
+
+    def _fuse(
+        self, vector_ids: np.ndarray, partial: Optional[np.ndarray], top_k: int
+    ) -> np.ndarray:
+        if partial is None:
+            RETRIEVAL_PATHS.inc(path="vector")
+            return vector_ids
+        RETRIEVAL_PATHS.inc(path="hybrid")
+        return reciprocal_rank_fusion([vector_ids, partial])[:top_k]
+
+    def _search_ids(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int,
+        filters: Optional[Dict] = None,
+        partial: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Row IDs for the top_k nearest vectors of a single query: with grouped
+        vectors, every row of each of the top_k groups that passes `filters`.
+        `partial` (from _lexical_ids) is fused with the nearest vectors.
+        """
+        with STAGE_SECONDS.time(stage="search"):
+            mask = self._filter_mask(filters)
+            vector_ids = self._search_rows(
+                query_embedding, top_k, self._vector_mask(mask)
+            )[0]
+            return self._expand(self._fuse(vector_ids, partial, top_k), mask)
+
+    def _search_ids_batch(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int,
+        filters_list: Optional[List[Optional[Dict]]] = None,
+        partials: Optional[List[Optional[np.ndarray]]] = None,
+    ) -> List[np.ndarray]:
+        """
+        Row IDs (as in _search_ids) for each query row. Queries with the same
+        filters are searched together in one multi-query call.
+        """
+        filters_list = filters_list or [None] * len(query_embeddings)
+        partials = partials or [None] * len(query_embeddings)
+        groups: Dict[str, List[int]] = {}
+        for i, filters in enumerate(filters_list):
+            groups.setdefault(json.dumps(filters or {}, sort_keys=True), []).append(i)
+
+        results: List[np.ndarray] = [None] * len(query_embeddings)
+        with STAGE_SECONDS.time(stage="search"):
+            for rows in groups.values():
+                mask = self._filter_mask(filters_list[rows[0]])
+                ids = self._search_rows(
+                    query_embeddings[rows], top_k, self._vector_mask(mask)
+                )
+                for row, vector_ids in zip(rows, ids):
+                    vector_ids = self._fuse(vector_ids, partials[row], top_k)
+                    results[row] = self._expand(vector_ids, mask)
+        return results
+
+    def _search_rows(
+        self, queries: np.ndarray, top_k: int, mask: Optional[np.ndarray]
+    ) -> List[np.ndarray]:
+        """Top_k vector IDs per query row, restricted to `mask` when given."""
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        if mask is not None:
+            return self._search_rows_filtered(queries, top_k, mask)
 
         # Ensure top_k is not larger than the number of vectors in the index
         n_vectors = (
@@ -152,13 +552,156 @@ class Retriever:
         )
         k = min(top_k, max(1, n_vectors))
 
-        distances, indices = self.index.search(query_embedding, k)
+        distances, indices = self.index.search(queries, k)
 
         # FAISS returns -1 for empty results; filter them
-        results = []
-        for idx in indices[0]:
-            if idx == -1:
-                continue
-            results.append(self.college_data[idx])
+        return [row[row != -1] for row in indices]
 
-        return results
+    def _search_rows_filtered(
+        self, queries: np.ndarray, top_k: int, mask: np.ndarray
+    ) -> List[np.ndarray]:
+        allowed = np.flatnonzero(mask)
+        if len(allowed) == 0:
+            return [allowed] * len(queries)
+
+        # Small subsets (and GPU indexes, which don't take selectors) are
+        # scanned exactly; large ones search the index with an ID selector,
+        # and so does the base set every unfiltered query shares, so serving
+        # uses the configured index type whatever the data size.
+        small = len(allowed) <= self.brute_force_max_rows
+        if (small and mask is not self._base_vectors) or self._is_gpu_index:
+            vectors = np.asarray(self.embeddings[allowed], dtype=np.float32)
+            # squared L2 for all queries at once: |v|^2 - 2 q.v (+|q|^2, constant per row)
+            dists = (vectors**2).sum(axis=1) - 2.0 * (queries @ vectors.T)
+            k = min(top_k, len(allowed))
+            top = np.argpartition(dists, k - 1, axis=1)[:, :k]
+            order = np.take_along_axis(dists, top, axis=1).argsort(axis=1)
+            return list(allowed[np.take_along_axis(top, order, axis=1)])
+
+        # bitmap must outlive the search: the selector only points into it
+        params, bitmap = filtered_search_params(self.index, mask)
+        distances, indices = self.index.search(
+            queries, min(top_k, len(allowed)), params=params
+        )
+        return [row[row != -1] for row in indices]
+
+    def _take(self, row_ids: np.ndarray) -> pd.DataFrame:
+        df = self.store.take(row_ids)
+        if self.row_groups is None:
+            # one vector per row: every row is its own group
+            df["group_id"] = np.asarray(row_ids, dtype=np.int64)
+        return df
+
+    def find_candidates(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[Dict] = None,
+        lexical: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Rows of the top_k most similar (institute, program or stream) groups
+        as a DataFrame built from the columnar store, best group first. The
+        `group_id` column tells which rows share a group.
+
+        `filters` restricts the search before ranking and picks the rows
+        each group is expanded to, e.g.
+        {"category": "OBC-NCL", "stream": "Engineering", "quota": "AI",
+         "min_closing_rank": 4500, "max_closing_rank": 20000}.
+
+        Queries the lexical index fully covers are answered from it, unless
+        `lexical` is False (e.g. to exercise the encoder and the index).
+        """
+        ids, partial = None, None
+        if lexical:
+            ids, partial = self._lexical_ids(query, top_k, filters)
+        if ids is None:
+            query_embedding = self.encode_queries([query])
+            ids = self._search_ids(query_embedding, top_k, filters, partial)
+        return self._take(ids)
+
+    async def afind_candidates(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[Dict] = None,
+        lexical: bool = True,
+    ) -> pd.DataFrame:
+        """Async variant of find_candidates using the micro-batching encoder."""
+        ids, partial = None, None
+        if lexical:
+            ids, partial = await run_in_threadpool(
+                self._lexical_ids, query, top_k, filters
+            )
+        if ids is None:
+            query_embedding = await self.aencode_query(query)
+            ids = await run_in_threadpool(
+                self._search_ids, query_embedding, top_k, filters, partial
+            )
+        return self._take(ids)
+
+    def find_candidates_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        filters_list: Optional[List[Optional[Dict]]] = None,
+    ) -> pd.DataFrame:
+        """
+        Candidates for many queries in one pass: queries the lexical index
+        covers are answered from it, the rest take one encode call (for the
+        uncached ones) and one multi-query search per distinct filter set.
+        Returns a single DataFrame whose `query_index` column says which
+        query each row belongs to (rows are grouped by query, best first).
+        """
+        filters_list = filters_list or [None] * len(queries)
+        lexical = [
+            self._lexical_ids(q, top_k, f) for q, f in zip(queries, filters_list)
+        ]
+        ids = [row_ids for row_ids, _ in lexical]
+        pending = [i for i, row_ids in enumerate(ids) if row_ids is None]
+        if pending:
+            searched = self._search_ids_batch(
+                self.encode_queries([queries[i] for i in pending]),
+                top_k,
+                [filters_list[i] for i in pending],
+                [lexical[i][1] for i in pending],
+            )
+            for i, row_ids in zip(pending, searched):
+                ids[i] = row_ids
+        counts = [len(row_ids) for row_ids in ids]
+        df = self._take(np.concatenate(ids) if ids else np.empty(0, np.int64))
+        df["query_index"] = np.repeat(np.arange(len(queries)), counts)
+        return df
+
+    async def afind_candidates_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        filters_list: Optional[List[Optional[Dict]]] = None,
+    ) -> pd.DataFrame:
+        """find_candidates_batch run in the threadpool."""
+        return await run_in_threadpool(
+            self.find_candidates_batch, queries, top_k, filters_list
+        )
+
+    def find_similar_colleges(
+        self, query: str, top_k: int = 5, filters: Optional[Dict] = None
+    ) -> List[dict]:
+        """College records of the top_k most similar groups for the input query."""
+        ids, partial = self._lexical_ids(query, top_k, filters)
+        if ids is None:
+            query_embedding = self.encode_queries([query])
+            ids = self._search_ids(query_embedding, top_k, filters, partial)
+        return self.store.records(ids)
+
+    async def afind_similar_colleges(
+        self, query: str, top_k: int = 5, filters: Optional[Dict] = None
+    ) -> List[dict]:
+        """Async variant of find_similar_colleges using the micro-batching encoder."""
+        ids, partial = await run_in_threadpool(self._lexical_ids, query, top_k, filters)
+        if ids is None:
+            query_embedding = await self.aencode_query(query)
+            ids = await run_in_threadpool(
+                self._search_ids, query_embedding, top_k, filters, partial
+            )
+        return self.store.records(ids)
@@ -0,0 +1,371 @@
+"""
+Vectorized eligibility scoring for retrieved candidates.
+
+The eligibility model is an sklearn pipeline over three features:
+student_rank, program_name and category. Running the whole pipeline on a
+fresh DataFrame per request is dominated by pandas/ColumnTransformer
+overhead for ~20 rows, so when the pipeline has the usual shape
+(ColumnTransformer -> classifier) the scorer "compiles" it:
+
+- the categorical blocks of the ColumnTransformer are precomputed once per
+  (program_name, category) pair, and looked up by pair code per request;
+- only the student_rank block is transformed per request (as a plain
+  multiply-add when it is a StandardScaler/MinMaxScaler);
+- the blocks are stacked as arrays and fed straight to the classifier.
+
+The compiled path is checked against the full pipeline at load time and is
+disabled (with a warning) if they disagree or the pipeline has another
+shape, in which case the full pipeline is used.
+
+EligibilityTable goes one step further: build_eligibility_table.py tabulates
+the model per (program, category) pair over a log-spaced rank grid, and
+scoring becomes an array read plus linear interpolation. Pairs missing from
+the table, and ranks outside its grid, fall back to the scorer above.
+
+Rows without a program_name (sources that only list a stream) are scored
+as MISSING_PROGRAM, which the pipeline's one-hot encoder treats as an
+unseen program: the probability then depends on rank and category only.
+"""
+
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+RANK_FEATURE = "student_rank"
+PAIR_FEATURES = ("program_name", "category")
+MISSING_PROGRAM = "(unknown program)"
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first (argpartition + small sort)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def top_k_per_group(scores: np.ndarray, groups: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, at most one per group, best first."""
+    order = np.argsort(-scores, kind="stable")
+    # position (in score order) of each group's best entry
+    _, first = np.unique(np.asarray(groups)[order], return_index=True)
+    return order[np.sort(first)[:k]]
+
+
+def fill_missing_programs(programs: Iterable[Optional[str]]) -> np.ndarray:
+    """`programs` as an object array with MISSING_PROGRAM for missing values."""
+    programs = np.asarray(programs, dtype=object)
+    missing = pd.isna(programs)
+    if missing.any():
+        programs = np.where(missing, MISSING_PROGRAM, programs)
+    return programs
+
+
+def _affine_rank_transform(transformer) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    (scale, shift) equivalent of a fitted single-column scaler, so the rank
+    block is one multiply-add instead of an sklearn transform call.
+    """
+    name = type(transformer).__name__
+    if transformer == "passthrough":
+        return np.ones(1), np.zeros(1)
+    if name == "StandardScaler":
+        mean = transformer.mean_ if transformer.mean_ is not None else np.zeros(1)
+        scale = transformer.scale_ if transformer.scale_ is not None else np.ones(1)
+        return 1.0 / scale, -mean / scale
+    if name == "MinMaxScaler":
+        return transformer.scale_, transformer.min_
+    return None
+
+
+def file_sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class EligibilityTable:
+    """
+    Eligibility probability tabulated per (program_name, category) pair over
+    a rank grid, served by interpolation in log-rank space.
+    """
+
+    def __init__(
+        self,
+        programs: np.ndarray,
+        categories: np.ndarray,
+        rank_grid: np.ndarray,
+        probs: np.ndarray,
+        model_sha1: str = "",
+        max_abs_error: float = float("nan"),
+    ):
+        self.rank_grid = np.asarray(rank_grid, dtype=np.float64)
+        self.probs = probs
+        self.model_sha1 = model_sha1
+        self.max_abs_error = max_abs_error
+        self._log_grid = np.log(self.rank_grid)
+        self.pair_codes: Dict[Tuple[str, str], int] = {
+            (str(p), str(c)): i for i, (p, c) in enumerate(zip(programs, categories))
+        }
+
+    def __len__(self) -> int:
+        return len(self.pair_codes)
+
+    def save(self, path: str):
+        pairs = list(self.pair_codes)
+        np.savez(
+            path,
+            programs=np.array([p for p, _ in pairs], dtype=str),
+            categories=np.array([c for _, c in pairs], dtype=str),
+            rank_grid=self.rank_grid,
+            probs=self.probs,
+            model_sha1=np.array(self.model_sha1),
+            max_abs_error=np.array(self.max_abs_error),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "EligibilityTable":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["programs"],
+                data["categories"],
+                data["rank_grid"],
+                data["probs"],
+                model_sha1=str(data["model_sha1"]),
+                max_abs_error=float(data["max_abs_error"]),
+            )
+
+    def codes(self, programs, categories) -> np.ndarray:
+        """Row of each (program, category) pair in the table, -1 if absent."""
+        get = self.pair_codes.get
+        return np.fromiter(
+            (get((p, c), -1) for p, c in zip(programs, categories)),
+            dtype=np.int64,
+            count=len(programs),
+        )
+
+    def covers(self, ranks: np.ndarray) -> np.ndarray:
+        """Whether each rank lies within the grid, where lookup interpolates."""
+        ranks = np.asarray(ranks, dtype=np.float64)
+        return (ranks >= self.rank_grid[0]) & (ranks <= self.rank_grid[-1])
+
+    def lookup(self, ranks: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """
+        Interpolated probabilities for rows whose pair code is >= 0. Ranks
+        outside the grid get the edge value; see covers().
+        """
+        log_r = np.log(np.clip(np.asarray(ranks, dtype=np.float64), 1, None))
+        g = self._log_grid
+        lo = np.clip(np.searchsorted(g, log_r, side="right") - 1, 0, len(g) - 2)
+        w = np.clip((log_r - g[lo]) / (g[lo + 1] - g[lo]), 0.0, 1.0)
+        p_lo = self.probs[codes, lo]
+        p_hi = self.probs[codes, lo + 1]
+        return p_lo + (p_hi - p_lo) * w
+
+
+class EligibilityScorer:
+    def __init__(
+        self,
+        model,
+        known_pairs: Optional[Iterable[Tuple[str, str]]] = None,
+        validate: bool = True,
+        table: Optional[EligibilityTable] = None,
+    ):
+        """
+        Args:
+            model: fitted sklearn pipeline with predict_proba over
+                (student_rank, program_name, category)
+            known_pairs: (program_name, category) pairs to pre-encode at load
+                time, e.g. every pair in the CollegeStore; others are encoded
+                the first time they are seen. A None program is MISSING_PROGRAM
+            validate: compare the compiled path with the pipeline on load
+            table: optional precomputed EligibilityTable; the pairs and rank range
+                it covers are served by lookup instead of a model call
+        """
+        self.model = model
+        self.table = table
+        self._blocks = self._compile(model)
+        self._pair_codes: Dict[Tuple[str, str], int] = {}
+        self._pair_matrix = None
+        self._pair_widths: List[int] = []
+        self._lock = threading.Lock()
+
+        if self._blocks is not None and known_pairs is not None:
+            pairs = list(known_pairs)
+            programs = fill_missing_programs([p for p, _ in pairs])
+            self._add_pairs(list(dict.fromkeys(zip(programs, (c for _, c in pairs)))))
+        if self._blocks is not None and validate:
+            self._validate()
+
+    @property
+    def compiled(self) -> bool:
+        return self._blocks is not None
+
+    # ---------- Compilation ----------
+
+    @staticmethod
+    def _compile(model):
+        """
+        Split a Pipeline(ColumnTransformer, classifier) into per-transformer
+        blocks tagged "rank" or "pair". Returns None for any other shape.
+        """
+        steps = getattr(model, "steps", None)
+        if not steps or len(steps) != 2:
+            return None
+        ct, clf = steps[0][1], steps[1][1]
+        if not hasattr(ct, "transformers_") or not hasattr(clf, "predict_proba"):
+            return None
+        names_in = list(getattr(ct, "feature_names_in_", []))
+
+        blocks = []
+        for name, transformer, columns in ct.transformers_:
+            if transformer == "drop" or columns is None or len(columns) == 0:
+                continue
+            cols = [
+                names_in[c] if isinstance(c, (int, np.integer)) else c for c in columns
+            ]
+            if cols == [RANK_FEATURE]:
+                kind = "rank"
+                transformer = _affine_rank_transform(transformer) or transformer
+            elif set(cols) <= set(PAIR_FEATURES):
+                kind = "pair"
+            else:
+                return None
+            blocks.append((kind, transformer, cols))
+        return blocks, clf, bool(getattr(ct, "sparse_output_", False))
+
+    def _transform_block(self, transformer, frame: pd.DataFrame):
+        if isinstance(transformer, tuple):
+            # (scale, shift) precomputed from a fitted scaler
+            scale, shift = transformer
+            return frame.to_numpy(dtype=np.float64) * scale + shift
+        if transformer == "passthrough":
+            out = frame.to_numpy()
+        else:
+            out = transformer.transform(frame)
+        return out if sp.issparse(out) else np.asarray(out, dtype=np.float64)
+
+    def _add_pairs(self, pairs: List[Tuple[str, str]]):
+        """Precompute the categorical blocks for new (program, category) pairs."""
+        with self._lock:
+            new_pairs = list(
+                dict.fromkeys(p for p in pairs if p not in self._pair_codes)
+            )
+            if not new_pairs:
+                return
+            blocks, _, _ = self._blocks
+            frame = pd.DataFrame(new_pairs, columns=list(PAIR_FEATURES))
+            encoded = [
+                self._transform_block(transformer, frame[cols])
+                for kind, transformer, cols in blocks
+                if kind == "pair"
+            ]
+            self._pair_widths = [e.shape[1] for e in encoded]
+            if any(sp.issparse(e) for e in encoded):
+                rows = sp.hstack(encoded, format="csr")
+            else:
+                rows = np.hstack(encoded)
+
+            if self._pair_matrix is None:
+                self._pair_matrix = rows
+            elif sp.issparse(rows):
+                self._pair_matrix = sp.vstack([self._pair_matrix, rows], format="csr")
+            else:
+                self._pair_matrix = np.vstack([self._pair_matrix, rows])
+            # codes are published only after their rows exist
+            for pair in new_pairs:
+                self._pair_codes[pair] = len(self._pair_codes)
+
+    def _validate(self, n_checks: int = 256, tol: float = 1e-6):
+        pairs = list(self._pair_codes)[:n_checks] or [("Computer Science", "GEN")]
+        rng = np.random.default_rng(0)
+        ranks = rng.integers(1, 200_000, size=len(pairs))
+        programs = np.array([p for p, _ in pairs], dtype=object)
+        categories = np.array([c for _, c in pairs], dtype=object)
+        try:
+            fast = self._predict_compiled(ranks, programs, categories)
+            slow = self._predict_pipeline(ranks, programs, categories)
+            max_diff = float(np.max(np.abs(fast - slow)))
+        except Exception as e:
+            logging.warning("Compiled eligibility scorer failed validation: %s", e)
+            max_diff = float("inf")
+        if max_diff > tol:
+            logging.warning(
+                "Compiled eligibility scorer deviates from the pipeline by %.3g; "
+                "using the full pipeline.",
+                max_diff,
+            )
+            self._blocks = None
+
+    # ---------- Scoring ----------
+
+    def _predict_pipeline(self, ranks, programs, categories) -> np.ndarray:
+        X_new = pd.DataFrame(
+            {
+                RANK_FEATURE: ranks,
+                "program_name": programs,
+                "category": categories,
+            }
+        )
+        return self.model.predict_proba(X_new)[:, 1]
+
+    def _predict_compiled(self, ranks, programs, categories) -> np.ndarray:
+        blocks, clf, sparse_output = self._blocks
+        pairs = list(zip(programs, categories))
+        self._add_pairs(pairs)
+        pair_rows = self._pair_matrix[[self._pair_codes[p] for p in pairs]]
+        rank_frame = pd.DataFrame({RANK_FEATURE: np.asarray(ranks)})
+
+        # Reassemble the blocks in ColumnTransformer order; the pair blocks
+        # were precomputed side by side, so slice them back apart.
+        parts, offset, widths = [], 0, iter(self._pair_widths)
+        for kind, transformer, cols in blocks:
+            if kind == "rank":
+                parts.append(self._transform_block(transformer, rank_frame))
+            else:
+                width = next(widths)
+                parts.append(pair_rows[:, offset : offset + width])
+                offset += width
+
+        if sparse_output:
+            X = sp.hstack([sp.csr_matrix(p) for p in parts], format="csr")
+        else:
+            X = np.hstack([p.toarray() if sp.issparse(p) else p for p in parts])
+        return clf.predict_proba(X)[:, 1]
+
+    def predict(
+        self, ranks: Iterable[int], programs: Iterable[str], categories: Iterable[str]
+    ) -> np.ndarray:
+        """Eligibility probability for each (rank, program, category) row."""
+        ranks = np.asarray(ranks)
+        programs = fill_missing_programs(programs)
+        categories = np.asarray(categories, dtype=object)
+        if len(ranks) == 0:
+            return np.empty(0)
+        if self.table is None:
+            return self._predict_model(ranks, programs, categories)
+
+        codes = self.table.codes(programs, categories)
+        known = (codes >= 0) & self.table.covers(ranks)
+        if known.all():
+            return self.table.lookup(ranks, codes)
+        probs = np.empty(len(ranks), dtype=np.float64)
+        probs[known] = self.table.lookup(ranks[known], codes[known])
+        missing = ~known
+        probs[missing] = self._predict_model(
+            ranks[missing], programs[missing], categories[missing]
+        )
+        return probs
+
+    def _predict_model(self, ranks, programs, categories) -> np.ndarray:
+        if self._blocks is not None:
+            return self._predict_compiled(ranks, programs, categories)
+        return self._predict_pipeline(ranks, programs, categories)
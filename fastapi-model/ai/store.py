@@ -0,0 +1,346 @@
+"""
+Columnar metadata store for the rows behind the FAISS index.
+
+Replaces the list-of-dicts `college_data.json`: every column is one NumPy
+array indexed by row ID (the FAISS vector ID). String columns such as
+`institute_short`, `program_name` and `category` are interned as categoricals:
+an int32 code array plus a small list of distinct values.
+
+On disk the store is a directory:
+
+    college_store/
+        manifest.json                       # row count, version, columns
+        <column>.<version>.npy              # numeric values or categorical codes
+        <column>.<version>.categories.json  # distinct values of a categorical column
+
+The .npy files can be opened with mmap=True so uvicorn workers share them.
+Files are never rewritten in place: a save writes the columns under a new
+version and then atomically replaces manifest.json, which names the files
+of the current version. Readers that memory-mapped an older version keep
+reading it undisturbed. The previous version's files are kept too (a
+reader may have just read the old manifest); older ones are deleted.
+Stores written before versioning (plain <column>.npy) still load.
+"""
+
+import json
+import os
+import re
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_FILENAME = "manifest.json"
+_VERSIONED_FILE_RE = re.compile(
+    r"^.+\.(?P<version>[0-9a-f]{16})\.(npy|categories\.json)$"
+)
+
+
+def _read_manifest(path: str) -> dict:
+    with open(os.path.join(path, MANIFEST_FILENAME), "r") as f:
+        return json.load(f)
+
+
+class StoreWriter:
+    """
+    Writes one new version of a store directory, column by column. Nothing
+    is visible to readers until commit() replaces the manifest.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # hex nanoseconds: unique per save and sorts by age
+        self.version = f"{time.time_ns():016x}"
+        self._columns: List[dict] = []
+        os.makedirs(path, exist_ok=True)
+
+    def _entry(self, name: str, categories: Optional[np.ndarray]) -> dict:
+        entry = {
+            "name": name,
+            "kind": "numeric" if categories is None else "categorical",
+            "file": f"{name}.{self.version}.npy",
+        }
+        if categories is not None:
+            entry["categories"] = f"{name}.{self.version}.categories.json"
+            with open(os.path.join(self.path, entry["categories"]), "w") as f:
+                json.dump(np.asarray(categories).tolist(), f)
+        self._columns.append(entry)
+        return entry
+
+    def add_column(
+        self, name: str, values: np.ndarray, categories: Optional[np.ndarray] = None
+    ):
+        entry = self._entry(name, categories)
+        np.save(os.path.join(self.path, entry["file"]), values)
+
+    def open_column(
+        self,
+        name: str,
+        dtype,
+        n_rows: int,
+        categories: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """A writable memmap for a column, to fill in pieces; flush() when done."""
+        entry = self._entry(name, categories)
+        return np.lib.format.open_memmap(
+            os.path.join(self.path, entry["file"]),
+            mode="w+",
+            dtype=dtype,
+            shape=(n_rows,),
+        )
+
+    def commit(self, n_rows: int):
+        """Publish the new version, then delete versions older than the last one."""
+        previous = None
+        if CollegeStore.exists(self.path):
+            previous = _read_manifest(self.path).get("version")
+        manifest = {"n_rows": n_rows, "version": self.version, "columns": self._columns}
+        tmp_path = os.path.join(self.path, f"{MANIFEST_FILENAME}.tmp{os.getpid()}")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST_FILENAME))
+        # unversioned files belong to a pre-versioning store: the previous
+        # version when there is none, so they go one save later
+        self._prune(keep={self.version, previous}, keep_unversioned=previous is None)
+
+    def _prune(self, keep, keep_unversioned: bool):
+        for filename in os.listdir(self.path):
+            match = _VERSIONED_FILE_RE.match(filename)
+            if match:
+                if match.group("version") in keep:
+                    continue
+            elif keep_unversioned or not filename.endswith(
+                (".npy", ".categories.json")
+            ):
+                continue
+            try:
+                os.remove(os.path.join(self.path, filename))
+            except OSError:
+                # e.g. still memory-mapped on Windows; retried on the next save
+                pass
+
+
+class CollegeStore:
+    def __init__(
+        self,
+        columns: Dict[str, np.ndarray],
+        categories: Optional[Dict[str, np.ndarray]] = None,
+    ):
+        """
+        Args:
+            columns: column name -> values (numeric) or int32 codes (categorical)
+            categories: categorical column name -> object array of distinct values
+        """
+        self.columns = columns
+        self.categories = categories or {}
+        lengths = {len(v) for v in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Store columns have different lengths: {lengths}")
+        self.n_rows = lengths.pop() if lengths else 0
+        # decode tables with a trailing None, so code -1 decodes to missing
+        self._decode = {
+            name: np.append(cats, None) for name, cats in self.categories.items()
+        }
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(self.columns)
+
+    # ---------- Construction ----------
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "CollegeStore":
+        columns, categories = {}, {}
+        for name in df.columns:
+            series = df[name]
+            is_numeric = pd.api.types.is_numeric_dtype(series)
+            if is_numeric and not pd.api.types.is_bool_dtype(series):
+                columns[name] = series.to_numpy()
+            else:
+                codes, uniques = pd.factorize(
+                    series.astype(object), use_na_sentinel=True
+                )
+                columns[name] = codes.astype(np.int32)
+                categories[name] = np.asarray([str(u) for u in uniques], dtype=object)
+        return cls(columns, categories)
+
+    @classmethod
+    def from_records(cls, records: List[dict]) -> "CollegeStore":
+        return cls.from_dataframe(pd.DataFrame.from_records(records))
+
+    @staticmethod
+    def _concat_plan(stores: List["CollegeStore"]) -> Dict[str, Optional[pd.Index]]:
+        """Column name -> union of its categories (None for numeric columns)."""
+        names = list(dict.fromkeys(n for s in stores for n in s.columns))
+        plan = {}
+        for name in names:
+            if any(name in s.categories for s in stores):
+                plan[name] = pd.Index(
+                    list(
+                        dict.fromkeys(
+                            c for s in stores for c in s.categories.get(name, [])
+                        )
+                    ),
+                    dtype=object,
+                )
+            else:
+                plan[name] = None
+        return plan
+
+    @staticmethod
+    def _concat_part(
+        store: "CollegeStore", name: str, union: Optional[pd.Index]
+    ) -> np.ndarray:
+        """One store's share of a stacked column, with codes remapped onto `union`."""
+        if union is None:
+            if name not in store.columns:
+                return np.full(len(store), np.nan)
+            return np.asarray(store.columns[name])
+        if name not in store.columns:
+            return np.full(len(store), -1, dtype=np.int32)
+        # old code -> new code; the trailing -1 keeps missing missing
+        remap = np.append(union.get_indexer(store.categories[name]), -1).astype(
+            np.int32
+        )
+        return remap[np.asarray(store.columns[name])]
+
+    @classmethod
+    def concat(cls, stores: List["CollegeStore"]) -> "CollegeStore":
+        """
+        Stack stores row-wise (e.g. ingestion shards). Categorical codes are
+        remapped onto the union of each column's categories.
+        """
+        columns, categories = {}, {}
+        for name, union in cls._concat_plan(stores).items():
+            columns[name] = np.concatenate(
+                [cls._concat_part(s, name, union) for s in stores]
+            )
+            if union is not None:
+                categories[name] = np.asarray(union, dtype=object)
+        return cls(columns, categories)
+
+    @classmethod
+    def save_concat(
+        cls,
+        stores: List["CollegeStore"],
+        path: str,
+        extra_columns: Optional[Dict[str, np.ndarray]] = None,
+    ) -> "CollegeStore":
+        """
+        concat(stores).save(path) without building the stacked store: each
+        column is written into a memory-mapped file one store at a time, so
+        with stores loaded with mmap=True only one store's column is in memory
+        at once. `extra_columns` (full length) are added as they are. Returns
+        the saved store, memory-mapped.
+        """
+        n_rows = sum(len(s) for s in stores)
+        writer = StoreWriter(path)
+        for name, union in cls._concat_plan(stores).items():
+            if union is None:
+                dtype = np.result_type(
+                    *(s.columns[name].dtype for s in stores if name in s.columns),
+                    *(
+                        [np.float64]
+                        if any(name not in s.columns for s in stores)
+                        else []
+                    ),
+                )
+                out = writer.open_column(name, dtype, n_rows)
+            else:
+                out = writer.open_column(
+                    name, np.int32, n_rows, np.asarray(union, dtype=object)
+                )
+            offset = 0
+            for s in stores:
+                out[offset : offset + len(s)] = cls._concat_part(s, name, union)
+                offset += len(s)
+            out.flush()
+            del out
+        for name, values in (extra_columns or {}).items():
+            writer.add_column(name, values)
+        writer.commit(n_rows)
+        return cls.load(path, mmap=True)
+
+    # ---------- Persistence ----------
+
+    def save(self, path: str):
+        """Write the store as a new version of `path` (see the module docstring)."""
+        writer = StoreWriter(path)
+        for name, values in self.columns.items():
+            writer.add_column(name, values, self.categories.get(name))
+        writer.commit(self.n_rows)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False) -> "CollegeStore":
+        try:
+            return cls._load(path, mmap)
+        except FileNotFoundError:
+            # two saves landed between reading the manifest and opening the
+            # files it names; the manifest now points at surviving files
+            return cls._load(path, mmap)
+
+    @classmethod
+    def _load(cls, path: str, mmap: bool) -> "CollegeStore":
+        manifest = _read_manifest(path)
+        columns, categories = {}, {}
+        for col in manifest["columns"]:
+            name = col["name"]
+            columns[name] = np.load(
+                os.path.join(path, col.get("file", f"{name}.npy")),
+                mmap_mode="r" if mmap else None,
+                allow_pickle=False,
+            )
+            if col["kind"] == "categorical":
+                categories_file = col.get("categories", f"{name}.categories.json")
+                with open(os.path.join(path, categories_file), "r") as f:
+                    categories[name] = np.asarray(json.load(f), dtype=object)
+        return cls(columns, categories)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, MANIFEST_FILENAME))
+
+    # ---------- Access ----------
+
+    def is_categorical(self, name: str) -> bool:
+        return name in self.categories
+
+    def codes(self, name: str) -> np.ndarray:
+        """Integer codes of a categorical column (-1 for missing)."""
+        return self.columns[name]
+
+    def code_of(self, name: str, value: str) -> int:
+        """Code of `value` in a categorical column, or -1 if it never occurs."""
+        matches = np.flatnonzero(self.categories[name] == value)
+        return int(matches[0]) if len(matches) else -1
+
+    def values(self, name: str, row_ids: Optional[Iterable[int]] = None) -> np.ndarray:
+        """Decoded values of one column, optionally restricted to `row_ids`."""
+        data = self.columns[name]
+        if row_ids is not None:
+            data = data[np.asarray(row_ids, dtype=np.int64)]
+        if name not in self.categories:
+            return np.asarray(data)
+        return self._decode[name][data]
+
+    def take(self, row_ids: Iterable[int]) -> pd.DataFrame:
+        """Build a DataFrame for `row_ids` column by column (no per-row dicts)."""
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        return pd.DataFrame(
+            {name: self.values(name, row_ids) for name in self.columns},
+            index=pd.RangeIndex(len(row_ids)),
+        )
+
+    def unique_values(self, *names: str) -> List[tuple]:
+        """Distinct value combinations of categorical columns, e.g. (program, category)."""
+        codes = np.stack([np.asarray(self.codes(n)) for n in names], axis=1)
+        combos = np.unique(codes, axis=0)
+        return list(zip(*(self._decode[n][combos[:, i]] for i, n in enumerate(names))))
+
+    def records(self, row_ids: Iterable[int]) -> List[dict]:
+        """Rows as dicts, for callers that still expect college_data entries."""
+        return self.take(row_ids).to_dict(orient="records")
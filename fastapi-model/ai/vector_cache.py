@@ -0,0 +1,113 @@
+"""
+Content-addressed store of description embeddings.
+
+Each vector is keyed by sha1(model name + description text), so rebuilding
+the embeddings after a data refresh only encodes rows whose text is new or
+changed. The cache is append-only: every add() writes one segment, and
+segments are memory-mapped on load, so a large cache costs no RAM until its
+vectors are read. On disk:
+
+    embed_cache/
+        <segment>.vectors.npy   # (n, d) float32
+        <segment>.hashes.npy    # (n,) S20 sha1 digests, written last
+"""
+
+import glob
+import hashlib
+import os
+import uuid
+from typing import Callable, Dict, List
+
+import numpy as np
+
+
+def content_hashes(texts: List[str], model_name: str) -> np.ndarray:
+    """sha1 digest per text, salted with the model name."""
+    prefix = model_name.encode("utf-8") + b"\0"
+    return np.array(
+        [hashlib.sha1(prefix + t.encode("utf-8")).digest() for t in texts],
+        dtype="S20",
+    )
+
+
+class VectorCache:
+    def __init__(self, path: str):
+        self.path = path
+        self._segments: List[np.ndarray] = []
+        self._starts: List[int] = [0]
+        self._rows: Dict[bytes, int] = {}
+
+        for hashes_path in sorted(glob.glob(os.path.join(path, "*.hashes.npy"))):
+            vectors_path = hashes_path[: -len(".hashes.npy")] + ".vectors.npy"
+            if not os.path.exists(vectors_path):
+                continue
+            hashes = np.load(hashes_path)
+            vectors = np.load(vectors_path, mmap_mode="r")
+            if len(hashes) != len(vectors):
+                print(f"Skipping inconsistent vector cache segment {hashes_path}")
+                continue
+            self._append_segment(hashes, vectors)
+
+    def __len__(self) -> int:
+        return self._starts[-1]
+
+    def _append_segment(self, hashes: np.ndarray, vectors: np.ndarray):
+        start = self._starts[-1]
+        self._segments.append(vectors)
+        self._starts.append(start + len(hashes))
+        for i, h in enumerate(hashes.tolist()):
+            self._rows.setdefault(h, start + i)
+
+    def missing(self, hashes: np.ndarray) -> np.ndarray:
+        """Boolean mask of `hashes` that have no cached vector."""
+        rows = self._rows
+        return np.fromiter(
+            (h not in rows for h in hashes.tolist()), dtype=bool, count=len(hashes)
+        )
+
+    def add(self, hashes: np.ndarray, vectors: np.ndarray):
+        """Persist vectors for hashes not yet cached, as a new segment."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        keep = [i for i, h in enumerate(hashes.tolist()) if h not in self._rows]
+        if not keep:
+            return
+        hashes, vectors = hashes[keep], vectors[keep]
+
+        os.makedirs(self.path, exist_ok=True)
+        segment = os.path.join(self.path, uuid.uuid4().hex)
+        # hashes last: a segment without them is ignored on load
+        for suffix, array in (("vectors", vectors), ("hashes", hashes)):
+            tmp_path = f"{segment}.{suffix}.tmp.npy"
+            np.save(tmp_path, array)
+            os.replace(tmp_path, f"{segment}.{suffix}.npy")
+        self._append_segment(hashes, vectors)
+
+    def get(self, hashes: np.ndarray) -> np.ndarray:
+        """Vectors for `hashes`, in order; every hash must be cached."""
+        rows = np.fromiter(
+            (self._rows[h] for h in hashes.tolist()), dtype=np.int64, count=len(hashes)
+        )
+        dim = self._segments[0].shape[1] if self._segments else 0
+        out = np.empty((len(rows), dim), dtype=np.float32)
+        starts = np.asarray(self._starts)
+        segment_ids = np.searchsorted(starts, rows, side="right") - 1
+        for s in np.unique(segment_ids):
+            in_segment = segment_ids == s
+            out[in_segment] = self._segments[s][rows[in_segment] - starts[s]]
+        return out
+
+    def encode_missing(
+        self,
+        texts: List[str],
+        hashes: np.ndarray,
+        encode_fn: Callable[[List[str]], np.ndarray],
+    ) -> int:
+        """Encode only the texts whose hash isn't cached; returns how many."""
+        mask = self.missing(hashes)
+        if not mask.any():
+            return 0
+        # identical texts (same hash) are encoded once
+        _, first = np.unique(hashes[mask], return_index=True)
+        idx = np.flatnonzero(mask)[np.sort(first)]
+        self.add(hashes[idx], encode_fn([texts[i] for i in idx]))
+        return len(idx)
@@ -1,9 +1,13 @@
+import hmac
+import os
 from typing import Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 
+from auth.throttling import UNAUTHENTICATED_USER
+
 SECRET_KEY = "a-string-secret-at-least-256-bits-long"
 ALGORITHM = "HS256"
 
@@ -12,7 +16,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 async def get_user_identifier(token: Optional[str] = Depends(oauth2_scheme)):
     if token is None:
-        return "global_unauthenticated_user"
+        return UNAUTHENTICATED_USER
 
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -27,3 +31,16 @@ async def get_user_identifier(token: Optional[str] = Depends(oauth2_scheme)):
     except JWTError:
         raise credentials_exception
     return username
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """Admin endpoints need the X-Admin-Token header to match $ADMIN_TOKEN."""
+    expected = os.environ.get("ADMIN_TOKEN")
+    if not expected or not x_admin_token:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required."
+        )
+    if not hmac.compare_digest(x_admin_token.encode(), expected.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required."
+        )
@@ -1,7 +1,41 @@
+"""
+Sliding-window-counter rate limiting.
+
+Each user has two counters: requests in the current fixed window and in the
+previous one. The rate over the last `window` seconds is estimated as
+
+    previous * (1 - elapsed / window) + current
+
+so a check is O(1) in time and memory, instead of keeping (and rebuilding)
+a list of every request timestamp.
+
+Backends:
+
+- InMemoryBackend: per process. Users are kept in least-recently-seen
+  order and idle ones are evicted as new requests arrive, so memory is
+  bounded by the number of recently active users (and by max_keys).
+- RedisBackend: shared by every uvicorn worker, so limits hold across
+  processes. One atomic Lua call (a single round trip) per request; the
+  counters expire on their own. The call blocks, so the async dependencies
+  run it in the threadpool instead of on the event loop.
+
+Set RATE_LIMIT_REDIS_URL (e.g. redis://localhost:6379/0) to use Redis. If
+Redis becomes unreachable, requests are limited per process until it is
+back, rather than failing.
+"""
+
+import logging
+import math
+import os
+import threading
 import time
-from collections import defaultdict
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
 
+from ai.metrics import RATE_LIMIT_REJECTIONS
 from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 
 # --- Constants ---
 # For authenticated users
@@ -12,35 +46,292 @@ AUTH_TIME_WINDOW_SECONDS = 60
 GLOBAL_RATE_LIMIT = 3
 GLOBAL_TIME_WINDOW_SECONDS = 60
 
-# --- In-memory storage for user requests ---
-user_requests = defaultdict(list)
+# /counseling/batch is charged per student on budgets of its own (besides
+# counting once against the limits above): students per window, and LLM
+# generations, one per student, for authenticated users only.
+AUTH_BATCH_STUDENT_LIMIT = 1000
+GLOBAL_BATCH_STUDENT_LIMIT = 100
+BATCH_LLM_LIMIT = 100
+BATCH_TIME_WINDOW_SECONDS = 3600
+
+UNAUTHENTICATED_USER = "global_unauthenticated_user"
+
+REDIS_URL = os.environ.get("RATE_LIMIT_REDIS_URL")
+
+
+def _retry_after(
+    prev: float, cur: float, elapsed: float, limit: int, window: float, cost: int = 1
+) -> float:
+    """Seconds until the sliding estimate leaves room for `cost` more requests."""
+    if cur <= limit - cost:
+        # room appears within this window, as the previous window's share decays
+        return max(0.0, window * (1 - (limit - cost - cur) / prev) - elapsed)
+    # wait for the next window, then for this window's share to decay
+    return (window - elapsed) + window * max(0.0, 1 - (limit - cost) / cur)
+
+
+class RateLimitBackend(ABC):
+    # hit() does network I/O, so async callers should not run it on the loop
+    blocking = False
+
+    @abstractmethod
+    def hit(
+        self, key: str, limit: int, window: float, now: float, cost: int = 1
+    ) -> Tuple[bool, float]:
+        """
+        Count `cost` requests for `key` if they fit within `limit` per
+        `window`. Returns (allowed, retry_after_seconds).
+        """
+
+
+class InMemoryBackend(RateLimitBackend):
+    def __init__(self, max_keys: int = 100_000):
+        """
+        Args:
+            max_keys: hard cap on tracked users; beyond it the least recently
+                seen user is dropped even if not idle yet
+        """
+        self.max_keys = max_keys
+        # window length -> key -> [window index, previous count, current count,
+        # last seen], least recently seen first. One LRU per window length, so
+        # the idle keys of each are at its head whatever the other windows hold.
+        self._windows: Dict[float, "OrderedDict[str, list]"] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _evict(self, now: float):
+        """Drop users idle for two windows (their counters can only read 0)."""
+        for window, counters in list(self._windows.items()):
+            while counters:
+                key, entry = next(iter(counters.items()))
+                if now - entry[3] < 2 * window:
+                    break
+                del counters[key]
+                self._size -= 1
+            if not counters:
+                del self._windows[window]
+        while self._size > self.max_keys:
+            # the least recently seen key across all windows
+            counters = min(
+                self._windows.values(), key=lambda c: next(iter(c.values()))[3]
+            )
+            counters.popitem(last=False)
+            self._size -= 1
+            if not counters:
+                self._windows = {w: c for w, c in self._windows.items() if c}
+
+    def hit(
+        self, key: str, limit: int, window: float, now: float, cost: int = 1
+    ) -> Tuple[bool, float]:
+        index = int(now // window)
+        elapsed = now - index * window
+        with self._lock:
+            counters = self._windows.setdefault(window, OrderedDict())
+            entry = counters.get(key)
+            if entry is None:
+                entry = counters[key] = [index, 0, 0, now]
+                self._size += 1
+            elif entry[0] != index:
+                entry[1] = entry[2] if entry[0] == index - 1 else 0
+                entry[2] = 0
+                entry[0] = index
+            counters.move_to_end(key)
+            entry[3] = now
+
+            prev, cur = entry[1], entry[2]
+            allowed = prev * (1 - elapsed / window) + cur + cost <= limit
+            if allowed:
+                entry[2] += cost
+            self._evict(now)
+        if allowed:
+            return True, 0.0
+        return False, _retry_after(prev, cur, elapsed, limit, window, cost)
+
+
+# KEYS[1] = current window counter, KEYS[2] = previous window counter
+# ARGV = limit, elapsed fraction of the current window, counter TTL (s), cost
+_SLIDING_WINDOW_LUA = """
+local cur = tonumber(redis.call('GET', KEYS[1]) or '0')
+local prev = tonumber(redis.call('GET', KEYS[2]) or '0')
+local cost = tonumber(ARGV[4])
+if prev * (1 - tonumber(ARGV[2])) + cur + cost > tonumber(ARGV[1]) then
+    return {0, prev, cur}
+end
+cur = redis.call('INCRBY', KEYS[1], cost)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {1, prev, cur}
+"""
+
+
+class RedisBackend(RateLimitBackend):
+    blocking = True
+
+    def __init__(
+        self,
+        url: str,
+        prefix: str = "ratelimit",
+        socket_timeout: float = 0.05,
+        client=None,
+    ):
+        """
+        Args:
+            url: redis:// URL of the shared server
+            prefix: key prefix for the counters
+            socket_timeout: bound on the per-request round trip (seconds)
+            client: existing redis.Redis-compatible client (overrides url)
+        """
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise ImportError(
+                    "RATE_LIMIT_REDIS_URL is set but the 'redis' package is not "
+                    "installed. Install it with `pip install redis`."
+                ) from e
+            client = redis.Redis.from_url(
+                url,
+                socket_timeout=socket_timeout,
+                socket_connect_timeout=socket_timeout,
+            )
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(_SLIDING_WINDOW_LUA)
+
+    def hit(
+        self, key: str, limit: int, window: float, now: float, cost: int = 1
+    ) -> Tuple[bool, float]:
+        index = int(now // window)
+        elapsed = now - index * window
+        # hash tag keeps both windows of a user on one cluster slot
+        base = f"{self.prefix}:{{{key}}}"
+        allowed, prev, cur = self._script(
+            keys=[f"{base}:{index}", f"{base}:{index - 1}"],
+            args=[limit, elapsed / window, int(math.ceil(2 * window)), cost],
+        )
+        if allowed:
+            return True, 0.0
+        return False, _retry_after(int(prev), int(cur), elapsed, limit, window, cost)
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        backend: RateLimitBackend,
+        fallback: Optional[RateLimitBackend] = None,
+        retry_interval: float = 5.0,
+    ):
+        """
+        Args:
+            backend: where the counters live
+            fallback: used while `backend` raises (e.g. Redis is down)
+            retry_interval: after a backend failure, requests go straight to
+                the fallback for this many seconds instead of each waiting
+                for a timeout
+        """
+        self.backend = backend
+        self.fallback = fallback
+        self.retry_interval = retry_interval
+        self._backend_failing = False
+        self._retry_at = 0.0
+
+    def hit(
+        self, key: str, limit: int, window: float, cost: int = 1
+    ) -> Tuple[bool, float]:
+        now = time.time()
+        if self._backend_failing and now < self._retry_at:
+            return self.fallback.hit(key, limit, window, now, cost)
+        try:
+            result = self.backend.hit(key, limit, window, now, cost)
+        except Exception as e:
+            if self.fallback is None:
+                raise
+            if not self._backend_failing:
+                logging.warning(
+                    "Rate limit backend failed (%s); limiting per process.", e
+                )
+                self._backend_failing = True
+            self._retry_at = now + self.retry_interval
+            return self.fallback.hit(key, limit, window, now, cost)
+        if self._backend_failing:
+            logging.info("Rate limit backend recovered.")
+            self._backend_failing = False
+        return result
+
+    async def ahit(
+        self, key: str, limit: int, window: float, cost: int = 1
+    ) -> Tuple[bool, float]:
+        """hit() for async callers; blocking backends run in the threadpool."""
+        if not self.backend.blocking or (
+            self._backend_failing and time.time() < self._retry_at
+        ):
+            return self.hit(key, limit, window, cost)
+        return await run_in_threadpool(self.hit, key, limit, window, cost)
+
+
+def _default_limiter() -> RateLimiter:
+    if REDIS_URL:
+        return RateLimiter(RedisBackend(REDIS_URL), fallback=InMemoryBackend())
+    return RateLimiter(InMemoryBackend())
+
+
+limiter = _default_limiter()
 
 
 # --- Throttling dependency ---
-def apply_rate_limit(user_id: str):
-    current_time = time.time()
+async def _charge(key: str, limit: int, window: float, cost: int = 1):
+    """Count `cost` requests against `key`, or raise 429 (413 if it never fits)."""
+    if cost > limit:
+        raise HTTPException(
+            # Content Too Large (its constant was renamed in Starlette)
+            status_code=413,
+            detail=f"Request needs {cost} of a limit of {limit} per {window:g}s.",
+        )
+    allowed, retry_after = await limiter.ahit(key, limit, window, cost)
+    if not allowed:
+        RATE_LIMIT_REJECTIONS.inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests. Please try again later.",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
 
-    if user_id == "global_unauthenticated_user":
+
+async def apply_rate_limit(user_id: str):
+    if user_id == UNAUTHENTICATED_USER:
         rate_limit = GLOBAL_RATE_LIMIT
         time_window = GLOBAL_TIME_WINDOW_SECONDS
     else:
         rate_limit = AUTH_RATE_LIMIT
         time_window = AUTH_TIME_WINDOW_SECONDS
 
-    # Filter out requests older than the time window
-    user_requests[user_id] = [
-        t for t in user_requests[user_id] if t > current_time - time_window
-    ]
+    await _charge(user_id, rate_limit, time_window)
+    logging.debug("User %s: request allowed (limit %d).", user_id, rate_limit)
+    return True
+
 
-    if len(user_requests[user_id]) >= rate_limit:
+async def apply_batch_rate_limit(user_id: str, students: int, llm: bool = False):
+    """
+    Charge a /counseling/batch call per student: against the user's batch
+    student budget, and with `llm` against the batch LLM budget (one
+    generation per student). Anonymous callers can't request LLM text.
+
+    The student budget is charged first, so a batch it rejects never spends
+    the scarcer LLM budget.
+    """
+    anonymous = user_id == UNAUTHENTICATED_USER
+    if llm and anonymous:
         raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Too many requests. Please try again later.",
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Sign in to request LLM counseling for a batch.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    limit = GLOBAL_BATCH_STUDENT_LIMIT if anonymous else AUTH_BATCH_STUDENT_LIMIT
+    await _charge(f"{user_id}:batch", limit, BATCH_TIME_WINDOW_SECONDS, students)
+    if llm:
+        await _charge(
+            f"{user_id}:batch_llm", BATCH_LLM_LIMIT, BATCH_TIME_WINDOW_SECONDS, students
         )
-    else:
-        # For debugging: print current usage
-        current_usage = len(user_requests[user_id])
-        print(f"User {user_id}: {current_usage + 1}/{rate_limit} requests used.")
-
-    user_requests[user_id].append(current_time)
     return True
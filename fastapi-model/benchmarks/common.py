@@ -0,0 +1,363 @@
+"""
+Shared helpers for the benchmark scripts: latency summaries, the result file
+format, synthetic data and a stand-in encoder.
+
+Every script writes the same JSON document:
+
+    {
+      "meta": {"git_commit": ..., "python": ..., "platform": ..., "cpus": ...},
+      "results": [
+        {"component": "retriever", "name": "find_candidates", "size": 100000,
+         "params": {...}, "n": 200, "p50_ms": ..., "p95_ms": ..., "p99_ms": ...,
+         "mean_ms": ..., "max_ms": ..., "ops_per_s": ...},
+        ...
+      ]
+    }
+
+A result is identified by (component, name, size); compare.py matches
+results on that key to flag regressions against a baseline run.
+"""
+
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from ai.encoders import save_meta
+from ai.store import CollegeStore
+
+PROGRAMS = [
+    "Computer Science and Engineering",
+    "Electrical Engineering",
+    "Electronics and Communication Engineering",
+    "Mechanical Engineering",
+    "Civil Engineering",
+    "Chemical Engineering",
+    "Aerospace Engineering",
+    "Metallurgical and Materials Engineering",
+    "Biotechnology",
+    "Mathematics and Computing",
+    "Engineering Physics",
+    "Architecture",
+]
+CATEGORIES = ["GEN", "OBC-NCL", "SC", "ST", "EWS"]
+QUOTAS = ["AI", "HS", "OS"]
+INTERESTS = [
+    "computer science",
+    "electrical engineering, robotics",
+    "mechanical, aerospace engineering",
+    "civil engineering and architecture",
+    "chemical engineering",
+    "data science, artificial intelligence, machine learning",
+    "electronics and communication",
+    "materials science",
+    "biotechnology, medicine",
+    "mathematics, physics",
+]
+
+
+# ---------- Measurement ----------
+
+
+def summarize(samples_s: Sequence[float], wall_s: Optional[float] = None) -> Dict:
+    """Latency percentiles (ms) and throughput of per-call durations in seconds."""
+    samples = np.asarray(samples_s, dtype=np.float64) * 1000
+    if len(samples) == 0:
+        return {"n": 0}
+    wall_s = wall_s if wall_s is not None else samples.sum() / 1000
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "n": int(len(samples)),
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "mean_ms": round(float(samples.mean()), 4),
+        "max_ms": round(float(samples.max()), 4),
+        "ops_per_s": round(len(samples) / wall_s, 2) if wall_s > 0 else None,
+    }
+
+
+def bench(
+    fn: Callable[[int], object],
+    repeat: int = 200,
+    warmup: int = 5,
+    max_seconds: float = 10.0,
+    min_repeat: int = 5,
+) -> Dict:
+    """
+    Time `fn(i)` for i = 0, 1, ... (pass i through to vary the input) until
+    `repeat` calls or `max_seconds` have passed, after `warmup` untimed calls.
+    """
+    for i in range(warmup):
+        fn(i)
+    samples = []
+    deadline = time.perf_counter() + max_seconds
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(warmup + i)
+        samples.append(time.perf_counter() - start)
+        if i + 1 >= min_repeat and time.perf_counter() > deadline:
+            break
+    return summarize(samples)
+
+
+def result(
+    component: str, name: str, size: Optional[int], stats: Dict, **params
+) -> Dict:
+    row = {"component": component, "name": name, "size": size, "params": params}
+    row.update(stats)
+    return row
+
+
+def print_result(row: Dict):
+    if not row.get("n"):
+        print(
+            f"{row['component']:10s} {row['name']:40s} {row['size']!s:>8s}  no samples"
+        )
+        return
+    print(
+        f"{row['component']:10s} {row['name']:40s} {row['size']!s:>8s}  "
+        f"p50={row['p50_ms']:9.3f}ms p95={row['p95_ms']:9.3f}ms "
+        f"p99={row['p99_ms']:9.3f}ms {row['ops_per_s'] or 0:10.1f}/s"
+    )
+
+
+# ---------- Result files ----------
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run_meta(**extra) -> Dict:
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "argv": sys.argv,
+        **extra,
+    }
+
+
+def write_results(path: str, meta: Dict, results: List[Dict]):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"Saved {len(results)} results to {path}")
+
+
+def load_results(path: str) -> Dict:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+# ---------- Synthetic data ----------
+
+
+class SyntheticEncoder:
+    """
+    Deterministic pseudo-embeddings seeded by a hash of the text, so the
+    retriever benchmarks measure search and not the transformer.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+            out[i] = rng.standard_normal(self.dim)
+        out /= np.linalg.norm(out, axis=1, keepdims=True)
+        return out[0] if single else out
+
+
+def synthetic_rows(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """College rows with the columns the API filters and scores on."""
+    rng = np.random.default_rng(seed)
+    n_institutes = max(1, n_rows // 200)
+    institutes = np.array([f"INST-{i:05d}" for i in range(n_institutes)], dtype=object)
+    programs = np.array(PROGRAMS, dtype=object)
+    df = pd.DataFrame(
+        {
+            "institute_short": institutes[rng.integers(0, n_institutes, n_rows)],
+            "program_name": programs[rng.integers(0, len(programs), n_rows)],
+            "stream": "Engineering",
+            "category": np.array(CATEGORIES, dtype=object)[
+                rng.integers(0, len(CATEGORIES), n_rows)
+            ],
+            "quota": np.array(QUOTAS, dtype=object)[
+                rng.integers(0, len(QUOTAS), n_rows)
+            ],
+            "closing_rank": np.exp(rng.uniform(0, np.log(200_000), n_rows)).round(),
+            "round_no": rng.integers(1, 7, n_rows).astype(float),
+        }
+    )
+    return df
+
+
+def synthetic_vectors(
+    n_rows: int, dim: int, n_clusters: int = 1024, seed: int = 0
+) -> np.ndarray:
+    """Clustered unit vectors (IVF/HNSW behave differently on uniform noise)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((min(n_clusters, n_rows), dim)).astype(np.float32)
+    out = np.empty((n_rows, dim), dtype=np.float32)
+    # in chunks, to keep the temporaries small at 1M rows
+    for start in range(0, n_rows, 100_000):
+        stop = min(start + 100_000, n_rows)
+        chunk = centers[rng.integers(0, len(centers), stop - start)]
+        chunk += 0.5 * rng.standard_normal(chunk.shape).astype(np.float32)
+        out[start:stop] = chunk
+    out /= np.linalg.norm(out, axis=1, keepdims=True)
+    return out
+
+
+def synthetic_group_ids(rows: pd.DataFrame) -> np.ndarray:
+    """
+    group_id per row, one group per (institute, program) numbered in order
+    of first appearance, as ai.ingest.group_rows numbers the real groups.
+    """
+    groups = rows.groupby(["institute_short", "program_name"], sort=False).ngroup()
+    return groups.to_numpy(dtype=np.int32)
+
+
+def write_synthetic_data(
+    data_dir: str, n_rows: int, dim: int, seed: int = 0, grouped: bool = True
+) -> int:
+    """
+    embed.npy + college_store in `data_dir`, laid out like embeddings.py's:
+    one vector per (institute, program) group and a `group_id` column, or
+    with grouped=False the older one-vector-per-row layout. Returns the
+    number of vectors.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    rows = synthetic_rows(n_rows, seed=seed)
+    n_vectors = n_rows
+    if grouped:
+        rows["group_id"] = synthetic_group_ids(rows)
+        n_vectors = int(rows["group_id"].max()) + 1
+    np.save(
+        os.path.join(data_dir, "embed.npy"),
+        synthetic_vectors(n_vectors, dim, seed=seed),
+    )
+    CollegeStore.from_dataframe(rows).save(os.path.join(data_dir, "college_store"))
+    return n_vectors
+
+
+def synthetic_eligibility_model(n_samples: int = 20_000, seed: int = 0):
+    """
+    Pipeline(ColumnTransformer, LogisticRegression) with the same features
+    as college_eligibility_predictor.pkl, for machines without the real one.
+    """
+    from sklearn.compose import ColumnTransformer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(
+        {
+            "student_rank": np.exp(rng.uniform(0, np.log(200_000), n_samples)),
+            "program_name": np.array(PROGRAMS, dtype=object)[
+                rng.integers(0, len(PROGRAMS), n_samples)
+            ],
+            "category": np.array(CATEGORIES, dtype=object)[
+                rng.integers(0, len(CATEGORIES), n_samples)
+            ],
+        }
+    )
+    y = (X["student_rank"] < rng.uniform(1_000, 100_000, n_samples)).astype(int)
+    model = Pipeline(
+        [
+            (
+                "preprocessor",
+                ColumnTransformer(
+                    [
+                        ("num", StandardScaler(), ["student_rank"]),
+                        (
+                            "cat",
+                            OneHotEncoder(handle_unknown="ignore"),
+                            ["program_name", "category"],
+                        ),
+                    ]
+                ),
+            ),
+            ("classifier", LogisticRegression(max_iter=500)),
+        ]
+    )
+    return model.fit(X, y)
+
+
+def write_synthetic_encoder(onnx_dir: str, dim: int, seed: int = 0):
+    """
+    An export in export_encoder.py's layout that OnnxEncoder serves without
+    the real model: a word-level tokenizer over the synthetic vocabulary and
+    an ONNX graph that looks up one random vector per token (mean-pooled and
+    normalized by OnnxEncoder). Needs onnx and tokenizers.
+    """
+    from onnx import TensorProto, helper, numpy_helper, save_model
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers
+
+    words = sorted(
+        {w for text in PROGRAMS + INTERESTS for w in re.findall(r"\w+", text.lower())}
+    )
+    vocab = {"[PAD]": 0, "[UNK]": 1, **{w: i + 2 for i, w in enumerate(words)}}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.normalizer = normalizers.Lowercase()
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    os.makedirs(onnx_dir, exist_ok=True)
+    tokenizer.save(os.path.join(onnx_dir, "tokenizer.json"))
+
+    rng = np.random.default_rng(seed)
+    table = rng.standard_normal((len(vocab), dim)).astype(np.float32)
+    graph = helper.make_graph(
+        [helper.make_node("Gather", ["table", "input_ids"], ["last_hidden_state"])],
+        "synthetic_encoder",
+        [helper.make_tensor_value_info("input_ids", TensorProto.INT64, ["b", "s"])],
+        [
+            helper.make_tensor_value_info(
+                "last_hidden_state", TensorProto.FLOAT, ["b", "s", dim]
+            )
+        ],
+        initializer=[numpy_helper.from_array(table, "table")],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    save_model(model, os.path.join(onnx_dir, "model.onnx"))
+
+    # no parity entry: there is no reference model to check against
+    meta = {
+        "model_name": "synthetic",
+        "dim": dim,
+        "max_length": 64,
+        "pooling": "mean",
+        "normalize": True,
+        "pad_id": 0,
+        "pad_token": "[PAD]",
+    }
+    save_meta(onnx_dir, meta)
@@ -0,0 +1,91 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+Results are matched on (component, name, size). A result regresses when
+`--metric` got worse by more than `--tolerance` (relative) and by more than
+`--min-delta-ms` (absolute, so microsecond-level noise doesn't trip it).
+Exits with status 1 if anything regressed, so it can gate a deploy:
+
+    python -m benchmarks.compare benchmarks/results/baseline.json \\
+        benchmarks/results/micro.json --metric p95_ms --tolerance 0.2
+"""
+
+import argparse
+import sys
+from typing import Dict, List, Tuple
+
+from benchmarks.common import load_results
+
+Key = Tuple[str, str, object]
+
+
+def _by_key(document: Dict) -> Dict[Key, Dict]:
+    return {(r["component"], r["name"], r["size"]): r for r in document["results"]}
+
+
+def compare(
+    baseline: Dict,
+    current: Dict,
+    metric: str = "p95_ms",
+    tolerance: float = 0.2,
+    min_delta_ms: float = 0.05,
+) -> List[Dict]:
+    """One row per result present in both files, with `regressed` set."""
+    # for throughput higher is better; for latencies lower is
+    higher_is_better = metric == "ops_per_s"
+    old, new = _by_key(baseline), _by_key(current)
+    rows = []
+    for key in old.keys() & new.keys():
+        before, after = old[key].get(metric), new[key].get(metric)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else 0.0
+        if higher_is_better:
+            regressed = change < -tolerance
+        else:
+            regressed = change > tolerance and after - before > min_delta_ms
+        rows.append(
+            {
+                "key": key,
+                "baseline": before,
+                "current": after,
+                "change": change,
+                "regressed": regressed,
+            }
+        )
+    return sorted(rows, key=lambda r: tuple(str(k) for k in r["key"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument(
+        "--metric",
+        default="p95_ms",
+        choices=["p50_ms", "p95_ms", "p99_ms", "mean_ms", "ops_per_s"],
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="allowed relative change"
+    )
+    parser.add_argument("--min-delta-ms", type=float, default=0.05)
+    args = parser.parse_args()
+
+    baseline, current = load_results(args.baseline), load_results(args.current)
+    rows = compare(baseline, current, args.metric, args.tolerance, args.min_delta_ms)
+    for row in rows:
+        component, name, size = row["key"]
+        flag = "REGRESSED" if row["regressed"] else ""
+        print(
+            f"{component:10s} {name:34s} {size!s:>8s}  {row['baseline']:10.3f} -> "
+            f"{row['current']:10.3f} {args.metric} ({row['change']:+7.1%}) {flag}"
+        )
+    missing = len(baseline["results"]) - len(rows)
+    if missing:
+        print(f"{missing} baseline results have no counterpart in {args.current}.")
+
+    regressed = [r for r in rows if r["regressed"]]
+    if regressed:
+        print(f"{len(regressed)} of {len(rows)} results regressed.")
+        sys.exit(1)
+    print(f"No regressions in {len(rows)} results.")
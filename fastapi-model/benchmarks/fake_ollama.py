@@ -0,0 +1,234 @@
+"""
+Local stand-in for the Ollama HTTP API, for load tests without a model.
+
+Serves /api/tags, /api/ps, /api/version, /api/generate and /api/chat. Each
+generation waits `latency` seconds (the prefill, i.e. time to first token)
+and then produces `tokens` tokens at `tokens_per_second`, streamed as NDJSON
+like Ollama's, or returned at once with "stream": false. At most `parallel`
+generations run at a time (like OLLAMA_NUM_PARALLEL) and the rest wait for
+a slot, which is how a CPU-bound model queues under load. A generate call
+with an empty prompt only "loads the model" and returns immediately.
+
+    python -m benchmarks.fake_ollama --port 11434 --latency 0.5 \\
+        --tokens-per-second 30 --tokens 200
+    OLLAMA_HOST=http://127.0.0.1:11434 uvicorn main:app
+"""
+
+import argparse
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Sequence
+
+WORDS = [
+    "This ",
+    "college ",
+    "is ",
+    "a ",
+    "strong ",
+    "fit ",
+    "for ",
+    "your ",
+    "rank ",
+    "and ",
+    "interests. ",
+]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, body: Dict, status: int = 200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, body: Dict):
+        line = (json.dumps(body) + "\n").encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def do_GET(self):
+        fake = self.server.fake
+        if self.path == "/api/tags":
+            models = [{"name": m, "model": m} for m in fake.models]
+            self._send_json({"models": models})
+        elif self.path == "/api/ps":
+            self._send_json({"models": [{"name": fake.models[0]}]})
+        elif self.path == "/api/version":
+            self._send_json({"version": "0.0.0-fake"})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path not in ("/api/generate", "/api/chat"):
+            self._send_json({"error": "not found"}, 404)
+            return
+        fake = self.server.fake
+        model = request.get("model")
+        if model not in fake.models:
+            self._send_json({"error": f"model '{model}' not found"}, 404)
+            return
+
+        chat = self.path == "/api/chat"
+        stream = request.get("stream", True)
+        if not chat and not request.get("prompt"):
+            # model load only
+            self._send_json(
+                {"model": model, "created_at": _now(), "response": "", "done": True}
+            )
+            return
+
+        def message(text: str, done: bool) -> Dict:
+            body = {"model": model, "created_at": _now(), "done": done}
+            if chat:
+                body["message"] = {"role": "assistant", "content": text}
+            else:
+                body["response"] = text
+            if done:
+                body.update(done_reason="stop", eval_count=fake.tokens)
+            return body
+
+        with fake.generation():
+            time.sleep(fake.latency)
+            if not stream:
+                time.sleep(fake.tokens / fake.tokens_per_second)
+                text = "".join(WORDS[i % len(WORDS)] for i in range(fake.tokens))
+                self._send_json(message(text, True))
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            interval = 1.0 / fake.tokens_per_second
+            next_at = time.perf_counter()
+            for i in range(fake.tokens):
+                next_at += interval
+                time.sleep(max(0.0, next_at - time.perf_counter()))
+                self._send_chunk(message(WORDS[i % len(WORDS)], False))
+            self._send_chunk(message("", True))
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    fake: "FakeOllama"
+
+
+class FakeOllama:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.5,
+        tokens_per_second: float = 30.0,
+        tokens: int = 200,
+        parallel: int = 4,
+        models: Sequence[str] = ("mistral:latest",),
+    ):
+        """
+        Args:
+            host, port: where to listen (port 0 picks a free port)
+            latency: seconds before the first token of each generation
+            tokens_per_second: streaming speed after the first token
+            tokens: tokens per generation
+            parallel: generations served at once (0 = unlimited)
+            models: names reported by /api/tags and accepted by generate
+        """
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.tokens = tokens
+        self.models = list(models)
+        self._slots = threading.BoundedSemaphore(parallel) if parallel > 0 else None
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiting = 0
+        self.stats = {"generations": 0, "max_active": 0, "max_waiting": 0}
+
+        self._server = _Server((host, port), _Handler)
+        self._server.fake = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @contextmanager
+    def generation(self):
+        """Hold one of the `parallel` slots for a generation, keeping stats."""
+        with self._lock:
+            self._waiting += 1
+            self.stats["max_waiting"] = max(self.stats["max_waiting"], self._waiting)
+        if self._slots is not None:
+            self._slots.acquire()
+        with self._lock:
+            self._waiting -= 1
+            self._active += 1
+            self.stats["generations"] += 1
+            self.stats["max_active"] = max(self.stats["max_active"], self._active)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+            if self._slots is not None:
+                self._slots.release()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self) -> "FakeOllama":
+        """Serve from a daemon thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=30.0)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--models", nargs="+", default=["mistral:latest"])
+    args = parser.parse_args()
+
+    fake = FakeOllama(
+        args.host,
+        args.port,
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        tokens=args.tokens,
+        parallel=args.parallel,
+        models=args.models,
+    )
+    print(f"Fake Ollama listening on {fake.url}")
+    try:
+        fake.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,470 @@
+"""
+Load test for the FastAPI app against a fake Ollama server.
+
+Starts benchmarks/fake_ollama.py in-process and the app under uvicorn in
+fastapi-model/ (unless --url / --ollama-url point at running ones), waits
+for /readyz, then sends counseling requests for --duration seconds and
+reports p50/p95/p99 latency and throughput per endpoint:
+
+- combined: POST /counseling/combined
+- stream: POST /counseling/combined/stream, also timing the `ml` event
+  (stream_ml) and the first LLM token (stream_first_token)
+- batch: POST /counseling/batch with --batch-size students
+
+By default the load is closed-loop (--concurrency clients send back to
+back). With --rate the requests are sent at a fixed rate whatever the
+latency, and each latency is measured from its scheduled send time, so a
+stalled server shows up in the tail instead of lowering the load.
+
+Each request comes from a fresh JWT user, so the per-user rate limit does
+not reject the load; --distinct bounds the distinct request bodies (fewer
+means more counseling cache hits). The /metrics deltas (stage means, LLM
+admission rejections, cache and retrieval-path counters) are added to the
+report; with --workers > 1 they cover only the worker that answered.
+A result's `size` is the concurrency (or the rate, in open-loop mode).
+
+The app normally runs against the real artifacts in --app-dir. With
+--synthetic N it instead runs in a temporary directory holding N synthetic
+college rows (grouped, as embeddings.py writes them), a synthetic
+eligibility model and a synthetic ONNX encoder, so the test needs neither
+the data nor torch, e.g. in CI:
+
+    python -m benchmarks.load_test --synthetic 20000 --duration 20
+
+    python -m benchmarks.load_test --endpoints combined stream \\
+        --concurrency 16 --duration 60 --ollama-latency 0.8 \\
+        --ollama-tokens-per-second 25 --json benchmarks/results/load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import joblib
+from jose import jwt
+
+from auth.dependencies import ALGORITHM, SECRET_KEY
+from benchmarks.common import (
+    CATEGORIES,
+    INTERESTS,
+    print_result,
+    result,
+    run_meta,
+    summarize,
+    synthetic_eligibility_model,
+    write_results,
+    write_synthetic_data,
+    write_synthetic_encoder,
+)
+from benchmarks.fake_ollama import FakeOllama
+
+ENDPOINTS = ("combined", "stream", "batch")
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_SAMPLE_RE = re.compile(r"^([a-zA-Z_:][\w:]*)(\{[^}]*\})?\s+(\S+)$")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def request_bodies(n: int, seed: int = 0) -> List[dict]:
+    rng = random.Random(seed)
+    bodies = []
+    for _ in range(n):
+        body = {
+            "interests": [i.strip() for i in rng.choice(INTERESTS).split(",")],
+            "entrance_exam_rank": int(10 ** rng.uniform(2, 5)),
+        }
+        if rng.random() < 0.5:
+            body["category"] = rng.choice(CATEGORIES)
+        bodies.append(body)
+    return bodies
+
+
+def user_headers(n: int) -> Dict[str, str]:
+    """Bearer token of user `n`; one user per request stays under the rate limit."""
+    token = jwt.encode({"sub": f"loadtest-{n}"}, SECRET_KEY, algorithm=ALGORITHM)
+    return {"Authorization": f"Bearer {token}"}
+
+
+# ---------- App and Ollama processes ----------
+
+
+def write_synthetic_app(app_dir: str, n_rows: int, dim: int) -> Dict[str, str]:
+    """
+    Synthetic artifacts in `app_dir`, laid out as the app expects them in
+    fastapi-model/. Returns the environment the app needs to run there.
+    """
+    print(f"Writing {n_rows} synthetic rows and model files to {app_dir} ...")
+    data_dir = os.path.join(app_dir, "data")
+    write_synthetic_data(data_dir, n_rows, dim)
+    write_synthetic_encoder(os.path.join(data_dir, "encoder_onnx"), dim)
+    joblib.dump(
+        synthetic_eligibility_model(),
+        os.path.join(app_dir, "college_eligibility_predictor.pkl"),
+    )
+    shutil.copytree(os.path.join(APP_DIR, "prompt"), os.path.join(app_dir, "prompt"))
+    python_path = os.pathsep.join(filter(None, [APP_DIR, os.environ.get("PYTHONPATH")]))
+    return {"ENCODER_BACKEND": "onnx", "PYTHONPATH": python_path}
+
+
+def start_app(
+    port: int,
+    ollama_url: str,
+    workers: int,
+    env: Dict[str, str],
+    app_dir: str,
+    log_path: str,
+) -> subprocess.Popen:
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "main:app",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(port),
+        "--workers",
+        str(workers),
+        "--log-level",
+        "warning",
+    ]
+    app_env = {
+        **os.environ,
+        "OLLAMA_HOST": ollama_url,
+        "MODEL_RELOAD_POLL_SECONDS": "0",
+        **env,
+    }
+    print(f"Starting the app on port {port} ({workers} worker(s)); log: {log_path}")
+    with open(log_path, "w") as log:
+        return subprocess.Popen(
+            command, cwd=app_dir, env=app_env, stdout=log, stderr=subprocess.STDOUT
+        )
+
+
+def wait_ready(url: str, timeout: float, process: Optional[subprocess.Popen] = None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"The app exited with code {process.returncode}.")
+        try:
+            if httpx.get(f"{url}/readyz", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{url} was not ready after {timeout:.0f}s.")
+
+
+def stop_app(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# ---------- Metrics ----------
+
+
+def scrape_metrics(url: str) -> Dict[str, float]:
+    """`name{labels}` -> value for every sample of /metrics."""
+    try:
+        text = httpx.get(f"{url}/metrics", timeout=5).text
+    except httpx.HTTPError:
+        return {}
+    samples = {}
+    for line in text.splitlines():
+        match = _SAMPLE_RE.match(line)
+        if match and not line.startswith("#"):
+            samples[match.group(1) + (match.group(2) or "")] = float(match.group(3))
+    return samples
+
+
+def metrics_report(before: Dict[str, float], after: Dict[str, float]) -> Dict:
+    """Stage means and counter increases between two scrapes."""
+    delta = {k: v - before.get(k, 0.0) for k, v in after.items()}
+    stages = {}
+    for key, total in delta.items():
+        match = re.match(r'counseling_stage_seconds_sum\{stage="([^"]+)"\}', key)
+        if match:
+            count = delta.get(key.replace("_sum", "_count"), 0)
+            if count:
+                stages[match.group(1)] = {
+                    "count": int(count),
+                    "mean_ms": round(total / count * 1000, 3),
+                }
+    counters = {
+        k: v for k, v in delta.items() if k.split("{")[0].endswith("_total") and v
+    }
+    return {"stage_means": stages, "counters": counters}
+
+
+# ---------- Load ----------
+
+
+class LoadRun:
+    def __init__(
+        self,
+        url: str,
+        endpoints: List[str],
+        bodies: List[dict],
+        batch_size: int,
+        include_llm: bool,
+        timeout: float,
+    ):
+        self.url = url
+        self.endpoints = endpoints
+        self.bodies = bodies
+        self.batch_size = batch_size
+        self.include_llm = include_llm
+        self.timeout = timeout
+        self.samples: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Counter] = {e: Counter() for e in endpoints}
+        self._sent = 0
+
+    def _record(self, name: str, seconds: float):
+        self.samples.setdefault(name, []).append(seconds)
+
+    async def one(self, client: httpx.AsyncClient, scheduled: float):
+        i = self._sent
+        self._sent += 1
+        endpoint = self.endpoints[i % len(self.endpoints)]
+        headers = user_headers(i)
+        body = self.bodies[i % len(self.bodies)]
+        try:
+            if endpoint == "stream":
+                status = await self._stream(client, body, headers, scheduled)
+            else:
+                if endpoint == "batch":
+                    path, payload = "/counseling/batch", {
+                        "requests": [
+                            self.bodies[(i + j) % len(self.bodies)]
+                            for j in range(self.batch_size)
+                        ],
+                        "include_llm": self.include_llm,
+                    }
+                else:
+                    path, payload = "/counseling/combined", body
+                response = await client.post(path, json=payload, headers=headers)
+                status = response.status_code
+                if status == 200:
+                    self._record(endpoint, time.perf_counter() - scheduled)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        self.statuses[endpoint][str(status)] += 1
+
+    async def _stream(self, client, body, headers, scheduled) -> int:
+        first_token = None
+        async with client.stream(
+            "POST", "/counseling/combined/stream", json=body, headers=headers
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                return response.status_code
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                event = json.loads(line).get("event")
+                now = time.perf_counter() - scheduled
+                if event == "ml":
+                    self._record("stream_ml", now)
+                elif event == "token" and first_token is None:
+                    first_token = now
+                    self._record("stream_first_token", now)
+        self._record("stream", time.perf_counter() - scheduled)
+        return response.status_code
+
+    def _client(self, connections: int) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self.url,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=connections),
+        )
+
+    async def closed_loop(self, concurrency: int, duration: float):
+        deadline = time.perf_counter() + duration
+
+        async def client_loop(client):
+            while time.perf_counter() < deadline:
+                await self.one(client, time.perf_counter())
+
+        async with self._client(concurrency) as client:
+            await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+
+    async def open_loop(self, rate: float, duration: float, max_connections: int):
+        start = time.perf_counter()
+        tasks = []
+        async with self._client(max_connections) as client:
+            for n in range(int(rate * duration)):
+                scheduled = start + n / rate
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                tasks.append(asyncio.create_task(self.one(client, scheduled)))
+            await asyncio.gather(*tasks)
+
+
+def run(args) -> Tuple[List[dict], Dict]:
+    """Result rows per endpoint, and the server-side metrics report."""
+    fake, app, synthetic_dir = None, None, None
+    ollama_url, url = args.ollama_url, args.url
+    try:
+        if url is None:
+            if ollama_url is None:
+                fake = FakeOllama(
+                    latency=args.ollama_latency,
+                    tokens_per_second=args.ollama_tokens_per_second,
+                    tokens=args.ollama_tokens,
+                    parallel=args.ollama_parallel,
+                ).start()
+                ollama_url = fake.url
+                print(f"Fake Ollama on {ollama_url}")
+            port = args.port or free_port()
+            env, app_dir = {}, args.app_dir
+            if args.synthetic:
+                synthetic_dir = app_dir = tempfile.mkdtemp(prefix="load_test_app_")
+                env.update(write_synthetic_app(app_dir, args.synthetic, args.dim))
+            env.update(kv.split("=", 1) for kv in args.env)
+            app = start_app(port, ollama_url, args.workers, env, app_dir, args.app_log)
+            url = f"http://127.0.0.1:{port}"
+        wait_ready(url, args.startup_timeout, app)
+
+        load = LoadRun(
+            url,
+            args.endpoints,
+            request_bodies(args.distinct),
+            args.batch_size,
+            args.include_llm,
+            args.timeout,
+        )
+        before = scrape_metrics(url)
+        mode = f"rate={args.rate}/s" if args.rate else f"concurrency={args.concurrency}"
+        print(f"Sending {', '.join(args.endpoints)} for {args.duration}s ({mode}) ...")
+        start = time.perf_counter()
+        if args.rate:
+            asyncio.run(load.open_loop(args.rate, args.duration, args.max_connections))
+        else:
+            asyncio.run(load.closed_loop(args.concurrency, args.duration))
+        wall_s = time.perf_counter() - start
+        server = metrics_report(before, scrape_metrics(url))
+    finally:
+        if app is not None:
+            stop_app(app)
+        if fake is not None:
+            fake.stop()
+        if synthetic_dir is not None:
+            shutil.rmtree(synthetic_dir, ignore_errors=True)
+
+    size = int(args.rate) if args.rate else args.concurrency
+    params = {
+        "mode": "open" if args.rate else "closed",
+        "duration_s": round(wall_s, 2),
+        "workers": args.workers,
+        "ollama_latency": args.ollama_latency,
+        "ollama_tokens_per_second": args.ollama_tokens_per_second,
+        "ollama_tokens": args.ollama_tokens,
+        "synthetic_rows": args.synthetic,
+    }
+    results = []
+    for name, samples in sorted(load.samples.items()):
+        endpoint = name.split("_")[0]
+        extra = {}
+        if name == endpoint:
+            statuses = load.statuses[endpoint]
+            extra["statuses"] = dict(statuses)
+            extra["error_rate"] = round(
+                1 - statuses.get("200", 0) / max(1, sum(statuses.values())), 4
+            )
+        row = result("load", name, size, summarize(samples, wall_s), **params, **extra)
+        print_result(row)
+        results.append(row)
+    for endpoint, statuses in load.statuses.items():
+        if statuses and endpoint not in load.samples:
+            print(f"load       {endpoint:34s} no successful requests: {dict(statuses)}")
+    for stage, stats in sorted(server["stage_means"].items()):
+        print(
+            f"  stage {stage:14s} mean {stats['mean_ms']:9.3f} ms (n={stats['count']})"
+        )
+    if fake is not None:
+        server["fake_ollama"] = fake.stats
+    return results, server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--endpoints", nargs="+", choices=ENDPOINTS, default=["combined"]
+    )
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--rate", type=float, help="requests per second (open loop) instead"
+    )
+    parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=1000,
+        help="client connection limit in open-loop mode",
+    )
+    parser.add_argument("--distinct", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--include-llm", action="store_true", help="for batch")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--url", help="test a running app instead of starting one")
+    parser.add_argument("--ollama-url", help="use this Ollama instead of the fake")
+    parser.add_argument("--ollama-latency", type=float, default=0.5)
+    parser.add_argument("--ollama-tokens-per-second", type=float, default=30.0)
+    parser.add_argument("--ollama-tokens", type=int, default=200)
+    parser.add_argument("--ollama-parallel", type=int, default=4)
+    parser.add_argument("--port", type=int, help="app port (default: a free one)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--env",
+        nargs="*",
+        default=[],
+        metavar="KEY=VALUE",
+        help="extra app environment, e.g. LLM_MAX_IN_FLIGHT=8",
+    )
+    parser.add_argument(
+        "--app-dir",
+        default=APP_DIR,
+        help="directory the app runs in (with its data/ and model files)",
+    )
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        metavar="N_ROWS",
+        help="run the app on N_ROWS synthetic rows and models instead of --app-dir",
+    )
+    parser.add_argument(
+        "--dim", type=int, default=384, help="synthetic embedding dimension"
+    )
+    parser.add_argument(
+        "--app-log",
+        default=os.path.join(tempfile.gettempdir(), "load_test_app.log"),
+        help="where the app's output goes",
+    )
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--json", help="optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    rows, server_metrics = run(args)
+    if args.json:
+        write_results(
+            args.json, run_meta(kind="load", server_metrics=server_metrics), rows
+        )
@@ -0,0 +1,401 @@
+"""
+Per-component micro-benchmarks on synthetic data of growing size.
+
+- retriever: find_similar_colleges, filtered find_candidates (vector and
+  lexical paths) and find_candidates_batch over 10k -> 1M synthetic rows
+  (clustered unit vectors; see benchmarks/common.py), in both store layouts:
+  "grouped" (one vector per (institute, program), expanded to its rows, as
+  embeddings.py writes it; results are suffixed `_grouped`) and "rows" (one
+  vector per row)
+- scoring: the eligibility block of /counseling/combined (probabilities for
+  every candidate row, then the top 3 with one per group), compared with
+  the plain sklearn pipeline and the precomputed table
+- rate_limit: apply_rate_limit and the in-memory (or Redis) backend across
+  growing user populations
+- encoder: query encoding, when --encoder names a real backend
+
+Run from fastapi-model/ (1M x 384 float32 vectors take ~1.5 GB per copy):
+
+    python -m benchmarks.micro --sizes 10000 100000 1000000 \\
+        --json benchmarks/results/micro.json
+    python -m benchmarks.compare benchmarks/results/baseline.json \\
+        benchmarks/results/micro.json
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+
+import auth.throttling as throttling
+from ai.encoders import ENCODER_BACKENDS, load_encoder
+from ai.retrieve import Retriever
+from ai.scoring import EligibilityScorer, EligibilityTable, top_k_per_group
+from auth.throttling import InMemoryBackend, RateLimiter, RedisBackend
+from benchmarks.common import (
+    CATEGORIES,
+    INTERESTS,
+    PROGRAMS,
+    SyntheticEncoder,
+    bench,
+    print_result,
+    result,
+    run_meta,
+    synthetic_eligibility_model,
+    write_results,
+    write_synthetic_data,
+)
+
+COMPONENTS = ("retriever", "scoring", "rate_limit", "encoder")
+LAYOUTS = ("grouped", "rows")
+ML_MODEL_PATH = r"college_eligibility_predictor.pkl"
+
+
+def _filters(i: int) -> dict:
+    # like a request with a category and rank_tolerance
+    return {"category": CATEGORIES[i % len(CATEGORIES)], "min_closing_rank": 1}
+
+
+def bench_retriever(
+    sizes,
+    encoder,
+    dim,
+    index_type,
+    top_k,
+    batch_size,
+    opts,
+    tmp_dir=None,
+    layouts=LAYOUTS,
+):
+    results = []
+    for size, layout in ((size, layout) for size in sizes for layout in layouts):
+        suffix = "_grouped" if layout == "grouped" else ""
+        with tempfile.TemporaryDirectory(dir=tmp_dir) as data_dir:
+            print(f"Writing {size} synthetic rows ({layout}) to {data_dir} ...")
+            n_vectors = write_synthetic_data(
+                data_dir, size, dim, grouped=layout == "grouped"
+            )
+            start = time.perf_counter()
+            retriever = Retriever(
+                data_dir=data_dir,
+                model=encoder,
+                index_type=index_type,
+                persist_index=False,
+                lexical_mode="off",
+            )
+            build_s = round(time.perf_counter() - start, 3)
+            params = {
+                "index_type": index_type,
+                "dim": dim,
+                "build_s": build_s,
+                "layout": layout,
+                "vectors": n_vectors,
+            }
+
+            def add(name, fn, **extra):
+                row = result(
+                    "retriever",
+                    name + suffix,
+                    size,
+                    bench(fn, **opts),
+                    **params,
+                    **extra,
+                )
+                print_result(row)
+                results.append(row)
+
+            # the query cache holds the few distinct interests, as in production
+            add(
+                "find_similar_colleges",
+                lambda i: retriever.find_similar_colleges(
+                    INTERESTS[i % len(INTERESTS)], top_k=5
+                ),
+                top_k=5,
+            )
+            # a new query every call: encode + search
+            add(
+                "find_similar_colleges_uncached",
+                lambda i: retriever.find_similar_colleges(
+                    f"{INTERESTS[i % len(INTERESTS)]} {i}", top_k=5
+                ),
+                top_k=5,
+            )
+            add(
+                "find_candidates_filtered",
+                lambda i: retriever.find_candidates(
+                    INTERESTS[i % len(INTERESTS)], top_k=top_k, filters=_filters(i)
+                ),
+                top_k=top_k,
+            )
+            add(
+                f"find_candidates_batch{batch_size}",
+                lambda i: retriever.find_candidates_batch(
+                    [INTERESTS[(i + j) % len(INTERESTS)] for j in range(batch_size)],
+                    top_k=top_k,
+                    filters_list=[_filters(i + j) for j in range(batch_size)],
+                ),
+                top_k=top_k,
+            )
+
+            start = time.perf_counter()
+            retriever.set_lexical_mode("fast")
+            lexical_build_s = round(time.perf_counter() - start, 3)
+            add(
+                "find_candidates_lexical",
+                lambda i: retriever.find_candidates(
+                    PROGRAMS[i % len(PROGRAMS)], top_k=top_k, filters=_filters(i)
+                ),
+                top_k=top_k,
+                lexical_build_s=lexical_build_s,
+            )
+            del retriever
+    return results
+
+
+def _tabulate(scorer, max_rank: int = 200_000, n_points: int = 512):
+    """EligibilityTable over the synthetic pairs (as build_eligibility_table.py)."""
+    pairs = [(p, c) for p in PROGRAMS for c in CATEGORIES]
+    rank_grid = np.unique(np.geomspace(1, max_rank, n_points).round())
+    programs = np.array([p for p, _ in pairs], dtype=object)
+    categories = np.array([c for _, c in pairs], dtype=object)
+    idx = np.arange(len(pairs) * len(rank_grid))
+    probs = scorer.predict(
+        rank_grid[idx % len(rank_grid)],
+        programs[idx // len(rank_grid)],
+        categories[idx // len(rank_grid)],
+    ).reshape(len(pairs), len(rank_grid))
+    return EligibilityTable(programs, categories, rank_grid, probs.astype(np.float32))
+
+
+def bench_scoring(sizes, model_path, opts):
+    if model_path and os.path.exists(model_path):
+        print(f"Scoring with {model_path}")
+        model, model_name = joblib.load(model_path), os.path.basename(model_path)
+    else:
+        print("Scoring with a synthetic eligibility model")
+        model, model_name = synthetic_eligibility_model(), "synthetic"
+
+    pairs = [(p, c) for p in PROGRAMS for c in CATEGORIES]
+    scorer = EligibilityScorer(model, known_pairs=pairs)
+    table_scorer = EligibilityScorer(
+        model, known_pairs=pairs, validate=False, table=_tabulate(scorer)
+    )
+
+    results = []
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        ranks = rng.integers(1, 200_000, size)
+        programs = np.array(PROGRAMS, dtype=object)[
+            rng.integers(0, len(PROGRAMS), size)
+        ]
+        categories = np.array(CATEGORIES, dtype=object)[
+            rng.integers(0, len(CATEGORIES), size)
+        ]
+        # ~20 retrieved groups, as with top_k=20
+        groups = np.sort(rng.integers(0, 20, size))
+        frame = pd.DataFrame(
+            {"student_rank": ranks, "program_name": programs, "category": categories}
+        )
+        params = {"model": model_name, "compiled": scorer.compiled}
+
+        def score_and_select(i, scorer=scorer):
+            # the block in recommend_colleges: probabilities, then top 3 per group
+            probs = scorer.predict(ranks, programs, categories)
+            return top_k_per_group(probs, groups, 3)
+
+        benches = {
+            "pipeline_predict_proba": lambda i: model.predict_proba(frame)[:, 1],
+            "scorer_predict": lambda i: scorer.predict(ranks, programs, categories),
+            "scorer_predict_table": lambda i: table_scorer.predict(
+                ranks, programs, categories
+            ),
+            "top_k_per_group": lambda i: top_k_per_group(rng.random(size), groups, 3),
+            "score_and_select": score_and_select,
+            "score_and_select_table": lambda i: score_and_select(i, table_scorer),
+        }
+        for name, fn in benches.items():
+            row = result("scoring", name, size, bench(fn, **opts), **params)
+            print_result(row)
+            results.append(row)
+    return results
+
+
+def bench_rate_limit(sizes, redis_url, opts):
+    results = []
+    backends = {"memory": InMemoryBackend}
+    if redis_url:
+        backends["redis"] = lambda: RedisBackend(redis_url)
+
+    original = throttling.limiter
+    try:
+        for size in sizes:
+            users = [f"user-{u}" for u in range(size)]
+            for backend_name, make_backend in backends.items():
+                params = {"backend": backend_name, "users": size}
+
+                limiter = RateLimiter(make_backend())
+                row = result(
+                    "rate_limit",
+                    f"limiter_hit[{backend_name}]",
+                    size,
+                    bench(
+                        lambda i: limiter.hit(users[i % size], 1_000_000, 60), **opts
+                    ),
+                    **params,
+                )
+                print_result(row)
+                results.append(row)
+
+                # through the FastAPI dependency (a coroutine, driven on one
+                # loop); users beyond their limit raise
+                throttling.limiter = RateLimiter(make_backend())
+                rejected = [0]
+                loop = asyncio.new_event_loop()
+
+                def apply(i):
+                    try:
+                        loop.run_until_complete(
+                            throttling.apply_rate_limit(users[i % size])
+                        )
+                    except HTTPException:
+                        rejected[0] += 1
+
+                try:
+                    stats = bench(apply, **opts)
+                finally:
+                    loop.close()
+                row = result(
+                    "rate_limit",
+                    f"apply_rate_limit[{backend_name}]",
+                    size,
+                    stats,
+                    **params,
+                    rejected=rejected[0],
+                )
+                print_result(row)
+                results.append(row)
+    finally:
+        throttling.limiter = original
+    return results
+
+
+def bench_encoder(encoder, backend, batch_size, opts):
+    results = []
+    benches = {
+        "encode_query": lambda i: encoder.encode(
+            [f"{INTERESTS[i % len(INTERESTS)]} {i}"]
+        ),
+        f"encode_batch{batch_size}": lambda i: encoder.encode(
+            [f"{INTERESTS[j % len(INTERESTS)]} {i}" for j in range(batch_size)],
+            batch_size=batch_size,
+        ),
+    }
+    for name, fn in benches.items():
+        row = result("encoder", name, None, bench(fn, **opts), backend=backend)
+        print_result(row)
+        results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--components", nargs="+", choices=COMPONENTS, default=list(COMPONENTS)
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10_000, 100_000],
+        help="synthetic rows per retriever run (e.g. 10000 100000 1000000)",
+    )
+    parser.add_argument(
+        "--layouts",
+        nargs="+",
+        choices=LAYOUTS,
+        default=list(LAYOUTS),
+        help="store layouts to benchmark the retriever on",
+    )
+    parser.add_argument(
+        "--candidate-sizes",
+        type=int,
+        nargs="+",
+        default=[100, 1_000, 10_000],
+        help="candidate rows per scoring call",
+    )
+    parser.add_argument(
+        "--user-sizes",
+        type=int,
+        nargs="+",
+        default=[1_000, 100_000],
+        help="distinct users per rate-limit run",
+    )
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument(
+        "--index-type",
+        default="flat",
+        choices=["flat", "ivf_flat", "hnsw", "ivf_pq"],
+    )
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument(
+        "--encoder",
+        default="synthetic",
+        choices=("synthetic",) + ENCODER_BACKENDS,
+        help="query encoder; 'synthetic' measures search without a model",
+    )
+    parser.add_argument("--model", default=ML_MODEL_PATH, help="eligibility model")
+    parser.add_argument("--redis-url", help="also benchmark the Redis rate limiter")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=10.0,
+        help="time budget per benchmark (at least 5 calls are timed)",
+    )
+    parser.add_argument(
+        "--tmp-dir", help="where to write the synthetic data (default: system temp)"
+    )
+    parser.add_argument("--json", help="optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    opts = {
+        "repeat": args.repeat,
+        "warmup": args.warmup,
+        "max_seconds": args.max_seconds,
+    }
+    if args.encoder == "synthetic":
+        encoder = SyntheticEncoder(args.dim)
+    else:
+        encoder = load_encoder(args.encoder)
+    dim = encoder.get_sentence_embedding_dimension()
+
+    results = []
+    if "retriever" in args.components:
+        results += bench_retriever(
+            args.sizes,
+            encoder,
+            dim,
+            args.index_type,
+            args.top_k,
+            args.batch_size,
+            opts,
+            tmp_dir=args.tmp_dir,
+            layouts=args.layouts,
+        )
+    if "scoring" in args.components:
+        results += bench_scoring(args.candidate_sizes, args.model, opts)
+    if "rate_limit" in args.components:
+        results += bench_rate_limit(args.user_sizes, args.redis_url, opts)
+    if "encoder" in args.components and args.encoder != "synthetic":
+        results += bench_encoder(encoder, args.encoder, args.batch_size, opts)
+
+    if args.json:
+        write_results(args.json, run_meta(kind="micro", encoder=args.encoder), results)
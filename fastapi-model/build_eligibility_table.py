@@ -0,0 +1,111 @@
+"""
+Tabulate the eligibility model into data/eligibility_table.npz.
+
+For every (program_name, category) pair in the college store, evaluates
+college_eligibility_predictor.pkl on a log-spaced student_rank grid, so the
+API can serve eligibility_prob by interpolation instead of a model call.
+Then prints a validation report: the deviation of the interpolated lookup
+from the live model at random off-grid ranks. Ranks outside the grid are
+never looked up; the API scores those with the model.
+
+    python build_eligibility_table.py --points 512 --max-rank 1000000
+"""
+
+import argparse
+
+import joblib
+import numpy as np
+
+from ai.scoring import (
+    EligibilityScorer,
+    EligibilityTable,
+    file_sha1,
+    fill_missing_programs,
+)
+from ai.store import CollegeStore
+
+MODEL_PATH = r"college_eligibility_predictor.pkl"
+STORE_PATH = r"data/college_store"
+TABLE_PATH = r"data/eligibility_table.npz"
+
+
+def build_table(n_points: int = 512, max_rank: int = 1_000_000, batch: int = 200_000):
+    print(f"Loading model from {MODEL_PATH} and pairs from {STORE_PATH}...")
+    model = joblib.load(MODEL_PATH)
+    store = CollegeStore.load(STORE_PATH)
+    pairs = store.unique_values("program_name", "category")
+    scorer = EligibilityScorer(model, known_pairs=pairs)
+
+    rank_grid = np.unique(np.geomspace(1, max_rank, n_points).round())
+    print(
+        f"Tabulating {len(pairs)} (program, category) pairs x "
+        f"{len(rank_grid)} ranks..."
+    )
+    table = tabulate(scorer, pairs, rank_grid, batch=batch)
+    table.model_sha1 = file_sha1(MODEL_PATH)
+    report = validate_table(table, scorer)
+    table.max_abs_error = report["max_abs_error"]
+
+    table.save(TABLE_PATH)
+    print(
+        f"Saved eligibility table ({table.probs.nbytes / 1e6:.1f} MB) to {TABLE_PATH}"
+    )
+    return table, report
+
+
+def tabulate(scorer, pairs, rank_grid, batch: int = 200_000) -> EligibilityTable:
+    """Evaluate `scorer` for every (program, category) pair at every grid rank."""
+    # stored under MISSING_PROGRAM, the name the scorer looks them up by
+    programs = fill_missing_programs([p for p, _ in pairs])
+    categories = np.array([c for _, c in pairs], dtype=object)
+    n_grid = len(rank_grid)
+    flat_probs = np.empty(len(pairs) * n_grid, dtype=np.float64)
+    # row-major (pair, rank); scored in batches to bound memory
+    for start in range(0, len(flat_probs), batch):
+        idx = np.arange(start, min(start + batch, len(flat_probs)))
+        flat_probs[idx] = scorer.predict(
+            rank_grid[idx % n_grid], programs[idx // n_grid], categories[idx // n_grid]
+        )
+    probs = flat_probs.reshape(len(pairs), n_grid).astype(np.float32)
+    return EligibilityTable(programs, categories, rank_grid, probs)
+
+
+def validate_table(table, scorer, n_checks=50_000):
+    """
+    Compare interpolated lookups with the live model at random ranks across
+    the whole grid, the only ranks the table serves.
+    """
+    pairs = list(table.pair_codes)
+    programs = np.array([p for p, _ in pairs], dtype=object)
+    categories = np.array([c for _, c in pairs], dtype=object)
+    low, high = np.log(table.rank_grid[0]), np.log(table.rank_grid[-1])
+
+    rng = np.random.default_rng(0)
+    pick = rng.integers(0, len(pairs), n_checks)
+    ranks = np.exp(rng.uniform(low, high, n_checks)).round()
+
+    live = scorer.predict(ranks, programs[pick], categories[pick])
+    looked_up = table.lookup(ranks, table.codes(programs[pick], categories[pick]))
+    errors = np.abs(live - looked_up)
+
+    report = {
+        "checks": n_checks,
+        "max_abs_error": float(errors.max()),
+        "mean_abs_error": float(errors.mean()),
+        "p99_abs_error": float(np.quantile(errors, 0.99)),
+    }
+    print(
+        "Validation vs. live model: "
+        f"max={report['max_abs_error']:.5f} "
+        f"p99={report['p99_abs_error']:.5f} "
+        f"mean={report['mean_abs_error']:.6f} over {n_checks} random lookups"
+    )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=512)
+    parser.add_argument("--max-rank", type=int, default=1_000_000)
+    args = parser.parse_args()
+    build_table(n_points=args.points, max_rank=args.max_rank)
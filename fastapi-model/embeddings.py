@@ -1,57 +1,144 @@
-import json
+import argparse
 import os
 
 import numpy as np
-import pandas as pd
-from sentence_transformers import SentenceTransformer
 
+from ai.encoders import load_encoder
+from ai.index import update_persisted_indexes
+from ai.ingest import (
+    Source,
+    group_rows,
+    map_college_ratings,
+    map_counselling,
+    map_medical_scores,
+    merge_shards,
+    multi_process_encoder,
+    shard_row_hashes,
+    write_shards,
+)
+from ai.vector_cache import VectorCache
 
-def create_and_save_embeddings():
-    CSV_PATH = r"data/New folder/Engineering.csv"
-    EMBEDDINGS_PATH = r"data/embed.npy"
-    JSON_DATA_PATH = r"data/college_data.json"
-
-    print("Loading dataset...")
-    df = pd.read_csv(CSV_PATH)
-    df = df.rename(columns={c: c.strip().lower() for c in df.columns})
-    print("Detected columns:", df.columns.tolist())
-
-    # Ensure required columns exist
-    required_cols = ["institute_short", "program_name", "category", "closing_rank"]
-    for col in required_cols:
-        if col not in df.columns:
-            raise ValueError(f"Missing required column: {col}")
-
-    # Build description used for embeddings
-    df["full_description"] = (
-        df["institute_short"].astype(str)
-        + " offers "
-        + df["program_name"].astype(str)
-        + " ("
-        + df["category"].astype(str)
-        + ") "
-        + " with closing rank "
-        + df["closing_rank"].astype(str)
-    )
+MODEL_NAME = "all-MiniLM-L6-v2"
+ONNX_DIR = r"data/encoder_onnx"
+
+SOURCES = [
+    Source(r"data/New folder/Engineering.csv", map_counselling),
+    Source(r"data/New folder/combined_college_data.csv", map_counselling),
+    Source(r"data/New folder/medical_clg_score.csv", map_medical_scores),
+    Source(r"data/Agriculture.csv", map_college_ratings),
+    Source(r"data/Arts.csv", map_college_ratings),
+]
+
+
+class LazyEncoder:
+    """Loads the model and starts the worker pool only if something needs encoding."""
 
-    print("Loading embedding model (this may take a moment)...")
-    model = SentenceTransformer("all-MiniLM-L6-v2")
+    def __init__(self, workers=None, backend="torch"):
+        self.workers = workers
+        self.backend = backend
+        self._encode = None
+        self._close = lambda: None
 
-    print("Generating embeddings for the dataset...")
-    embeddings = model.encode(df["full_description"].tolist(), show_progress_bar=True)
+    def __call__(self, texts):
+        if self._encode is None:
+            print("Loading embedding model (this may take a moment)...")
+            model = load_encoder(self.backend, MODEL_NAME, ONNX_DIR)
+            # ONNX Runtime already spreads one call over every core
+            workers = self.workers if self.backend == "torch" else 1
+            self._encode, self._close = multi_process_encoder(model, workers)
+        return self._encode(texts)
 
-    print(f"Saving embeddings to {EMBEDDINGS_PATH}...")
-    np.save(EMBEDDINGS_PATH, embeddings)
+    def close(self):
+        self._close()
 
-    # Save full structured data including closing_rank
-    college_data = df.to_dict(orient="records")
-    with open(JSON_DATA_PATH, "w") as f:
-        json.dump(college_data, f, indent=2)
 
+def create_and_save_embeddings(workers=None, chunksize=8192, backend="torch"):
+    """
+    Ingest every source CSV and save embed.npy + the college store.
+
+    Sources are streamed in chunks onto one schema (see ai/ingest.py) and
+    written as shards; only (institute, program) texts that aren't in the
+    content-addressed vector cache are encoded, on a multi-process pool.
+    The shards are then merged into the files the Retriever memory-maps:
+    one vector per (institute, program) group, or (institute, stream) for
+    sources without programs, and every row in the store.
+    When groups were only appended, persisted FAISS indexes are extended in
+    place; otherwise they are dropped and rebuilt by the Retriever.
+
+    `backend` picks the encoder (see ai/encoders.py); vectors from different
+    backends are cached separately.
+    """
+    EMBEDDINGS_PATH = r"data/embed.npy"
+    VECTOR_HASHES_PATH = r"data/embed_hashes.npy"
+    VECTOR_CACHE_PATH = r"data/embed_cache"
+    SHARD_DIR = r"data/shards"
+    STORE_PATH = r"data/college_store"
+    DATA_DIR = r"data"
+
+    cache = VectorCache(VECTOR_CACHE_PATH)
+    encoder = LazyEncoder(workers, backend)
+    cache_model_name = MODEL_NAME if backend == "torch" else f"{MODEL_NAME}@{backend}"
+    try:
+        manifest = write_shards(
+            SOURCES, SHARD_DIR, cache, cache_model_name, encoder, chunksize=chunksize
+        )
+    finally:
+        encoder.close()
+    if not manifest["shards"]:
+        raise ValueError("No source CSVs found; nothing to embed.")
+
+    group_ids, vector_hashes = group_rows(shard_row_hashes(SHARD_DIR, manifest))
     print(
-        f"Saved {len(college_data)} rows with embeddings + metadata to {JSON_DATA_PATH}"
+        f"{len(group_ids)} rows share {len(vector_hashes)} group vectors "
+        "(institute and program, or stream where no program is given)"
+    )
+    old_vector_hashes = None
+    if os.path.exists(VECTOR_HASHES_PATH) and os.path.exists(EMBEDDINGS_PATH):
+        old_vector_hashes = np.load(VECTOR_HASHES_PATH)
+    unchanged = old_vector_hashes is not None and np.array_equal(
+        old_vector_hashes, vector_hashes
+    )
+    if unchanged:
+        print("Embeddings are unchanged; keeping existing embed.npy.")
+    else:
+        print(f"Merging {len(manifest['shards'])} shards into {EMBEDDINGS_PATH}...")
+
+    store = merge_shards(
+        SHARD_DIR,
+        EMBEDDINGS_PATH,
+        STORE_PATH,
+        manifest=manifest,
+        write_embeddings=not unchanged,
+        group_ids=group_ids,
     )
+    if not unchanged:
+        np.save(VECTOR_HASHES_PATH, vector_hashes)
+        update_persisted_indexes(
+            DATA_DIR,
+            old_vector_hashes,
+            vector_hashes,
+            np.load(EMBEDDINGS_PATH, mmap_mode="r"),
+        )
+
+    print(f"Saved {len(store)} rows with embeddings + metadata to {STORE_PATH}")
 
 
 if __name__ == "__main__":
-    create_and_save_embeddings()
+    parser = argparse.ArgumentParser(description="Build embeddings for all sources")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="encoder processes (default: one per core; 1 encodes in-process)",
+    )
+    parser.add_argument("--chunksize", type=int, default=8192)
+    parser.add_argument(
+        "--backend",
+        choices=["torch", "onnx", "onnx-int8"],
+        default="torch",
+        help="encoder backend (onnx variants need export_encoder.py first)",
+    )
+    args = parser.parse_args()
+    create_and_save_embeddings(
+        workers=args.workers, chunksize=args.chunksize, backend=args.backend
+    )
@@ -0,0 +1,96 @@
+"""
+Recall@k vs. latency report for the approximate FAISS index types.
+
+Uses rows of data/embed.npy (with a little noise) as queries, takes the exact
+IndexFlatL2 results as ground truth, and sweeps nprobe / efSearch for each
+approximate index type. Trained indexes are saved next to embed.npy so the
+Retriever can reuse them.
+
+    python evaluate_index.py --k 20 --queries 500 --json data/index_report.json
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from ai.index import INDEX_TYPES, configure_search, load_or_build_index
+
+EMBEDDINGS_PATH = r"data/embed.npy"
+DATA_DIR = r"data"
+
+SWEEPS = {
+    "flat": [{}],
+    "ivf_flat": [{"nprobe": p} for p in (1, 4, 8, 16, 32, 64)],
+    "ivf_pq": [{"nprobe": p} for p in (1, 4, 8, 16, 32, 64)],
+    "hnsw": [{"ef_search": e} for e in (16, 32, 64, 128, 256)],
+}
+
+
+def recall_at_k(approx: np.ndarray, exact: np.ndarray) -> float:
+    hits = sum(len(set(a) & set(e)) for a, e in zip(approx, exact))
+    return hits / exact.size
+
+
+def timed_search(index, queries: np.ndarray, k: int):
+    # one query at a time, like the API does
+    start = time.perf_counter()
+    results = np.vstack([index.search(q.reshape(1, -1), k)[1] for q in queries])
+    per_query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    return results, per_query_ms
+
+
+def evaluate(k: int = 20, n_queries: int = 500, seed: int = 0):
+    print(f"Loading embeddings from {EMBEDDINGS_PATH}...")
+    embeddings = np.ascontiguousarray(np.load(EMBEDDINGS_PATH), dtype=np.float32)
+    n = embeddings.shape[0]
+    k = min(k, n)
+
+    rng = np.random.default_rng(seed)
+    queries = embeddings[rng.choice(n, min(n_queries, n), replace=False)]
+    queries = queries + rng.normal(0, 0.01, queries.shape).astype(np.float32)
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+
+    report = []
+    exact = None
+    for index_type in INDEX_TYPES:
+        start = time.perf_counter()
+        index = load_or_build_index(
+            embeddings, DATA_DIR, index_type, embeddings_path=EMBEDDINGS_PATH
+        )
+        build_s = time.perf_counter() - start
+
+        for params in SWEEPS[index_type]:
+            configure_search(index, **params)
+            results, latency_ms = timed_search(index, queries, k)
+            if exact is None:
+                exact = results
+            row = {
+                "index_type": index_type,
+                **params,
+                f"recall@{k}": round(recall_at_k(results, exact), 4),
+                "ms_per_query": round(latency_ms, 4),
+                "load_or_build_s": round(build_s, 3),
+            }
+            report.append(row)
+            knobs = ", ".join(f"{key}={val}" for key, val in params.items()) or "-"
+            print(
+                f"{index_type:9s} {knobs:15s} recall@{k}={row[f'recall@{k}']:.4f} "
+                f"{latency_ms:8.3f} ms/query"
+            )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--json", help="optional path to write the report as JSON")
+    args = parser.parse_args()
+
+    rows = evaluate(k=args.k, n_queries=args.queries)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Saved report to {args.json}")
@@ -0,0 +1,127 @@
+"""
+Export the query encoder to ONNX (fp32 and int8) for torch-free serving.
+
+Writes data/encoder_onnx/{model.onnx, model.int8.onnx, tokenizer.json,
+encoder.json}, then encodes a parity set with the torch model and with
+each ONNX variant and records their cosine similarity in encoder.json.
+The API (ENCODER_BACKEND=auto) only serves variants that reached
+--min-cosine. The parity set is a sample of the college descriptions plus
+typical interest queries, so it covers both sides of the search.
+
+    python export_encoder.py --min-cosine 0.99
+    ENCODER_BACKEND=onnx-int8 uvicorn main:app
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from ai.encoders import (
+    OnnxEncoder,
+    cosine_parity,
+    export_onnx,
+    load_sentence_transformer,
+    quantize_onnx,
+    save_meta,
+)
+from ai.store import CollegeStore
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+ONNX_DIR = r"data/encoder_onnx"
+STORE_PATH = r"data/college_store"
+
+PARITY_QUERIES = [
+    "computer science",
+    "electrical engineering, robotics",
+    "mechanical, aerospace engineering",
+    "medicine, biology",
+    "civil engineering and architecture",
+    "chemical engineering",
+    "data science, artificial intelligence, machine learning",
+    "agriculture",
+    "fine arts, literature",
+    "electronics and communication",
+]
+
+
+def parity_texts(n_descriptions: int, seed: int = 0):
+    texts = list(PARITY_QUERIES)
+    if CollegeStore.exists(STORE_PATH):
+        store = CollegeStore.load(STORE_PATH)
+        if "full_description" in store.columns:
+            rng = np.random.default_rng(seed)
+            rows = rng.choice(
+                len(store), min(n_descriptions, len(store)), replace=False
+            )
+            texts += [r["full_description"] for r in store.records(np.sort(rows))]
+    return texts
+
+
+def timed_encode(encoder, texts, batch_size):
+    start = time.perf_counter()
+    vectors = encoder.encode(texts, batch_size=batch_size)
+    return np.asarray(vectors, dtype=np.float32), time.perf_counter() - start
+
+
+def export(min_cosine: float, quantize: bool, n_descriptions: int, opset: int):
+    print(f"Exporting {MODEL_NAME} to {ONNX_DIR} ...")
+    meta = export_onnx(MODEL_NAME, ONNX_DIR, opset=opset)
+    variants = ["onnx"]
+    if quantize:
+        print("Quantizing weights to int8 ...")
+        quantize_onnx(ONNX_DIR)
+        variants.append("onnx-int8")
+    # OnnxEncoder reads the settings from encoder.json
+    save_meta(ONNX_DIR, meta)
+
+    texts = parity_texts(n_descriptions)
+    print(f"Checking parity on {len(texts)} texts ...")
+    reference, torch_seconds = timed_encode(
+        load_sentence_transformer(MODEL_NAME, device="cpu"), texts, 32
+    )
+    report = {"torch": {"batch_seconds": torch_seconds}}
+    meta["parity"] = {}
+    for backend in variants:
+        encoder = OnnxEncoder(ONNX_DIR, quantized=backend == "onnx-int8")
+        vectors, seconds = timed_encode(encoder, texts, 32)
+        parity = cosine_parity(reference, vectors)
+        parity["passed"] = parity["min_cosine"] >= min_cosine
+        meta["parity"][backend] = parity
+        report[backend] = {**parity, "batch_seconds": seconds}
+
+    meta["min_cosine"] = min_cosine
+    save_meta(ONNX_DIR, meta)
+
+    for backend, row in report.items():
+        details = ", ".join(
+            f"{k}={v:.4f}" if isinstance(v, float) else f"{k}={v}"
+            for k, v in row.items()
+        )
+        print(f"  {backend:10s} {details}")
+    failed = [b for b in variants if not meta["parity"][b]["passed"]]
+    if failed:
+        print(f"Parity below {min_cosine} for {failed}; auto will not serve them.")
+    return meta
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--min-cosine",
+        type=float,
+        default=0.99,
+        help="lowest per-text cosine vs. torch a variant may have to be served",
+    )
+    parser.add_argument(
+        "--no-quantize", action="store_true", help="skip the int8 variant"
+    )
+    parser.add_argument(
+        "--descriptions",
+        type=int,
+        default=500,
+        help="college descriptions sampled into the parity set",
+    )
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+    export(args.min_cosine, not args.no_quantize, args.descriptions, args.opset)
@@ -1,19 +1,99 @@
+import asyncio
+import json
 import logging  # Import logging
+import os
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Optional
 
 import joblib
+import numpy as np
 import pandas as pd
-from ai.ollamas import Ollama
+from ai.admission import AdmissionController, AdmissionRejected
+from ai.cache import ResponseCache
+from ai.encoders import load_encoder
+from ai.jobs import DONE, FAILED, QUEUED, Job, JobManager, JobQueueFull
+from ai.metrics import (
+    CACHE_REQUESTS,
+    CONTENT_TYPE,
+    HTTP_REQUEST_SECONDS,
+    LLM_ADMISSION_REJECTIONS,
+    REGISTRY,
+    STAGE_SECONDS,
+    configure_logging,
+    request_id_var,
+)
+from ai.ollamas import AsyncOllama
+from ai.prompt import Prompt, PromptBuilder
+from ai.registry import ModelRegistry, ServingBundle
 from ai.retrieve import Retriever
-from auth.dependencies import get_user_identifier
-from auth.throttling import apply_rate_limit
-from fastapi import Depends, FastAPI
+from ai.scoring import EligibilityScorer, EligibilityTable, file_sha1, top_k_per_group
+from auth.dependencies import get_user_identifier, require_admin
+from auth.throttling import (
+    UNAUTHENTICATED_USER,
+    apply_batch_rate_limit,
+    apply_rate_limit,
+)
+from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from schemas import CollegeRecommendation, CombinedResponse, CounselRequest
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from schemas import (
+    BatchCounselRequest,
+    BatchCounselResponse,
+    BatchCounselResult,
+    CollegeRecommendation,
+    CombinedResponse,
+    CounselingJob,
+    CounselRequest,
+)
 
 # --- Basic Logging Setup ---
-logging.basicConfig(level=logging.INFO)
+# every line carries the request ID (X-Request-ID) of the request it belongs to
+configure_logging(logging.INFO)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Artifacts load in the background so the process answers /healthz
+    # right away; /readyz turns 200 once they are loaded and warmed.
+    startup_task = asyncio.create_task(start_serving())
+    counseling_jobs.start()
+    yield
+    startup_task.cancel()
+    await counseling_jobs.stop()
+    if _watcher_task is not None:
+        _watcher_task.cancel()
+    await ai_platform.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """Tag logs with a request ID (the client's X-Request-ID if sent) and time the request."""
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex[:16]
+    token = request_id_var.set(request_id)
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status_code),
+        )
+        request_id_var.reset(token)
 
-app = FastAPI()
 
 # --- CORS Setup ---
 origins = [
@@ -41,28 +121,379 @@ def load_system_prompt():
         with open("prompt/system_prompt.md", "r") as f:
             return f.read()
     except FileNotFoundError:
-        print("Warning: system_prompt.md not found.")
+        logging.warning("system_prompt.md not found.")
         return ""
 
 
 SYSTEM_PROMPT = load_system_prompt()
-ai_platform = Ollama(model="mistral:latest")
+# Budget for system + user prompt tokens; lower-ranked colleges are dropped
+# to fit. The system part is identical for every request, so Ollama can reuse
+# its KV cache while keep_alive holds the model.
+prompt_builder = PromptBuilder(
+    SYSTEM_PROMPT, max_tokens=int(os.environ.get("LLM_PROMPT_MAX_TOKENS", "1024"))
+)
+ai_platform = AsyncOllama(
+    model="mistral:latest",
+    host=os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434"),
+    keep_alive=os.environ.get("OLLAMA_KEEP_ALIVE", "30m"),
+)
+
+# --- LLM Admission Control ---
+# Bounds concurrent generations on the local model; requests beyond the queue
+# (or queued past the deadline) get a templated answer instead of waiting.
+llm_admission = AdmissionController(
+    max_in_flight=int(os.environ.get("LLM_MAX_IN_FLIGHT", "4")),
+    max_queue=int(os.environ.get("LLM_MAX_QUEUE", "32")),
+    queue_timeout=float(os.environ.get("LLM_QUEUE_TIMEOUT_SECONDS", "15")),
+)
+
+
+def llm_priority(user_id: str) -> int:
+    """Authenticated users are admitted ahead of anonymous traffic."""
+    return 1 if user_id == UNAUTHENTICATED_USER else 0
+
+
+@asynccontextmanager
+async def llm_slot(priority: int):
+    """llm_admission.slot() that records the queue wait and generation time."""
+    start = time.perf_counter()
+    try:
+        await llm_admission.acquire(priority)
+    except AdmissionRejected as e:
+        LLM_ADMISSION_REJECTIONS.inc(reason=e.reason)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="llm_queue")
+    try:
+        with STAGE_SECONDS.time(stage="llm_generate"):
+            yield
+    finally:
+        llm_admission.release()
+
+
+# --- Serving Artifacts ---
+ML_MODEL_PATH = "college_eligibility_predictor.pkl"
+ELIGIBILITY_TABLE_PATH = "data/eligibility_table.npz"
+# Largest validated deviation from the live model we accept from the table
+ELIGIBILITY_TABLE_MAX_ERROR = 0.01
+ENCODER_MODEL_NAME = "all-MiniLM-L6-v2"
+# "auto" serves the ONNX export (data/encoder_onnx, see export_encoder.py)
+# when its parity check passed, without importing torch; else the torch model
+ENCODER_BACKEND = os.environ.get("ENCODER_BACKEND", "auto")
+ENCODER_ONNX_DIR = "data/encoder_onnx"
+# "fast" answers literal program/stream names from an inverted index
+# without the encoder; "hybrid" also fuses partial matches; "off" disables it
+LEXICAL_MODE = os.environ.get("LEXICAL_MODE", "fast")
+# rows from sources without closing ranks (Arts, Agriculture) can't be scored;
+# the Retriever leaves them out once at load instead of filtering every search
+RETRIEVER_BASE_FILTERS = {"min_closing_rank": 1}
+# Files whose change triggers a hot reload (the store manifest is written last)
+SERVING_ARTIFACTS = [
+    "data/embed.npy",
+    "data/college_store/manifest.json",
+    ML_MODEL_PATH,
+    ELIGIBILITY_TABLE_PATH,
+]
+# Seconds between artifact checks; 0 disables the watcher
+RELOAD_POLL_SECONDS = float(os.environ.get("MODEL_RELOAD_POLL_SECONDS", "10"))
+# Send a dummy query through the encoder/index and load the Ollama model
+# before reporting ready; WARMUP_ON_STARTUP=0 skips it
+WARMUP_ON_STARTUP = os.environ.get("WARMUP_ON_STARTUP", "1") != "0"
+WARMUP_TIMEOUT_SECONDS = float(os.environ.get("WARMUP_TIMEOUT_SECONDS", "60"))
+
+
+def load_eligibility_table():
+    """Precomputed table from build_eligibility_table.py, if it matches the model."""
+    if not os.path.exists(ELIGIBILITY_TABLE_PATH):
+        return None
+    try:
+        table = EligibilityTable.load(ELIGIBILITY_TABLE_PATH)
+    except Exception as e:
+        logging.warning("Eligibility table failed to load: %s", e)
+        return None
+    if table.model_sha1 != file_sha1(ML_MODEL_PATH):
+        logging.warning(
+            "Eligibility table was built for a different model; ignoring it."
+        )
+        return None
+    if not table.max_abs_error <= ELIGIBILITY_TABLE_MAX_ERROR:
+        logging.warning(
+            "Eligibility table error %.4f exceeds %s; ignoring it.",
+            table.max_abs_error,
+            ELIGIBILITY_TABLE_MAX_ERROR,
+        )
+        return None
+    return table
+
+
+def load_serving_bundle(previous: Optional[ServingBundle] = None) -> ServingBundle:
+    """
+    Load the retriever and eligibility scorer from the artifacts on disk.
+
+    The encoder, the index + metadata store, the sklearn model and the
+    eligibility table load concurrently; only the scorer, which needs the
+    store's (program, category) pairs, waits for the others. The
+    encoder of `previous` is reused, since only data changes.
+    """
+    bundle = ServingBundle()
+
+    def timed(component, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            bundle.timings[component] = time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        if previous is not None:
+            encoder = previous.retriever.model
+        else:
+            encoder = pool.submit(
+                timed,
+                "encoder",
+                load_encoder,
+                ENCODER_BACKEND,
+                ENCODER_MODEL_NAME,
+                ENCODER_ONNX_DIR,
+            )
+        # mmap: uvicorn workers share one page-cached copy of the vectors/index
+        retriever_future = pool.submit(
+            timed,
+            "index",
+            Retriever,
+            mmap=True,
+            model=encoder,
+            lexical_mode=LEXICAL_MODE,
+            base_filters=RETRIEVER_BASE_FILTERS,
+        )
+        ml_model_future = pool.submit(timed, "ml_model", joblib.load, ML_MODEL_PATH)
+        table_future = pool.submit(timed, "eligibility_table", load_eligibility_table)
+
+    try:
+        if isinstance(encoder, Future):
+            encoder.result()
+        bundle.retriever = retriever_future.result()
+    except Exception as e:
+        bundle.error = str(e)
+        logging.error("Retriever failed to initialize: %s", bundle.error)
+
+    try:
+        ml_model = ml_model_future.result()
+    except Exception as e:
+        logging.error("ML model failed to load: %s", e)
+        bundle.error = bundle.error or "ML model not loaded."
+        return bundle
+
+    # Vectorized scorer: (program, category) pairs are pre-encoded at load time
+    retriever = bundle.retriever
+    known_pairs = None
+    if retriever and {"program_name", "category"} <= set(retriever.store.categories):
+        known_pairs = retriever.store.unique_values("program_name", "category")
+    bundle.eligibility_scorer = timed(
+        "scorer",
+        EligibilityScorer,
+        ml_model,
+        known_pairs=known_pairs,
+        table=table_future.result(),
+    )
+    return bundle
+
+
+registry = ModelRegistry(load_serving_bundle, watch_paths=SERVING_ARTIFACTS)
+
+
+# --- LLM Response Cache ---
+# The semantic tier matches near-duplicate interest lists for the same
+# recommended colleges. It reuses the embedding the retrieval stage put in
+# the retriever's query cache and never runs the encoder itself: queries
+# answered by the lexical index have no embedding and are matched exactly.
+def _cached_interests_embedding(text):
+    retriever = registry.current.retriever
+    return retriever.cached_query_embedding(text) if retriever else None
+
+
+response_cache = ResponseCache(encoder=_cached_interests_embedding)
+
+
+async def get_cached_counseling(cache_key):
+    text = response_cache.get(cache_key)
+    if text is None and response_cache.semantic_enabled:
+        text = response_cache.get_similar(cache_key)
+    CACHE_REQUESTS.inc(cache="counseling", result="miss" if text is None else "hit")
+    return text
 
-# --- Retriever Initialization ---
-retriever = None
-retriever_error = None
-try:
-    retriever = Retriever()
-except Exception as e:
-    retriever_error = str(e)
-    print(f"Retriever failed to initialize: {retriever_error}")
 
-# --- ML Model Initialization ---
-ml_model = None
-try:
-    ml_model = joblib.load("college_eligibility_predictor.pkl")
-except Exception as e:
-    print(f"ML model failed to load: {e}")
+async def cache_counseling(cache_key, text: str):
+    response_cache.put(cache_key, text)
+
+
+# --- Shared Counseling Stages ---
+class RecommendationUnavailable(Exception):
+    """Raised when the ML stage cannot produce recommendations."""
+
+
+def build_recommendations(df: pd.DataFrame) -> List[CollegeRecommendation]:
+    """CollegeRecommendation objects from DataFrame columns (no iterrows)."""
+    fields = list(CollegeRecommendation.model_fields)
+    columns = [df[name].tolist() for name in fields]
+    return [
+        CollegeRecommendation(**dict(zip(fields, values))) for values in zip(*columns)
+    ]
+
+
+def _programs_and_categories(df_candidates: pd.DataFrame):
+    if "program_name" in df_candidates:
+        programs = df_candidates["program_name"].to_numpy()
+    else:
+        programs = df_candidates.get("name").to_numpy()
+    if "category" in df_candidates:
+        categories = df_candidates["category"].to_numpy()
+    else:
+        categories = np.full(len(df_candidates), "GEN", dtype=object)
+    return programs, categories
+
+
+def _search_filters(request: CounselRequest) -> dict:
+    # rows without closing ranks are already left out by RETRIEVER_BASE_FILTERS
+    return request.search_filters()
+
+
+def _score_candidates(
+    eligibility_scorer, df_candidates: pd.DataFrame, request: CounselRequest
+):
+    """Eligibility probabilities and the top rows per group, for one request."""
+    programs, categories = _programs_and_categories(df_candidates)
+    probs = eligibility_scorer.predict(
+        np.full(len(df_candidates), request.entrance_exam_rank),
+        programs,
+        categories,
+    )
+    # one recommendation per (institute, program or stream) group
+    top = top_k_per_group(probs, df_candidates["group_id"].to_numpy(), 3)
+    return probs, top
+
+
+async def recommend_colleges(request: CounselRequest):
+    """
+    Run retrieval + ML scoring for a request.
+    Returns (ml_recommendations, top_ml_colleges, query).
+    """
+    # one bundle for the whole request, even if a reload swaps it meanwhile
+    bundle = registry.current
+    retriever, eligibility_scorer = bundle.retriever, bundle.eligibility_scorer
+    if not retriever or not eligibility_scorer:
+        error_detail = bundle.error or "ML model not loaded."
+        raise RecommendationUnavailable(
+            f"Error: The recommendation engine is not available. Details: {error_detail}"
+        )
+
+    query = ", ".join(request.interests)
+    df_candidates = await retriever.afind_candidates(
+        query, top_k=20, filters=_search_filters(request)
+    )
+
+    if df_candidates.empty:
+        raise RecommendationUnavailable(
+            "No suitable colleges found based on your interests."
+        )
+
+    # scoring runs in the threadpool (as in the batch path), so a large
+    # candidate set doesn't hold up the event loop
+    with STAGE_SECONDS.time(stage="score"):
+        probs, top = await run_in_threadpool(
+            _score_candidates, eligibility_scorer, df_candidates, request
+        )
+    df_candidates["eligibility_prob"] = probs
+    top_ml_colleges = df_candidates.iloc[top]
+
+    with STAGE_SECONDS.time(stage="serialize"):
+        ml_recommendations = build_recommendations(top_ml_colleges)
+    logging.info("ML recommendations generated.")
+    return ml_recommendations, top_ml_colleges, query
+
+
+async def recommend_colleges_batch(requests: List[CounselRequest]):
+    """
+    recommend_colleges for many requests at once: one encode call, one
+    multi-query search per filter set and one vectorized scoring call.
+    Returns one (ml_recommendations, top_ml_colleges, query) per request, or
+    None where no candidates were found.
+    """
+    bundle = registry.current
+    retriever, eligibility_scorer = bundle.retriever, bundle.eligibility_scorer
+    if not retriever or not eligibility_scorer:
+        error_detail = bundle.error or "ML model not loaded."
+        raise RecommendationUnavailable(
+            f"Error: The recommendation engine is not available. Details: {error_detail}"
+        )
+
+    queries = [", ".join(r.interests) for r in requests]
+    df_candidates = await retriever.afind_candidates_batch(
+        queries, top_k=20, filters_list=[_search_filters(r) for r in requests]
+    )
+
+    # candidates are grouped by request; each row scored at its own student's rank
+    query_index = df_candidates.pop("query_index").to_numpy()
+    ranks = np.array([r.entrance_exam_rank for r in requests])[query_index]
+    programs, categories = _programs_and_categories(df_candidates)
+    with STAGE_SECONDS.time(stage="score"):
+        probs = await run_in_threadpool(
+            eligibility_scorer.predict, ranks, programs, categories
+        )
+    df_candidates["eligibility_prob"] = probs
+
+    groups = df_candidates["group_id"].to_numpy()
+    bounds = np.searchsorted(query_index, np.arange(len(requests) + 1))
+    results = []
+    for i, query in enumerate(queries):
+        lo, hi = bounds[i], bounds[i + 1]
+        if lo == hi:
+            results.append(None)
+            continue
+        top = top_k_per_group(probs[lo:hi], groups[lo:hi], 3)
+        top_ml_colleges = df_candidates.iloc[lo + top]
+        with STAGE_SECONDS.time(stage="serialize"):
+            ml_recommendations = build_recommendations(top_ml_colleges)
+        results.append((ml_recommendations, top_ml_colleges, query))
+    return results
+
+
+def build_counseling_prompt(
+    request: CounselRequest, query: str, top_ml_colleges: pd.DataFrame
+) -> Prompt:
+    with STAGE_SECONDS.time(stage="prompt"):
+        prompt = prompt_builder.build(
+            query,
+            request.entrance_exam_rank,
+            top_ml_colleges,
+            board_marks=request.board_marks,
+        )
+    if prompt.colleges < len(top_ml_colleges):
+        logging.warning(
+            "Prompt over budget; kept %d of %d colleges.",
+            prompt.colleges,
+            len(top_ml_colleges),
+        )
+    logging.debug("Counseling prompt: ~%d tokens.", prompt.tokens)
+    return prompt
+
+
+def build_fallback_counseling(top_ml_colleges: pd.DataFrame) -> str:
+    """Short templated justification used when the LLM is overloaded."""
+    lines = [
+        f"- {row.institute_short}: {row.program_name or row.stream} ({row.category}), "
+        f"closing rank {int(row.closing_rank)}, "
+        f"estimated admission chance {row.eligibility_prob:.0%}."
+        for row in top_ml_colleges.itertuples(index=False)
+    ]
+    return (
+        "Our counselor is handling a lot of requests right now, so here is a "
+        "quick summary of your best matches based on your rank:\n"
+        + "\n".join(lines)
+        + "\n\nThese programs closed at or around your rank in previous rounds. "
+        "Compare their curricula and locations, and keep safer options in your "
+        "choice list. Ask again later for a detailed explanation."
+    )
 
 
 # --- Combined Endpoint ---
@@ -70,68 +501,454 @@ except Exception as e:
 async def combined_counseling(
     request: CounselRequest, user_id: str = Depends(get_user_identifier)
 ):
-    print(request)
     logging.info("Combined counseling endpoint hit.")
-    apply_rate_limit(user_id)
+    logging.debug("Counsel request: %s", request)
+    await apply_rate_limit(user_id)
 
-    if not retriever or not ml_model:
-        error_detail = retriever_error or "ML model not loaded."
-        return CombinedResponse(
-            ml=[],
-            llm=f"Error: The recommendation engine is not available. Details: {error_detail}",
+    try:
+        ml_recommendations, top_ml_colleges, query = await recommend_colleges(request)
+    except RecommendationUnavailable as e:
+        return CombinedResponse(ml=[], llm=str(e))
+
+    # === LLM Logic ===
+    cache_key = response_cache.make_key(
+        request.interests,
+        top_ml_colleges.to_dict(orient="records"),
+        request.entrance_exam_rank,
+        request.board_marks,
+    )
+    llm_counseling_text = await get_cached_counseling(cache_key)
+    if llm_counseling_text is None:
+        prompt = build_counseling_prompt(request, query, top_ml_colleges)
+        try:
+            async with llm_slot(llm_priority(user_id)):
+                llm_counseling_text = await ai_platform.chat(
+                    prompt.user, system=prompt.system
+                )
+        except AdmissionRejected as e:
+            logging.warning("LLM overloaded (%s); sending templated counseling.", e)
+            return CombinedResponse(
+                ml=ml_recommendations,
+                llm=build_fallback_counseling(top_ml_colleges),
+            )
+        await cache_counseling(cache_key, llm_counseling_text)
+        logging.info("LLM counseling generated.")
+    else:
+        logging.info("LLM counseling served from cache.")
+
+    return CombinedResponse(ml=ml_recommendations, llm=llm_counseling_text)
+
+
+# --- Batch Endpoint ---
+# LLM generations a single batch call may run at once (they also go through
+# the admission controller, so batches can't starve interactive traffic)
+BATCH_LLM_PARALLELISM = int(os.environ.get("BATCH_LLM_PARALLELISM", "2"))
+
+
+@app.post("/counseling/batch", response_model=BatchCounselResponse)
+async def batch_counseling(
+    batch: BatchCounselRequest, user_id: str = Depends(get_user_identifier)
+):
+    """
+    ML recommendations for a cohort of students in one call, optionally with
+    LLM counseling text per student (include_llm, authenticated users only)
+    generated with bounded parallelism. Rate limited per student.
+    """
+    logging.info("Batch counseling endpoint hit (%d requests).", len(batch.requests))
+    await apply_rate_limit(user_id)
+    await apply_batch_rate_limit(user_id, len(batch.requests), llm=batch.include_llm)
+
+    try:
+        recommended = await recommend_colleges_batch(batch.requests)
+    except RecommendationUnavailable as e:
+        return BatchCounselResponse(
+            results=[BatchCounselResult(ml=[], error=str(e)) for _ in batch.requests]
         )
 
-    query = ", ".join(request.interests)
-    candidates = retriever.find_similar_colleges(query, top_k=20)
+    parallelism = asyncio.Semaphore(BATCH_LLM_PARALLELISM)
+    # bulk work queues behind the same user's interactive requests
+    priority = llm_priority(user_id) + 1
+
+    async def counsel(request: CounselRequest, recommendation) -> BatchCounselResult:
+        if recommendation is None:
+            return BatchCounselResult(
+                ml=[], error="No suitable colleges found based on your interests."
+            )
+        ml_recommendations, top_ml_colleges, query = recommendation
+        if not batch.include_llm:
+            return BatchCounselResult(ml=ml_recommendations)
 
-    if not candidates:
-        return CombinedResponse(
-            ml=[], llm="No suitable colleges found based on your interests."
+        cache_key = response_cache.make_key(
+            request.interests,
+            top_ml_colleges.to_dict(orient="records"),
+            request.entrance_exam_rank,
+            request.board_marks,
         )
+        text = await get_cached_counseling(cache_key)
+        if text is None:
+            prompt = build_counseling_prompt(request, query, top_ml_colleges)
+            try:
+                async with parallelism, llm_slot(priority):
+                    text = await ai_platform.chat(prompt.user, system=prompt.system)
+            except AdmissionRejected:
+                text = build_fallback_counseling(top_ml_colleges)
+            except Exception as e:
+                logging.error("Batch LLM generation failed: %s", e)
+                return BatchCounselResult(
+                    ml=ml_recommendations, error=f"LLM generation failed: {e}"
+                )
+            else:
+                await cache_counseling(cache_key, text)
+        return BatchCounselResult(ml=ml_recommendations, llm=text)
+
+    results = await asyncio.gather(
+        *(counsel(r, rec) for r, rec in zip(batch.requests, recommended))
+    )
+    return BatchCounselResponse(results=results)
+
+
+# --- Streaming Combined Endpoint ---
+def _ndjson_event(event: str, data=None) -> bytes:
+    return (json.dumps({"event": event, "data": data}) + "\n").encode("utf-8")
+
+
+@app.post("/counseling/combined/stream")
+async def combined_counseling_stream(
+    request: CounselRequest, user_id: str = Depends(get_user_identifier)
+):
+    """
+    Same pipeline as /counseling/combined, delivered as NDJSON:
+    one `ml` event with the top-3 recommendations as soon as they are scored,
+    then `token` events as the LLM generates text, then a final `done` event.
+    """
+    logging.info("Streaming counseling endpoint hit.")
+    await apply_rate_limit(user_id)
+
+    try:
+        ml_recommendations, top_ml_colleges, query = await recommend_colleges(request)
+    except RecommendationUnavailable as e:
+        message = str(e)
+
+        async def unavailable():
+            yield _ndjson_event("ml", [])
+            yield _ndjson_event("error", message)
+            yield _ndjson_event("done")
+
+        return StreamingResponse(unavailable(), media_type="application/x-ndjson")
+
+    cache_key = response_cache.make_key(
+        request.interests,
+        top_ml_colleges.to_dict(orient="records"),
+        request.entrance_exam_rank,
+        request.board_marks,
+    )
+
+    async def events():
+        yield _ndjson_event("ml", [rec.model_dump() for rec in ml_recommendations])
+
+        cached_text = await get_cached_counseling(cache_key)
+        if cached_text is not None:
+            logging.info("LLM counseling served from cache.")
+            yield _ndjson_event("token", cached_text)
+            yield _ndjson_event("done")
+            return
 
-    df_candidates = pd.DataFrame(candidates)
-    X_new = pd.DataFrame(
+        prompt = build_counseling_prompt(request, query, top_ml_colleges)
+        chunks = []
+        try:
+            async with llm_slot(llm_priority(user_id)):
+                async for chunk in ai_platform.stream_chat(
+                    prompt.user, system=prompt.system
+                ):
+                    chunks.append(chunk)
+                    yield _ndjson_event("token", chunk)
+        except AdmissionRejected as e:
+            logging.warning("LLM overloaded (%s); sending templated counseling.", e)
+            yield _ndjson_event("token", build_fallback_counseling(top_ml_colleges))
+        except Exception as e:
+            logging.error("LLM streaming failed: %s", e)
+            yield _ndjson_event("error", f"LLM generation failed: {e}")
+        else:
+            await cache_counseling(cache_key, "".join(chunks))
+            logging.info("LLM counseling streamed.")
+        yield _ndjson_event("done")
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+# --- Counseling Jobs ---
+async def run_counseling_job(job: Job):
+    """Worker side of a job: generate (or fall back) and cache the text."""
+    payload, prompt = job.payload, job.payload["prompt"]
+    # log under the ID of the request that created the job
+    request_id_var.set(payload["request_id"])
+    try:
+        async with llm_slot(payload["priority"]):
+            async for chunk in ai_platform.stream_chat(
+                prompt.user, system=prompt.system
+            ):
+                await job.append(chunk)
+    except AdmissionRejected as e:
+        logging.warning("LLM overloaded (%s); job %s gets templated text.", e, job.id)
+        await job.append(build_fallback_counseling(payload["top_ml_colleges"]))
+        return
+    await cache_counseling(payload["cache_key"], job.text)
+
+
+counseling_jobs = JobManager(
+    run_counseling_job,
+    workers=int(os.environ.get("LLM_JOB_WORKERS", "2")),
+    max_pending=int(os.environ.get("LLM_JOB_MAX_PENDING", "256")),
+)
+
+
+def _job_view(job: Job) -> CounselingJob:
+    return CounselingJob(
+        job_id=job.id,
+        status=job.status,
+        ml=job.payload["ml"],
+        llm=job.text or None,
+        error=job.error,
+    )
+
+
+def _get_job(job_id: str, user_id: str) -> Job:
+    """The job, if `user_id` submitted it; other callers get the same 404."""
+    job = counseling_jobs.get(job_id)
+    if job is None or job.user_id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Unknown or expired job."
+        )
+    return job
+
+
+@app.post(
+    "/counseling/jobs",
+    response_model=CounselingJob,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def create_counseling_job(
+    request: CounselRequest, user_id: str = Depends(get_user_identifier)
+):
+    """
+    Run retrieval + ML now and return them with a job ID; the LLM
+    justification is generated in the background. Poll
+    GET /counseling/jobs/{job_id} or follow /counseling/jobs/{job_id}/stream.
+    """
+    logging.info("Counseling job endpoint hit.")
+    await apply_rate_limit(user_id)
+
+    try:
+        ml_recommendations, top_ml_colleges, query = await recommend_colleges(request)
+    except RecommendationUnavailable as e:
+        job = counseling_jobs.create({"ml": []}, user_id=user_id)
+        await job.set_status(FAILED, str(e))
+        return _job_view(job)
+
+    cache_key = response_cache.make_key(
+        request.interests,
+        top_ml_colleges.to_dict(orient="records"),
+        request.entrance_exam_rank,
+        request.board_marks,
+    )
+    job = counseling_jobs.create(
         {
-            "student_rank": [request.entrance_exam_rank] * len(df_candidates),
-            "program_name": df_candidates.get(
-                "program_name", df_candidates.get("name")
-            ),
-            "category": df_candidates.get("category", "GEN"),
-        }
+            "ml": ml_recommendations,
+            "top_ml_colleges": top_ml_colleges,
+            "cache_key": cache_key,
+            "prompt": build_counseling_prompt(request, query, top_ml_colleges),
+            "priority": llm_priority(user_id),
+            "request_id": request_id_var.get(),
+        },
+        user_id=user_id,
     )
 
-    probs = ml_model.predict_proba(X_new)[:, 1]
-    df_candidates["eligibility_prob"] = probs
-    top_ml_colleges = df_candidates.sort_values(
-        "eligibility_prob", ascending=False
-    ).head(3)
+    cached_text = await get_cached_counseling(cache_key)
+    if cached_text is not None:
+        logging.info("LLM counseling served from cache.")
+        await job.append(cached_text)
+        await job.set_status(DONE)
+        return _job_view(job)
 
-    ml_recommendations = [
-        CollegeRecommendation(**row) for _, row in top_ml_colleges.iterrows()
-    ]
-    logging.info("ML recommendations generated.")
+    try:
+        counseling_jobs.submit(job)
+    except JobQueueFull:
+        logging.warning("Counseling job queue full; sending templated counseling.")
+        await job.append(build_fallback_counseling(top_ml_colleges))
+        await job.set_status(DONE)
+    return _job_view(job)
 
-    # === LLM Logic ===
-    context_str = top_ml_colleges.to_json(orient="records", indent=2)
-    prompt_text = (
-        f"A student has the following profile:\n"
-        f"- Interests: {query}\n"
-        f"- Board Marks: {request.board_marks}%\n"
-        f"- Entrance Exam Rank: {request.entrance_exam_rank}\n\n"
-        f"Based on their rank, our algorithm has recommended these top 3 colleges:\n{context_str}\n\n"
-        f"Your task is to act as a career counselor. Please provide a detailed, encouraging, and helpful justification "
-        f"for why these specific colleges are a good fit for the student. Explain the strengths of each program "
-        f"and give advice on what the student should focus on next."
+
+@app.get("/counseling/jobs/stats")
+async def counseling_job_stats():
+    return counseling_jobs.stats()
+
+
+@app.get("/counseling/jobs/{job_id}", response_model=CounselingJob)
+async def get_counseling_job(job_id: str, user_id: str = Depends(get_user_identifier)):
+    return _job_view(_get_job(job_id, user_id))
+
+
+@app.get("/counseling/jobs/{job_id}/stream")
+async def stream_counseling_job(
+    job_id: str, user_id: str = Depends(get_user_identifier)
+):
+    """NDJSON `token` events (text so far, then new text) and a final `done`."""
+    job = _get_job(job_id, user_id)
+
+    async def events():
+        async for chunk in job.follow():
+            yield _ndjson_event("token", chunk)
+        if job.status == FAILED:
+            yield _ndjson_event("error", job.error)
+        yield _ndjson_event("done")
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.post("/counseling/jobs/{job_id}/retry", response_model=CounselingJob)
+async def retry_counseling_job(
+    job_id: str, user_id: str = Depends(get_user_identifier)
+):
+    """Re-run the LLM stage of a failed job; the ML result is reused."""
+    await apply_rate_limit(user_id)
+    job = _get_job(job_id, user_id)
+    if job.status != FAILED or "prompt" not in job.payload:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Only failed jobs can be retried.",
+        )
+    try:
+        await counseling_jobs.retry(job)
+    except JobQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Counseling job queue is full. Please try again later.",
+        )
+    return _job_view(job)
+
+
+@app.get("/counseling/cache/stats")
+async def counseling_cache_stats():
+    return response_cache.stats()
+
+
+@app.get("/counseling/llm/stats")
+async def counseling_llm_stats():
+    return llm_admission.stats()
+
+
+# --- Metrics ---
+REGISTRY.gauge(
+    "llm_in_flight", "LLM generations running.", lambda: llm_admission.in_flight
+)
+REGISTRY.gauge(
+    "llm_queued", "LLM generations waiting for admission.", lambda: llm_admission.queued
+)
+REGISTRY.gauge(
+    "counseling_jobs_queued",
+    "Counseling jobs waiting for a worker.",
+    lambda: counseling_jobs.stats()[QUEUED],
+)
+REGISTRY.gauge(
+    "serving_version",
+    "Version of the loaded serving artifacts.",
+    lambda: registry.current.version,
+)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of the stage timings, counters and gauges."""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+# --- Startup, Readiness and Hot Reload ---
+_watcher_task: Optional[asyncio.Task] = None
+# "started" turns True once the startup load and warmup are over, whatever
+# their outcome; readiness also needs the current bundle to be healthy, so a
+# failed first load becomes ready after a successful watcher or admin reload.
+startup_state = {"started": False, "started_at": time.time(), "warmup": {}}
+
+
+def is_ready() -> bool:
+    return startup_state["started"] and registry.current.healthy
+
+
+async def warm_up(bundle: ServingBundle) -> dict:
+    """Dummy query through encoder + index, and load the Ollama model."""
+    timings = {}
+
+    start = time.perf_counter()
+    try:
+        await bundle.retriever.afind_candidates("engineering", top_k=1, lexical=False)
+        timings["retriever"] = round(time.perf_counter() - start, 3)
+    except Exception as e:
+        logging.warning("Retriever warmup failed: %s", e)
+        timings["retriever"] = f"failed: {e}"
+
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(ai_platform.warmup(), WARMUP_TIMEOUT_SECONDS)
+        timings["llm"] = round(time.perf_counter() - start, 3)
+    except Exception as e:
+        logging.warning("LLM warmup failed: %r", e)
+        timings["llm"] = f"failed: {e!r}"
+    return timings
+
+
+async def start_serving():
+    global _watcher_task
+    await registry.reload()
+    bundle = registry.current
+    if WARMUP_ON_STARTUP and bundle.healthy:
+        startup_state["warmup"] = await warm_up(bundle)
+    startup_state["started"] = True
+    logging.info(
+        "Startup finished in %.2fs (ready=%s)",
+        time.time() - startup_state["started_at"],
+        is_ready(),
     )
-    full_prompt = f"{SYSTEM_PROMPT}\n\n{prompt_text}"
+    if RELOAD_POLL_SECONDS > 0:
+        _watcher_task = asyncio.create_task(registry.watch(RELOAD_POLL_SECONDS))
 
-    llm_counseling_text = await ai_platform.chat(full_prompt)
-    logging.info("LLM counseling generated.")
 
-    return CombinedResponse(ml=ml_recommendations, llm=llm_counseling_text)
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving its event loop."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: artifacts are loaded (and warmed); 503 until then."""
+    bundle = registry.current
+    # the same bundle as the body describes
+    ready = startup_state["started"] and bundle.healthy
+    body = {
+        "ready": ready,
+        **bundle.describe(),
+        "warmup": startup_state["warmup"],
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
+@app.post("/admin/reload", dependencies=[Depends(require_admin)])
+async def reload_models():
+    """Load the artifacts on disk as a new version and swap it in."""
+    swapped = await registry.reload()
+    return {"swapped": swapped, **registry.status()}
+
+
+@app.get("/admin/models", dependencies=[Depends(require_admin)])
+async def model_status():
+    return registry.status()
 
 
 # --- Root Endpoint ---
 @app.get("/")
 async def root():
-    return {"message": "College Counseling API with RAG is running."}
+    return {
+        "message": "College Counseling API with RAG is running.",
+        "ready": is_ready(),
+    }
@@ -13,15 +13,52 @@ class CounselRequest(BaseModel):
     entrance_exam_rank: int = Field(
         ..., ge=1, description="Entrance exam rank (lower rank = better performance)"
     )
+    category: Optional[str] = Field(
+        None, description="Only consider seats in this reservation category"
+    )
+    stream: Optional[str] = Field(
+        None, description="Only consider programs in this stream (e.g., Engineering)"
+    )
+    quota: Optional[str] = Field(
+        None, description="Only consider seats under this quota (e.g., AI, HS, OS)"
+    )
+    rank_tolerance: Optional[float] = Field(
+        None,
+        ge=0,
+        le=1,
+        description=(
+            "Only consider programs whose closing rank is at least "
+            "entrance_exam_rank * (1 - rank_tolerance); 0 keeps only programs "
+            "the student's rank already clears"
+        ),
+    )
+
+    def search_filters(self) -> dict:
+        """Structured filters for Retriever searches."""
+        filters = {
+            "category": self.category,
+            "stream": self.stream,
+            "quota": self.quota,
+        }
+        if self.rank_tolerance is not None:
+            filters["min_closing_rank"] = int(
+                self.entrance_exam_rank * (1 - self.rank_tolerance)
+            )
+        return {k: v for k, v in filters.items() if v is not None}
 
 
 class CollegeRecommendation(BaseModel):
     institute_short: str = Field(
         ..., description="Short name of the institute (e.g., IIT-Bombay)"
     )
-    program_name: str = Field(
-        ..., description="Name of the program (e.g., Aerospace Engineering)"
+    program_name: Optional[str] = Field(
+        None,
+        description=(
+            "Name of the program (e.g., Aerospace Engineering); missing when "
+            "the source only lists the stream"
+        ),
     )
+    stream: Optional[str] = Field(None, description="Stream (e.g., Engineering)")
     category: str = Field(
         ..., description="Reservation category (e.g., GEN, OBC-NCL, SC, ST)"
     )
@@ -44,3 +81,30 @@ class CounselTextResponse(BaseModel):
 class CombinedResponse(BaseModel):
     ml: List[CollegeRecommendation]
     llm: str
+
+
+class CounselingJob(BaseModel):
+    job_id: str
+    status: str = Field(..., description="queued, running, done or failed")
+    ml: List[CollegeRecommendation]
+    llm: Optional[str] = Field(
+        None, description="Counseling text generated so far (complete when done)"
+    )
+    error: Optional[str] = None
+
+
+class BatchCounselRequest(BaseModel):
+    requests: List[CounselRequest] = Field(..., min_length=1, max_length=1000)
+    include_llm: bool = Field(
+        False, description="Also generate LLM counseling text for each student"
+    )
+
+
+class BatchCounselResult(BaseModel):
+    ml: List[CollegeRecommendation]
+    llm: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchCounselResponse(BaseModel):
+    results: List[BatchCounselResult]
@@ -0,0 +1,40 @@
+import asyncio
+import gc
+
+import numpy as np
+
+from ai.batching import MicroBatchEncoder
+
+
+def _encode(texts):
+    return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+
+def test_concurrent_queries_share_one_batch():
+    encoder = MicroBatchEncoder(_encode, max_batch_size=8, max_wait_ms=5)
+
+    async def run():
+        return await asyncio.gather(*(encoder.encode(t) for t in ["a", "bb", "a"]))
+
+    vectors = asyncio.run(run())
+    assert [v[0] for v in vectors] == [1, 2, 1]
+    assert (encoder.batches, encoder.queries) == (1, 3)
+
+
+def test_in_flight_batches_survive_garbage_collection():
+    def slow_encode(texts):
+        gc.collect()
+        return _encode(texts)
+
+    encoder = MicroBatchEncoder(slow_encode, max_batch_size=2, max_wait_ms=5)
+
+    async def run():
+        queries = [encoder.encode(str(i)) for i in range(4)]
+        pending = [asyncio.ensure_future(q) for q in queries]
+        await asyncio.sleep(0)
+        assert encoder._tasks
+        gc.collect()
+        return await asyncio.wait_for(asyncio.gather(*pending), timeout=5)
+
+    assert len(asyncio.run(run())) == 4
+    assert not encoder._tasks
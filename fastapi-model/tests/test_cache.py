@@ -0,0 +1,34 @@
+import numpy as np
+
+from ai.cache import ResponseCache
+
+COLLEGES = [
+    {"institute_short": "IIT-B", "program_name": "CSE", "category": "GEN"},
+    {"institute_short": "IIT-D", "program_name": None, "category": "GEN"},
+]
+
+
+def test_key_buckets_rank_and_board_marks():
+    cache = ResponseCache(rank_bucket_size=1000, marks_bucket_size=5)
+    key = cache.make_key([" AI ", "robotics"], COLLEGES, 1_500, 91.0)
+    assert key == cache.make_key(["robotics", "ai"], COLLEGES, 1_999, 94.9)
+    assert key != cache.make_key(["robotics", "ai"], COLLEGES, 2_000, 91.0)
+    assert key != cache.make_key(["robotics", "ai"], COLLEGES, 1_500, 71.0)
+    assert key != cache.make_key(["robotics", "ai"], COLLEGES, 1_500)
+
+
+def test_students_differing_only_in_marks_do_not_share_text():
+    cache = ResponseCache()
+    cache.put(cache.make_key(["ai"], COLLEGES, 1_500, 95.0), "aim high")
+    assert cache.get(cache.make_key(["ai"], COLLEGES, 1_500, 95.0)) == "aim high"
+    assert cache.get(cache.make_key(["ai"], COLLEGES, 1_500, 60.0)) is None
+    assert cache.get(cache.make_key(["ai"], COLLEGES, 1_500)) is None
+
+
+def test_semantic_tier_stays_within_the_marks_bucket():
+    vectors = {"ai": [1.0, 0.0], "artificial intelligence": [0.99, 0.14]}
+    cache = ResponseCache(encoder=lambda text: np.array(vectors[text]))
+    cache.put(cache.make_key(["ai"], COLLEGES, 1_500, 95.0), "aim high")
+    similar = ["artificial intelligence"]
+    assert cache.get_similar(cache.make_key(similar, COLLEGES, 1_500, 96.0))
+    assert cache.get_similar(cache.make_key(similar, COLLEGES, 1_500, 60.0)) is None
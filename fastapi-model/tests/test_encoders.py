@@ -0,0 +1,40 @@
+import pytest
+
+import ai.encoders as encoders
+
+
+@pytest.fixture
+def torch_installed(monkeypatch):
+    def set_installed(installed):
+        spec = object() if installed else None
+        monkeypatch.setattr(encoders.importlib.util, "find_spec", lambda name: spec)
+
+    monkeypatch.setattr(encoders, "load_sentence_transformer", lambda name: "torch")
+    return set_installed
+
+
+def test_auto_falls_back_to_torch_when_installed(tmp_path, torch_installed):
+    torch_installed(True)
+    assert encoders.load_encoder("auto", onnx_dir=str(tmp_path)) == "torch"
+
+
+@pytest.mark.parametrize(
+    "meta, reason",
+    [
+        (None, "there is no encoder.json"),
+        ({"model_name": "other-model", "parity": {}}, "holds an export of other-model"),
+        (
+            {"model_name": "all-MiniLM-L6-v2", "parity": {"onnx": {"passed": False}}},
+            "passed its parity check",
+        ),
+    ],
+)
+def test_auto_without_torch_explains_the_missing_export(
+    tmp_path, torch_installed, meta, reason
+):
+    torch_installed(False)
+    if meta is not None:
+        encoders.save_meta(str(tmp_path), meta)
+    with pytest.raises(FileNotFoundError, match=reason) as exc:
+        encoders.load_encoder("auto", onnx_dir=str(tmp_path))
+    assert "export_encoder.py" in str(exc.value)
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from ai.index import (
+    index_path,
+    load_or_build_index,
+    params_path,
+    read_index_params,
+    update_persisted_indexes,
+)
+
+
+@pytest.fixture
+def embeddings():
+    return np.random.default_rng(0).random((2_000, 16), dtype=np.float32)
+
+
+def test_reuses_index_built_with_same_parameters(tmp_path, embeddings):
+    first = load_or_build_index(embeddings, str(tmp_path), "ivf_flat", nlist=8)
+    path = index_path(str(tmp_path), "ivf_flat")
+    assert read_index_params(path) == {"nlist": 8, "train_sample": 100_000, "seed": 0}
+
+    mtime = (tmp_path / "faiss_ivf_flat.index").stat().st_mtime_ns
+    second = load_or_build_index(embeddings, str(tmp_path), "ivf_flat", nlist=8)
+    assert (tmp_path / "faiss_ivf_flat.index").stat().st_mtime_ns == mtime
+    assert second.nlist == first.nlist == 8
+
+
+def test_rebuilds_when_parameters_change(tmp_path, embeddings):
+    load_or_build_index(embeddings, str(tmp_path), "ivf_flat", nlist=8)
+    index = load_or_build_index(embeddings, str(tmp_path), "ivf_flat", nlist=16)
+    assert index.nlist == 16
+    path = index_path(str(tmp_path), "ivf_flat")
+    assert read_index_params(path)["nlist"] == 16
+
+
+def test_rebuilds_index_without_parameter_record(tmp_path, embeddings):
+    load_or_build_index(embeddings, str(tmp_path), "hnsw", hnsw_m=8)
+    path = index_path(str(tmp_path), "hnsw")
+    (tmp_path / "faiss_hnsw.index.json").unlink()
+    load_or_build_index(embeddings, str(tmp_path), "hnsw", hnsw_m=8)
+    assert read_index_params(path) == {"hnsw_m": 8, "ef_construction": 200}
+
+
+def test_update_keeps_parameters_on_append_and_drops_them_on_remove(
+    tmp_path, embeddings
+):
+    data_dir = str(tmp_path)
+    path = index_path(data_dir, "ivf_flat")
+    hashes = np.arange(len(embeddings))
+    load_or_build_index(embeddings[:1_500], data_dir, "ivf_flat", nlist=8)
+
+    update_persisted_indexes(data_dir, hashes[:1_500], hashes, embeddings)
+    index = load_or_build_index(embeddings, data_dir, "ivf_flat", nlist=8)
+    assert index.ntotal == len(embeddings)
+    assert read_index_params(path)["nlist"] == 8
+
+    update_persisted_indexes(data_dir, hashes[1:], hashes, embeddings)
+    assert not (tmp_path / "faiss_ivf_flat.index").exists()
+    assert not (tmp_path / params_path("faiss_ivf_flat.index")).exists()
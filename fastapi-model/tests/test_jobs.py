@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from ai.jobs import DONE, FAILED, QUEUED, RUNNING, JobManager, JobQueueFull
+
+
+def test_retry_is_not_overwritten_by_queued():
+    async def run():
+        statuses = []
+
+        async def handler(job):
+            statuses.append(job.status)
+            if len(statuses) == 1:
+                raise RuntimeError("ollama is down")
+            await job.append("ok")
+
+        jobs = JobManager(handler, workers=1)
+        jobs.start()
+        job = jobs.create({"prompt": "p"})
+        jobs.submit(job)
+        await asyncio.sleep(0.01)
+        assert (job.status, job.error) == (FAILED, "ollama is down")
+
+        await jobs.retry(job)
+        assert job.status == QUEUED
+        await asyncio.sleep(0.01)
+        await jobs.stop()
+        return statuses, job
+
+    statuses, job = asyncio.run(run())
+    assert statuses == [RUNNING, RUNNING]
+    assert (job.status, job.text) == (DONE, "ok")
+
+
+def test_rejected_retry_leaves_job_failed():
+    async def run():
+        async def handler(job):
+            await asyncio.sleep(10)
+
+        jobs = JobManager(handler, workers=1, max_pending=1)
+        jobs.start()
+        failed = jobs.create({"prompt": "p"})
+        await failed.append("partial")
+        await failed.set_status(FAILED, "timeout")
+        # one job running, one waiting
+        jobs.submit(jobs.create())
+        await asyncio.sleep(0.01)
+        jobs.submit(jobs.create())
+        with pytest.raises(JobQueueFull):
+            await jobs.retry(failed)
+        await jobs.stop()
+        return failed
+
+    failed = asyncio.run(run())
+    assert (failed.status, failed.error, failed.text) == (FAILED, "timeout", "partial")
+
+
+def test_create_records_the_submitter():
+    jobs = JobManager(lambda job: None)
+    job = jobs.create({"prompt": "p"}, user_id="alice")
+    assert jobs.get(job.id).user_id == "alice"
+    assert jobs.create().user_id is None
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from ai.lexical import LexicalIndex
+from ai.store import CollegeStore
+
+# one document per row, shaped like the grouped real store: no programs, and
+# institute names that share words with other streams
+ROWS = [
+    ("College Of Engineering", "Agriculture"),
+    ("Roorkee College Of Engineering", "Arts"),
+    ("College Of Agricultural Engineering And Technology", "Agriculture"),
+    ("Nehru Arts And Science College", "Agriculture"),
+    ("IIT-Bombay", "Engineering"),
+    ("IIT-Delhi", "Engineering"),
+    ("Hansraj College", "Arts"),
+    ("Tagore Art College", "Arts"),
+]
+
+
+def _index():
+    store = CollegeStore.from_dataframe(
+        pd.DataFrame(
+            {
+                "institute_short": [i for i, _ in ROWS],
+                "program_name": [None] * len(ROWS),
+                "stream": [s for _, s in ROWS],
+            }
+        )
+    )
+    return LexicalIndex(store), np.array([s for _, s in ROWS])
+
+
+def test_stream_word_returns_groups_from_that_stream():
+    index, streams = _index()
+    for stream in ("Engineering", "Arts"):
+        match = index.match(stream)
+        assert match.covered
+        assert set(streams[match.complete]) == {stream}
+        assert len(match.complete) == (streams == stream).sum()
+        # institute-name hits from other streams only rank after them
+        assert set(streams[match.partial[: len(match.complete)]]) == {stream}
+
+
+def test_institute_words_and_prefixes_do_not_cover_a_query():
+    index, _ = _index()
+    for query in ("Nehru", "art", "college"):
+        match = index.match(query)
+        assert not index.knows(query)
+        assert not match.covered and len(match.complete) == 0
+        assert len(match.partial)
+
+
+def test_program_matches_rank_above_stream_matches():
+    store = CollegeStore.from_dataframe(
+        pd.DataFrame(
+            {
+                "institute_short": ["A", "B"],
+                "program_name": [None, "Engineering Physics"],
+                "stream": ["Engineering", "Engineering"],
+            }
+        )
+    )
+    assert LexicalIndex(store).match("engineering").complete.tolist() == [1, 0]
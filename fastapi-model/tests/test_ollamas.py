@@ -0,0 +1,37 @@
+import asyncio
+import logging
+
+import pytest
+
+import ai.ollamas as ollamas
+from ai.ollamas import AsyncOllama
+from benchmarks.fake_ollama import FakeOllama
+
+
+@pytest.fixture
+def fake_ollama():
+    fake = FakeOllama(latency=0.0, tokens=3).start()
+    yield fake
+    fake.stop()
+
+
+def test_aclose_closes_the_connection_pool(fake_ollama):
+    async def run():
+        llm = AsyncOllama(host=fake_ollama.url)
+        await llm._ensure_client_async()
+        pool = llm.client._client
+        await llm.aclose()
+        return llm, pool
+
+    llm, pool = asyncio.run(run())
+    assert pool.is_closed
+    assert llm.client is None
+
+
+def test_aclose_client_tolerates_a_client_without_pool(caplog):
+    class Client:
+        pass
+
+    with caplog.at_level(logging.WARNING):
+        asyncio.run(ollamas._aclose_client(Client()))
+    assert "not closing it" in caplog.text
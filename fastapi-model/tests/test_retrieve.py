@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from ai.retrieve import Retriever
+from ai.store import CollegeStore
+from benchmarks.common import (
+    SyntheticEncoder,
+    synthetic_group_ids,
+    synthetic_rows,
+    synthetic_vectors,
+)
+
+DIM = 16
+
+
+@pytest.fixture(scope="module")
+def data_dir(tmp_path_factory):
+    """Grouped synthetic data where a quarter of the groups have no ranks."""
+    data_dir = tmp_path_factory.mktemp("data")
+    rows = synthetic_rows(4_000)
+    rows["group_id"] = synthetic_group_ids(rows)
+    unranked = rows["group_id"] % 4 == 0
+    rows.loc[unranked, "closing_rank"] = np.nan
+    n_vectors = int(rows["group_id"].max()) + 1
+    np.save(data_dir / "embed.npy", synthetic_vectors(n_vectors, DIM))
+    CollegeStore.from_dataframe(rows).save(str(data_dir / "college_store"))
+    return str(data_dir)
+
+
+@pytest.fixture(scope="module")
+def retriever(data_dir):
+    return Retriever(
+        data_dir=data_dir,
+        model=SyntheticEncoder(DIM),
+        persist_index=False,
+        lexical_mode="off",
+        base_filters={"min_closing_rank": 1},
+    )
+
+
+def _count_index_searches(retriever, monkeypatch):
+    calls = []
+    search = retriever.index.search
+
+    def counting_search(*args, **kwargs):
+        calls.append(1)
+        return search(*args, **kwargs)
+
+    monkeypatch.setattr(retriever.index, "search", counting_search)
+    return calls
+
+
+def test_base_filters_leave_out_unranked_rows(retriever):
+    df = retriever.find_candidates("computer science", top_k=20)
+    assert len(df) and (df["closing_rank"] >= 1).all()
+    assert not (df["group_id"] % 4 == 0).any()
+
+
+def test_unfiltered_searches_use_the_index(retriever, monkeypatch):
+    calls = _count_index_searches(retriever, monkeypatch)
+    df = retriever.find_candidates("computer science", top_k=20)
+    assert calls == [1]
+
+    # same groups, in the same order, as an exact scan of the ranked vectors
+    query = retriever.encode_queries(["computer science"])
+    ranked = np.flatnonzero(retriever._base_vectors)
+    dists = ((retriever.embeddings[ranked] - query) ** 2).sum(axis=1)
+    expected = ranked[np.argsort(dists)[:20]]
+    assert list(dict.fromkeys(df["group_id"])) == list(expected)
+
+
+def test_request_filters_narrow_the_base_set(retriever, monkeypatch):
+    calls = _count_index_searches(retriever, monkeypatch)
+    df = retriever.find_candidates("robotics", top_k=10, filters={"category": "SC"})
+    # a subset this small is scanned exactly
+    assert calls == []
+    assert len(df) and (df["category"] == "SC").all()
+    assert (df["closing_rank"] >= 1).all()
+
+
+def test_batch_search_applies_base_filters(retriever):
+    df = retriever.find_candidates_batch(
+        ["computer science", "biotechnology"],
+        top_k=10,
+        filters_list=[None, {"quota": "HS"}],
+    )
+    assert set(df["query_index"]) == {0, 1}
+    assert (df["closing_rank"] >= 1).all()
+    assert (df.loc[df["query_index"] == 1, "quota"] == "HS").all()
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from ai.scoring import EligibilityScorer, EligibilityTable
+from benchmarks.common import CATEGORIES, PROGRAMS, synthetic_eligibility_model
+from build_eligibility_table import tabulate, validate_table
+
+MAX_RANK = 200_000
+
+
+@pytest.fixture(scope="module")
+def model():
+    return synthetic_eligibility_model()
+
+
+@pytest.fixture(scope="module")
+def pairs():
+    return [(p, c) for p in PROGRAMS for c in CATEGORIES]
+
+
+@pytest.fixture(scope="module")
+def table(model, pairs):
+    rank_grid = np.unique(np.geomspace(1, MAX_RANK, 512).round())
+    return tabulate(EligibilityScorer(model, known_pairs=pairs), pairs, rank_grid)
+
+
+def _rows(pairs, n, low, high, seed=0):
+    rng = np.random.default_rng(seed)
+    pick = rng.integers(0, len(pairs), n)
+    ranks = np.exp(rng.uniform(np.log(low), np.log(high), n)).round()
+    programs = np.array([pairs[i][0] for i in pick], dtype=object)
+    categories = np.array([pairs[i][1] for i in pick], dtype=object)
+    return ranks, programs, categories
+
+
+def test_table_matches_model_within_grid(model, pairs, table):
+    live = EligibilityScorer(model, known_pairs=pairs)
+    report = validate_table(table, live, n_checks=5_000)
+    assert report["max_abs_error"] < 0.01
+
+    served = EligibilityScorer(model, known_pairs=pairs, table=table)
+    rows = _rows(pairs, 2_000, 1, MAX_RANK)
+    np.testing.assert_allclose(served.predict(*rows), live.predict(*rows), atol=0.01)
+
+
+def test_ranks_outside_grid_use_the_model(model, pairs, table):
+    live = EligibilityScorer(model, known_pairs=pairs)
+    served = EligibilityScorer(model, known_pairs=pairs, table=table)
+    ranks, programs, categories = _rows(pairs, 2_000, MAX_RANK + 1, 50 * MAX_RANK)
+    ranks[0] = 0
+
+    assert not table.covers(ranks).any()
+    np.testing.assert_array_equal(
+        served.predict(ranks, programs, categories),
+        live.predict(ranks, programs, categories),
+    )
+    # the model keeps falling past the grid, where the edge value would not
+    program, category = pairs[0]
+    far = served.predict([MAX_RANK, 50 * MAX_RANK], [program] * 2, [category] * 2)
+    assert far[1] < far[0]
+
+
+def test_unknown_pairs_use_the_model(model, pairs, table):
+    live = EligibilityScorer(model, known_pairs=pairs)
+    served = EligibilityScorer(model, known_pairs=pairs, table=table)
+    ranks = np.array([10, 1_000, 100_000])
+    programs = np.array(["Unlisted program", PROGRAMS[0], None], dtype=object)
+    categories = np.array([CATEGORIES[0]] * 3, dtype=object)
+    assert list(table.codes(programs, categories) >= 0) == [False, True, False]
+    np.testing.assert_allclose(
+        served.predict(ranks, programs, categories),
+        live.predict(ranks, programs, categories),
+        atol=0.01,
+    )
+
+
+def test_save_and_load_round_trip(tmp_path, table):
+    table.model_sha1, table.max_abs_error = "abc", 0.001
+    path = str(tmp_path / "table.npz")
+    table.save(path)
+    loaded = EligibilityTable.load(path)
+    assert loaded.pair_codes == table.pair_codes
+    assert (loaded.model_sha1, loaded.max_abs_error) == ("abc", 0.001)
+    np.testing.assert_array_equal(loaded.probs, table.probs)
@@ -0,0 +1,226 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+import auth.throttling as throttling
+from auth.throttling import (
+    InMemoryBackend,
+    RateLimitBackend,
+    RateLimiter,
+    RedisBackend,
+)
+
+WINDOW = 60.0
+# a window boundary, so "now" below reads as seconds into a window
+T0 = 1_000 * WINDOW
+
+
+def test_allows_up_to_limit_within_a_window():
+    backend = InMemoryBackend()
+    for i in range(5):
+        assert backend.hit("u", 5, WINDOW, T0 + i) == (True, 0.0)
+    allowed, retry_after = backend.hit("u", 5, WINDOW, T0 + 5)
+    assert not allowed
+    # the only room is the next window, once this one's share decays to 4
+    assert retry_after == pytest.approx((WINDOW - 5) + WINDOW * (1 - 4 / 5))
+
+
+def test_previous_window_is_weighted_by_remaining_fraction():
+    backend = InMemoryBackend()
+    for i in range(4):
+        backend.hit("u", 5, WINDOW, T0 + i)
+    # 15 s into the next window: 4 * 0.75 = 3 estimated, so 2 more fit
+    now = T0 + WINDOW + 15
+    assert backend.hit("u", 5, WINDOW, now)[0]
+    assert backend.hit("u", 5, WINDOW, now)[0]
+    allowed, retry_after = backend.hit("u", 5, WINDOW, now)
+    assert not allowed
+    # room for one more once 4 * (1 - t / 60) + 2 + 1 <= 5, i.e. at t = 30
+    assert retry_after == pytest.approx(15)
+    assert not backend.hit("u", 5, WINDOW, now + retry_after - 0.01)[0]
+    assert backend.hit("u", 5, WINDOW, now + retry_after + 0.01)[0]
+
+
+def test_windows_older_than_the_previous_one_are_forgotten():
+    backend = InMemoryBackend()
+    for i in range(5):
+        backend.hit("u", 5, WINDOW, T0 + i)
+    assert backend.hit("u", 5, WINDOW, T0 + 2 * WINDOW)[0]
+
+
+def test_cost_counts_several_requests():
+    backend = InMemoryBackend()
+    assert backend.hit("u", 5, WINDOW, T0, cost=3)[0]
+    allowed, retry_after = backend.hit("u", 5, WINDOW, T0 + 1, cost=3)
+    assert not allowed
+    assert retry_after == pytest.approx((WINDOW - 1) + WINDOW * (1 - 2 / 3))
+    assert backend.hit("u", 5, WINDOW, T0 + 1, cost=2)[0]
+
+
+def test_users_are_limited_independently_and_idle_ones_evicted():
+    backend = InMemoryBackend(max_keys=2)
+    for key in ("a", "b", "c"):
+        assert backend.hit(key, 1, WINDOW, T0)[0]
+    # over max_keys: the least recently seen user was dropped
+    assert len(backend) == 2
+    assert backend.hit("a", 1, WINDOW, T0)[0]
+    assert not backend.hit("c", 1, WINDOW, T0)[0]
+
+    backend.hit("d", 1, WINDOW, T0 + 3 * WINDOW)
+    # everyone else was idle for two windows
+    assert len(backend) == 1
+
+
+def test_long_window_keys_do_not_hold_back_idle_short_window_keys():
+    backend = InMemoryBackend()
+    batch_window = throttling.BATCH_TIME_WINDOW_SECONDS
+    # the least recently seen key has the long window and stays active
+    backend.hit("alice:batch", 10, batch_window, T0)
+    for key in ("a", "b", "c"):
+        backend.hit(key, 5, WINDOW, T0 + 1)
+    assert len(backend) == 4
+
+    # two short windows later a, b and c are idle; alice:batch is not
+    backend.hit("d", 5, WINDOW, T0 + 1 + 2 * WINDOW)
+    assert len(backend) == 2
+    assert "alice:batch" in backend._windows[batch_window]
+
+
+def test_max_keys_drops_the_least_recently_seen_across_windows():
+    backend = InMemoryBackend(max_keys=2)
+    backend.hit("a", 5, WINDOW, T0)
+    backend.hit("u:batch", 5, 3600, T0 + 1)
+    backend.hit("b", 5, WINDOW, T0 + 2)
+    assert len(backend) == 2
+    assert "a" not in backend._windows[WINDOW]
+    assert "u:batch" in backend._windows[3600]
+
+
+# ---------- Redis (Lua) path ----------
+
+
+@pytest.fixture
+def redis_backend():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return RedisBackend("redis://unused", client=fakeredis.FakeRedis())
+
+
+def test_lua_script_matches_in_memory_backend(redis_backend):
+    memory = InMemoryBackend()
+    rng = np.random.default_rng(0)
+    now = T0
+    for _ in range(500):
+        now += float(rng.exponential(4.0))
+        key = f"user-{rng.integers(0, 3)}"
+        cost = int(rng.integers(1, 3))
+        expected = memory.hit(key, 5, WINDOW, now, cost)
+        allowed, retry_after = redis_backend.hit(key, 5, WINDOW, now, cost)
+        assert allowed == expected[0]
+        assert retry_after == pytest.approx(expected[1])
+
+
+def test_lua_counters_expire(redis_backend):
+    redis_backend.hit("u", 5, WINDOW, T0)
+    ttl = redis_backend.client.ttl(f"ratelimit:{{u}}:{int(T0 // WINDOW)}")
+    assert 0 < ttl <= 2 * WINDOW
+
+
+# ---------- Fallback and async paths ----------
+
+
+class FailingBackend(RateLimitBackend):
+    blocking = True
+
+    def __init__(self):
+        self.failing = True
+        self.calls = 0
+        self.threads = set()
+
+    def hit(self, key, limit, window, now, cost=1):
+        self.calls += 1
+        self.threads.add(threading.get_ident())
+        if self.failing:
+            raise ConnectionError("redis is down")
+        return True, 0.0
+
+
+def test_falls_back_while_backend_fails_and_recovers(monkeypatch):
+    backend, fallback = FailingBackend(), InMemoryBackend()
+    limiter = RateLimiter(backend, fallback=fallback, retry_interval=5.0)
+    clock = [T0]
+    monkeypatch.setattr(throttling.time, "time", lambda: clock[0])
+
+    assert limiter.hit("u", 1, WINDOW) == (True, 0.0)
+    # the fallback counts from here, and the backend isn't retried yet
+    assert not limiter.hit("u", 1, WINDOW)[0]
+    assert backend.calls == 1
+
+    clock[0] += 6
+    backend.failing = False
+    assert limiter.hit("u", 1, WINDOW) == (True, 0.0)
+    assert backend.calls == 2
+    assert not limiter._backend_failing
+
+
+def test_failure_without_fallback_raises():
+    with pytest.raises(ConnectionError):
+        RateLimiter(FailingBackend()).hit("u", 1, WINDOW)
+
+
+def test_ahit_runs_blocking_backends_off_the_event_loop():
+    backend = FailingBackend()
+    backend.failing = False
+    limiter = RateLimiter(backend)
+
+    async def hit():
+        return threading.get_ident(), await limiter.ahit("u", 1, WINDOW)
+
+    loop_thread, result = asyncio.run(hit())
+    assert result == (True, 0.0)
+    assert loop_thread not in backend.threads
+
+
+def test_apply_rate_limit_raises_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(throttling, "limiter", RateLimiter(InMemoryBackend()))
+    for _ in range(throttling.AUTH_RATE_LIMIT):
+        asyncio.run(throttling.apply_rate_limit("alice"))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(throttling.apply_rate_limit("alice"))
+    assert exc.value.status_code == 429
+    assert int(exc.value.headers["Retry-After"]) >= 1
+
+
+def test_batch_rate_limit(monkeypatch):
+    monkeypatch.setattr(throttling, "limiter", RateLimiter(InMemoryBackend()))
+    anonymous = throttling.UNAUTHENTICATED_USER
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(throttling.apply_batch_rate_limit(anonymous, 2, llm=True))
+    assert exc.value.status_code == 401
+
+    too_many = throttling.GLOBAL_BATCH_STUDENT_LIMIT + 1
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(throttling.apply_batch_rate_limit(anonymous, too_many))
+    assert exc.value.status_code == 413
+
+    asyncio.run(
+        throttling.apply_batch_rate_limit("alice", throttling.BATCH_LLM_LIMIT, llm=True)
+    )
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(throttling.apply_batch_rate_limit("alice", 1, llm=True))
+    assert exc.value.status_code == 429
+
+
+def test_rejected_batch_does_not_spend_the_llm_budget(monkeypatch):
+    backend = InMemoryBackend()
+    monkeypatch.setattr(throttling, "limiter", RateLimiter(backend))
+    students = throttling.AUTH_BATCH_STUDENT_LIMIT
+    asyncio.run(throttling.apply_batch_rate_limit("alice", students))
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(throttling.apply_batch_rate_limit("alice", 1, llm=True))
+    assert exc.value.status_code == 429
+    assert not any("alice:batch_llm" in c for c in backend._windows.values())